@@ -0,0 +1,399 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# RafutBot - Benchmark da Renderização
+# ----------------------------------------------------------------------
+# Mede o caminho da imagem do time fora do Discord: um servidor HTTP local
+# serve imagens de teste geradas sempre iguais, e o mesmo HttpClient,
+# ImageCache, TeamImages e TeamRenderer do bot montam os times. Relata o
+# tempo de cada etapa (rede, decodificação, redução, desenho, codificação),
+# p50/p99 das imagens avulsas e em lote, com cache frio e quente, com foto
+# substituta e direto do cache de imagens prontas, vazão e pico de RSS de
+# cada cenário (do bot e dos processos de render). Com --baseline, compara
+# com um resultado salvo por --json e falha se algo piorou além do limite.
+#
+#   python bench_render.py [--iterations 20] [--batch 12] [--format png]
+#                          [--latency-ms 0] [--json resultado.json]
+#                          [--baseline anterior.json] [--threshold 0.25]
+# ----------------------------------------------------------------------
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from io import BytesIO
+
+from aiohttp import web
+from PIL import Image, ImageDraw
+
+from http_client import HttpClient
+from image_cache import ImageCache
+from render import (FIELD_SIZE, LOGO_SIZE, OUTPUT_FORMATS, PLAYER_IMAGE_SIZE, RenderCache, TeamImages, TeamRenderer,
+                    _compose_static_layer, _get_fonts, draw_players, encode_image, image_payload)
+
+POSITIONS = ["GOL", "ZAG", "ZAG", "LE", "LD", "VOL", "MC", "MC", "PE", "PD", "ATA"]
+
+
+# --- Imagens de teste ---
+def _fixture_png(size, seed):
+    """PNG determinístico com gradiente e formas, para a decodificação não ser trivial."""
+    rng = random.Random(seed)
+    width, height = size
+    image = Image.linear_gradient("L").resize(size).convert("RGB")
+    image = Image.merge("RGB", (image.getchannel(0), image.getchannel(0).rotate(90), Image.new("L", size, rng.randrange(256))))
+    draw = ImageDraw.Draw(image)
+    for _ in range(24):
+        x, y = rng.randrange(width), rng.randrange(height)
+        r = rng.randrange(8, max(9, width // 4))
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=tuple(rng.randrange(256) for _ in range(3)))
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def build_fixtures(players=11, teams=1):
+    """{caminho: bytes}: fundo do campo, um logo por time e as fotos (o dobro do tamanho final, como no site de origem)."""
+    fixtures = {"/field.png": _fixture_png(FIELD_SIZE, 0),
+                "/fallback.png": _fixture_png((PLAYER_IMAGE_SIZE[0] * 2, PLAYER_IMAGE_SIZE[1] * 2), 1)}
+    for t in range(teams):
+        fixtures[f"/logo/{t}.png"] = _fixture_png((LOGO_SIZE[0] * 3, LOGO_SIZE[1] * 3), 1000 + t)
+        for p in range(players):
+            fixtures[f"/player/{t}/{p}.png"] = _fixture_png((PLAYER_IMAGE_SIZE[0] * 2, PLAYER_IMAGE_SIZE[1] * 2), 2000 + t * 100 + p)
+    return fixtures
+
+async def start_fixture_server(fixtures, latency_ms=0):
+    """Sobe o servidor local das imagens de teste; devolve (runner, url base)."""
+    async def handler(request):
+        data = fixtures.get(request.path)
+        if data is None:
+            raise web.HTTPNotFound()
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        return web.Response(body=data, content_type="image/png")
+
+    app = web.Application()
+    app.router.add_get("/{tail:.*}", handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f"http://127.0.0.1:{port}"
+
+def fixture_team(base_url, team=0, missing=0):
+    """Time no formato dos jogadores do catálogo, apontando para o servidor local.
+
+    Os `missing` últimos jogadores apontam para fotos que não existem (caminho da foto substituta).
+    """
+    players = len(POSITIONS)
+    return {
+        "club_name": f"Benchmark FC {team}",
+        "logo": f"{base_url}/logo/{team}.png",
+        "players": [{"name": f"Jogador Teste {p}", "position": POSITIONS[p], "overall": 70 + p, "value": 1_000_000 * (p + 1),
+                     "image": f"{base_url}/player/{team}/{p}.png" if p < players - missing else f"{base_url}/missing/{team}/{p}.png",
+                     "training_level": p % 2} for p in range(players)],
+    }
+
+def team_images(cache, renderer, base_url, render_cache=None):
+    """O TeamImages do bot sobre o servidor local; sem render_cache, cada imagem é renderizada de novo."""
+    return TeamImages(cache, renderer, render_cache or RenderCache(max_items=0), f"{base_url}/field.png", f"{base_url}/fallback.png",
+                      overall=lambda p: p["overall"] + p.get("training_level", 0))
+
+
+# --- Medição ---
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+def summarize(values):
+    """Resumo em milissegundos de uma lista de durações em segundos."""
+    return {"n": len(values), "p50_ms": percentile(values, 50) * 1000, "p99_ms": percentile(values, 99) * 1000,
+            "mean_ms": sum(values) / len(values) * 1000 if values else 0.0}
+
+def peak_rss_mb():
+    """Pico de RSS da execução inteira, deste processo e do maior processo de render.
+
+    RUSAGE_CHILDREN só conta processos filhos já esperados: chamar depois de
+    renderer.shutdown(wait=True). ru_maxrss vem em KB no Linux e em bytes no macOS.
+    """
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {"self_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+            "workers_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale}
+
+
+class ScenarioRss:
+    """Pico de RSS de um cenário, no bot e no maior processo de render vivo.
+
+    Usa o /proc do Linux: zera o pico (VmHWM) de cada processo no começo do
+    cenário e lê no fim. Sem /proc, devolve o pico do processo desde o início
+    (ru_maxrss) e nada dos processos de render.
+    """
+
+    def __init__(self):
+        self.available = os.path.exists("/proc/self/clear_refs")
+
+    @staticmethod
+    def _children():
+        me = str(os.getpid())
+        pids = []
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat", "r") as f:
+                    # "pid (nome) estado ppid ...": o nome pode ter espaços, então parte do último ")".
+                    if f.read().rsplit(")", 1)[1].split()[1] == me:
+                        pids.append(entry)
+            except (OSError, IndexError):
+                continue
+        return pids
+
+    @staticmethod
+    def _hwm_mb(pid):
+        try:
+            with open(f"/proc/{pid}/status", "r") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+        return 0.0
+
+    def start(self):
+        if not self.available:
+            return
+        for pid in ["self"] + self._children():
+            try:
+                with open(f"/proc/{pid}/clear_refs", "w") as f:
+                    f.write("5")
+            except OSError:
+                pass
+
+    def stop(self):
+        if not self.available:
+            return {"self_mb": peak_rss_mb()["self_mb"], "workers_mb": None}
+        return {"self_mb": self._hwm_mb("self"), "workers_mb": max((self._hwm_mb(pid) for pid in self._children()), default=0.0)}
+
+
+async def bench_stages(http, team, base_url, iterations, formats):
+    """Cada etapa isolada, no processo atual, para ver onde o tempo vai."""
+    timings = defaultdict(list)
+    fonts = _get_fonts()
+    urls = [f"{base_url}/field.png", team["logo"]] + [p["image"] for p in team["players"]]
+    sizes = [None, LOGO_SIZE] + [PLAYER_IMAGE_SIZE] * len(team["players"])
+    for _ in range(iterations):
+        start = time.perf_counter()
+        blobs = await asyncio.gather(*(http.get_bytes(url) for url in urls))
+        timings["network"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        decoded = [Image.open(BytesIO(data)).convert("RGBA") for data in blobs]
+        timings["decode"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for image, size in zip(decoded, sizes):
+            if size:
+                image.thumbnail(size, Image.Resampling.LANCZOS)
+        timings["resize"].append(time.perf_counter() - start)
+
+        field_img, logo_img, *player_imgs = decoded
+        start = time.perf_counter()
+        static = {"key": "bench", "club_name": team["club_name"], "empty_slots": [],
+                  "background": image_payload(field_img), "logo": image_payload(logo_img)}
+        players = [{"name": p["name"].split(" ")[-1], "position": p["position"], "overall": p["overall"], "value": p["value"],
+                    "trained": p["training_level"] > 0, "image": image_payload(img)} for p, img in zip(team["players"], player_imgs)]
+        timings["payload"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        layer = _compose_static_layer(static, fonts)
+        timings["static_layer"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        image = draw_players(layer.copy(), players, fonts)
+        timings["draw"].append(time.perf_counter() - start)
+
+        for image_format in formats:
+            start = time.perf_counter()
+            encode_image(image, image_format)
+            timings[f"encode_{image_format}"].append(time.perf_counter() - start)
+    return {stage: summarize(values) for stage, values in timings.items()}
+
+
+async def render_once(images, team, owner=0):
+    return await images.build(owner, team["players"], team["club_name"], team["logo"])
+
+
+async def bench_end_to_end(http, renderer, teams, base_url, iterations, cache_dir):
+    """Imagens avulsas e lotes pelo pool de render, com cache frio (memória e disco vazios),
+    só com disco (memória limpa) e quente."""
+    results = {}
+    rss = ScenarioRss()
+
+    def fresh_cache(name):
+        return ImageCache(http, tempfile.mkdtemp(prefix=f"{name}-", dir=cache_dir))
+
+    # Avulsas: uma imagem por vez, como um --time depois de mudar o time.
+    for mode in ("cold", "disk", "warm"):
+        cache = fresh_cache(mode)
+        if mode != "cold":
+            await render_once(team_images(cache, renderer, base_url), teams[0])
+        latencies = []
+        rss.start()
+        for _ in range(iterations):
+            if mode == "cold":
+                cache = fresh_cache(mode)
+            elif mode == "disk":
+                cache.clear_memory()
+            start = time.perf_counter()
+            await render_once(team_images(cache, renderer, base_url), teams[0])
+            latencies.append(time.perf_counter() - start)
+        results[f"single_{mode}"] = dict(summarize(latencies), rss=rss.stop())
+
+    # Fotos que falham (trocadas pela substituta, e a imagem não entra no cache) e
+    # imagem já pronta no cache de renders (um --time repetido sem mudanças).
+    cache = fresh_cache("extra")
+    for mode, images, team in (("fallback", team_images(cache, renderer, base_url), fixture_team(base_url, 0, missing=3)),
+                               ("render_cache", team_images(cache, renderer, base_url, RenderCache()), teams[0])):
+        await render_once(images, team)
+        latencies = []
+        rss.start()
+        for _ in range(iterations):
+            start = time.perf_counter()
+            await render_once(images, team)
+            latencies.append(time.perf_counter() - start)
+        results[f"single_{mode}"] = dict(summarize(latencies), rss=rss.stop())
+
+    # Lotes: todos os times de uma vez, com no máximo `workers` pedidos em andamento
+    # (como o generate_team_images do bot, para não estourar a fila).
+    for mode in ("cold", "warm"):
+        cache = fresh_cache(mode)
+        images = team_images(cache, renderer, base_url)
+        if mode == "warm":
+            for team in teams:
+                await render_once(images, team)
+        running = asyncio.Semaphore(renderer.workers)
+        latencies = []
+
+        async def one(team):
+            async with running:
+                start = time.perf_counter()
+                await render_once(images, team)
+                latencies.append(time.perf_counter() - start)
+
+        rss.start()
+        start = time.perf_counter()
+        await asyncio.gather(*(one(team) for team in teams))
+        elapsed = time.perf_counter() - start
+        results[f"batch_{mode}"] = dict(summarize(latencies), teams=len(teams), seconds=elapsed,
+                                        images_per_second=len(teams) / elapsed if elapsed else 0.0, rss=rss.stop())
+    return results
+
+
+async def run(args):
+    fixtures = build_fixtures(teams=args.batch)
+    runner, base_url = await start_fixture_server(fixtures, args.latency_ms)
+    http = HttpClient(limit=args.pool, limit_per_host=args.pool)
+    await http.start()
+    renderer = TeamRenderer(workers=args.workers, max_queue=args.batch, image_format=args.format)
+    teams = [fixture_team(base_url, t) for t in range(args.batch)]
+    formats = [args.format] if args.format_only else list(OUTPUT_FORMATS)
+    try:
+        with tempfile.TemporaryDirectory(prefix="rafut-bench-") as cache_dir:
+            stages = await bench_stages(http, teams[0], base_url, args.iterations, formats)
+            renderer.start()
+            # Sobe os processos antes de medir, para não contar o fork na primeira imagem.
+            await render_once(team_images(ImageCache(http, cache_dir), renderer, base_url), teams[0])
+            end_to_end = await bench_end_to_end(http, renderer, teams, base_url, args.iterations, cache_dir)
+    finally:
+        # Espera os processos de render saírem: só assim entram no RUSAGE_CHILDREN.
+        renderer.shutdown(wait=True)
+        await http.close()
+        await runner.cleanup()
+    return {
+        "config": {"iterations": args.iterations, "batch": args.batch, "workers": args.workers, "format": args.format,
+                   "latency_ms": args.latency_ms, "fixture_bytes": sum(len(data) for data in fixtures.values())},
+        "stages": stages, "end_to_end": end_to_end, "peak_rss": peak_rss_mb(),
+    }
+
+
+def print_report(result):
+    config = result["config"]
+    print(f"🏟️ Benchmark de renderização — {config['iterations']} iterações, lote de {config['batch']}, "
+          f"{config['workers']} processos, formato {config['format']}, latência simulada {config['latency_ms']} ms")
+    print(f"\n{'Etapa':<22}{'p50 (ms)':>12}{'p99 (ms)':>12}{'média (ms)':>12}")
+    for stage, stats in result["stages"].items():
+        print(f"{stage:<22}{stats['p50_ms']:>12.2f}{stats['p99_ms']:>12.2f}{stats['mean_ms']:>12.2f}")
+    print(f"\n{'Ponta a ponta':<22}{'p50 (ms)':>12}{'p99 (ms)':>12}{'imagens/s':>12}{'RSS bot':>10}{'RSS render':>12}")
+    for name, stats in result["end_to_end"].items():
+        throughput = stats.get("images_per_second", 1000 / stats["mean_ms"] if stats["mean_ms"] else 0.0)
+        workers = stats["rss"]["workers_mb"]
+        print(f"{name:<22}{stats['p50_ms']:>12.2f}{stats['p99_ms']:>12.2f}{throughput:>12.2f}"
+              f"{stats['rss']['self_mb']:>10.1f}{workers if workers is not None else float('nan'):>12.1f}")
+    rss = result["peak_rss"]
+    print(f"\nPico de RSS: {rss['self_mb']:.1f} MB (bot) / {rss['workers_mb']:.1f} MB (maior processo de render)")
+
+
+def compare(result, baseline, threshold):
+    """Pioras em relação a um resultado anterior: [(medida, antes, agora)] acima de (1 + threshold) vezes o valor antigo.
+
+    Compara p50/p99 de cada cenário ponta a ponta e o pico de RSS (por cenário e
+    da execução inteira). Medidas que não existem nos dois lados são ignoradas.
+    """
+    regressions = []
+
+    def check(name, before, now):
+        if before and now is not None and now > before * (1 + threshold):
+            regressions.append((name, before, now))
+
+    for scenario, stats in result["end_to_end"].items():
+        old = baseline.get("end_to_end", {}).get(scenario)
+        if not old:
+            continue
+        for key in ("p50_ms", "p99_ms"):
+            check(f"{scenario}.{key}", old.get(key), stats[key])
+        for key in ("self_mb", "workers_mb"):
+            check(f"{scenario}.rss.{key}", old.get("rss", {}).get(key), stats["rss"][key])
+    for key in ("self_mb", "workers_mb"):
+        check(f"peak_rss.{key}", baseline.get("peak_rss", {}).get(key), result["peak_rss"][key])
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do caminho de renderização das imagens de time.")
+    parser.add_argument("--iterations", type=int, default=20, help="repetições por medida")
+    parser.add_argument("--batch", type=int, default=12, help="times no lote")
+    parser.add_argument("--workers", type=int, default=2, help="processos de render")
+    parser.add_argument("--pool", type=int, default=16, help="conexões HTTP simultâneas")
+    parser.add_argument("--format", default="png", choices=sorted(OUTPUT_FORMATS), help="formato de saída do pool de render")
+    parser.add_argument("--format-only", action="store_true", help="medir a codificação só no --format")
+    parser.add_argument("--latency-ms", type=float, default=0, help="atraso artificial do servidor de imagens")
+    parser.add_argument("--json", metavar="ARQUIVO", help="salva o resultado em JSON (para comparar entre versões)")
+    parser.add_argument("--baseline", metavar="ARQUIVO", help="resultado anterior (--json); sai com erro se algo piorar")
+    parser.add_argument("--threshold", type=float, default=0.25, help="piora tolerada em relação ao --baseline (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print_report(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n❌ Pioras acima de {args.threshold:.0%} em relação a {args.baseline}:")
+            for name, before, now in regressions:
+                print(f"  {name}: {before:.2f} -> {now:.2f}")
+            sys.exit(1)
+        print(f"\n✅ Nada piorou mais de {args.threshold:.0%} em relação a {args.baseline}.")
+
+
+if __name__ == "__main__":
+    main()
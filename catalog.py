@@ -0,0 +1,416 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# RafutBot - Catálogo de Jogadores
+# ----------------------------------------------------------------------
+# Índices do catálogo montados uma única vez no carregamento: nomes já
+# normalizados, jogadores por posição, nome -> jogador e listas
+# pré-ordenadas por overall e por valor. Também traz o motor de busca
+# (trigramas + prefixos, com tolerância a erros de digitação) usado no
+# catálogo e nos elencos, o parser em streaming (registros compactos com
+# __slots__) e a fonte do catálogo (Pastebin) com cópia local e
+# requisições condicionais.
+# ----------------------------------------------------------------------
+
+import io
+import os
+import re
+import unicodedata
+from bisect import bisect_right
+from collections import Counter, OrderedDict
+from functools import cached_property
+
+from storage import load_data, save_data
+
+PLAYER_REGEX = re.compile(r'"(.*?)"\s+(https?://[^\s]+)\s+(\d+)\s+([A-Z/]+)\s+(\d+)')
+# Campos que os jogadores dos elencos leem do catálogo (não são gravados no elenco)
+CATALOG_FIELDS = ("image", "overall", "position", "value")
+
+
+def normalize_str(s):
+    return ''.join(c for c in unicodedata.normalize('NFD', s) if unicodedata.category(c) != 'Mn').lower()
+
+_NON_WORD = re.compile(r"[^\w\s]")
+
+def normalize_words(s):
+    """normalize_str sem pontuação e com espaços simples ("Jr." -> "jr")."""
+    return ' '.join(_NON_WORD.sub(' ', normalize_str(s)).split())
+
+
+def _trigrams(text, padded=True):
+    if padded:
+        text = f"  {text} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def _edit_distance(a, b, max_distance):
+    """Levenshtein com corte: devolve max_distance + 1 se passar do limite."""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+class SearchResults(list):
+    """Lista de resultados ranqueados; fuzzy=True quando nenhum nome contém a busca literalmente."""
+    fuzzy = False
+
+
+class SearchIndex:
+    """Índice de busca por nome (e apelido) com ranking por qualidade do casamento.
+
+    Casamentos literais vêm primeiro (nome exato > palavra exata > começo do
+    nome > começo de uma palavra > trecho do nome). Só quando não há nenhum
+    casamento literal entram os aproximados, por similaridade de trigramas e
+    distância de edição.
+    """
+
+    def __init__(self, items, terms=lambda p: (p['name'],), rank_key=None, cache_size=512):
+        self.items = items
+        self.rank_key = rank_key
+        self.terms = [tuple(normalize_str(t) for t in terms(item) if t) for item in items]
+        self.words = [tuple({w for t in item_terms for w in t.split()}) for item_terms in self.terms]
+        self.postings = {}
+        self.prefixes = {}
+        for doc_id, item_terms in enumerate(self.terms):
+            for term in item_terms:
+                for gram in _trigrams(term):
+                    self.postings.setdefault(gram, set()).add(doc_id)
+            for word in self.words[doc_id]:
+                for size in range(1, min(3, len(word)) + 1):
+                    self.prefixes.setdefault(word[:size], set()).add(doc_id)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def _literal_score(self, doc_id, query):
+        best = 0
+        for term in self.terms[doc_id]:
+            if term == query: return 100
+            if term.startswith(query): best = max(best, 90)
+            elif query in term: best = max(best, 60)
+        # "messi" acha "Lionel Messi" antes de "Messijlh Galvir".
+        if query in self.words[doc_id]:
+            return 95
+        if best < 90 and any(w.startswith(query) for w in self.words[doc_id]):
+            best = max(best, 80)
+        return best
+
+    @staticmethod
+    def _max_edits(query):
+        return 1 if len(query) <= 5 else 2
+
+    def _fuzzy_score(self, doc_id, query, query_grams):
+        best = 0.0
+        max_distance = self._max_edits(query)
+        for candidate in self.terms[doc_id] + self.words[doc_id]:
+            grams = _trigrams(candidate)
+            similarity = 2 * len(query_grams & grams) / (len(query_grams) + len(grams))
+            # Levenshtein só para quem tem o tamanho certo e já divide alguns trigramas.
+            if (0.2 <= similarity < 0.45 and abs(len(candidate) - len(query)) <= max_distance
+                    and _edit_distance(query, candidate, max_distance) <= max_distance):
+                similarity = 0.45
+            best = max(best, similarity)
+        return int(50 * best) if best >= 0.45 else 0
+
+    def _literal_candidates(self, query):
+        if len(query) < 3:
+            hits = self.prefixes.get(query)
+            if hits:
+                return hits
+            return range(len(self.items))
+        postings = sorted((self.postings.get(g, ()) for g in _trigrams(query, padded=False)), key=len)
+        if not postings or not postings[0]:
+            return ()
+        return set(postings[0]).intersection(*postings[1:])
+
+    def _fuzzy_candidates(self, query, limit=64):
+        # Só os trigramas de dentro da busca: os das pontas ("  m", " me") estão em
+        # milhares de nomes. Cada erro de digitação estraga no máximo dois trigramas
+        # de uma palavra curta, então o candidato precisa ter quase todos os outros.
+        grams = _trigrams(query, padded=False)
+        minimum = max(1, len(grams) - 2 * self._max_edits(query))
+        counts = {}
+        for gram in grams:
+            for doc_id in self.postings.get(gram, ()):
+                counts[doc_id] = counts.get(doc_id, 0) + 1
+        # Os trigramas das pontas só desempatam, conferidos nos candidatos que sobraram.
+        edges = [self.postings.get(gram, ()) for gram in _trigrams(query) - grams]
+        ranked = sorted(((doc_id, count + sum(doc_id in posting for posting in edges))
+                         for doc_id, count in counts.items() if count >= minimum), key=lambda c: c[1], reverse=True)
+        return [doc_id for doc_id, _ in ranked[:limit]]
+
+    def _rank(self, scored):
+        if self.rank_key:
+            scored.sort(key=lambda s: (-s[0], self.rank_key(self.items[s[1]])))
+        else:
+            scored.sort(key=lambda s: (-s[0], s[1]))
+        return [self.items[doc_id] for _, doc_id in scored]
+
+    def search(self, query):
+        query = normalize_str(query).strip()
+        if not query:
+            return SearchResults()
+        cached = self._cache.get(query)
+        if cached is not None:
+            self._cache.move_to_end(query)
+            return cached
+        scored = [(score, doc_id) for doc_id in self._literal_candidates(query) if (score := self._literal_score(doc_id, query))]
+        results = SearchResults(self._rank(scored))
+        if not scored and len(query) >= 3:
+            query_grams = _trigrams(query)
+            scored = [(score, doc_id) for doc_id in self._fuzzy_candidates(query) if (score := self._fuzzy_score(doc_id, query, query_grams))]
+            results = SearchResults(self._rank(scored)); results.fuzzy = True
+        if self.cache_size:
+            self._cache[query] = results
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return results
+
+
+def search_owned(players, query):
+    """Busca em um elenco/time (ignora vagas vazias) por nome ou apelido."""
+    players = [p for p in players if p]
+    index = SearchIndex(players, terms=lambda p: (p['name'], p.get('nickname')), rank_key=lambda p: p['name'], cache_size=0)
+    return index.search(query)
+
+
+class PlayerCatalog:
+    """Catálogo imutável de jogadores com índices pré-calculados."""
+
+    def __init__(self, players):
+        self.players = players
+        self.by_name = {p['name']: p for p in players}
+        self.search_index = SearchIndex(players, rank_key=lambda p: -p['overall'])
+        self.by_overall = sorted(players, key=lambda p: p['overall'], reverse=True)
+        self.by_value = sorted(players, key=lambda p: p['value'], reverse=True)
+        self._values_ascending = [p['value'] for p in reversed(self.by_value)]
+        # Posições múltiplas ("ZAG/LD") entram em cada uma; cada lista mantém a ordem por overall.
+        self.by_position = {}
+        for p in self.by_overall:
+            for pos in p['position'].split('/'):
+                self.by_position.setdefault(pos, []).append(p)
+
+    def __len__(self):
+        return len(self.players)
+
+    def __iter__(self):
+        return iter(self.players)
+
+    def __bool__(self):
+        return bool(self.players)
+
+    def get(self, name):
+        return self.by_name.get(name)
+
+    @cached_property
+    def surname_counts(self):
+        """Quantos jogadores têm cada sobrenome (normalizado), para saber se ele é ambíguo."""
+        return Counter(words.split()[-1] for p in self.players if (words := normalize_words(p['name'])))
+
+    def at_position(self, position):
+        """Jogadores que atuam na posição, do maior para o menor overall."""
+        return self.by_position.get(position, [])
+
+    def cheaper_than(self, max_value):
+        """Jogadores com valor <= max_value, sem percorrer o catálogo inteiro."""
+        count = bisect_right(self._values_ascending, max_value)
+        return self.by_value[len(self.by_value) - count:]
+
+    def search(self, query):
+        """Busca ranqueada (e tolerante a erros de digitação) no catálogo inteiro."""
+        return self.search_index.search(query)
+
+
+class Player:
+    """Registro compacto de um jogador do catálogo (__slots__, sem dict por instância).
+
+    Aceita leitura no estilo dicionário (p['name'], p.get('overall')) para o
+    resto do código continuar igual. É somente leitura: os jogadores dos
+    elencos são OwnedPlayer, que apontam para o catálogo pelo nome.
+    """
+    __slots__ = ("name", "image", "overall", "position", "value")
+
+    def __init__(self, name, image, overall, position, value):
+        self.name = name; self.image = image; self.overall = overall; self.position = position; self.value = value
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in self.__slots__ else default
+
+    def __contains__(self, key):
+        return key in self.__slots__
+
+    def to_dict(self):
+        return {f: getattr(self, f) for f in self.__slots__}
+
+    def __repr__(self):
+        return f"Player({self.name!r}, OVR {self.overall}, {self.position})"
+
+
+# Catálogo consultado pelos jogadores dos elencos; trocado por use_catalog() a cada recarga.
+_active_catalog = None
+
+def use_catalog(catalog):
+    global _active_catalog
+    _active_catalog = catalog
+
+
+class OwnedPlayer:
+    """Jogador de um elenco: referência ao catálogo (o nome) mais os campos da posse.
+
+    Imagem, overall, posição e valor são lidos do catálogo ativo a cada acesso,
+    então uma atualização do catálogo vale na hora para todos os elencos. Se o
+    jogador sair do catálogo, last_known guarda os últimos dados conhecidos,
+    que passam a ser gravados junto com o elenco.
+    """
+    __slots__ = ("name", "nickname", "training_level", "last_known")
+    OWN_FIELDS = ("name", "nickname", "training_level")
+
+    def __init__(self, name, nickname=None, training_level=0, last_known=None):
+        self.name = name; self.nickname = nickname; self.training_level = training_level; self.last_known = last_known
+
+    @classmethod
+    def from_catalog(cls, player):
+        return cls(player['name'])
+
+    @classmethod
+    def from_record(cls, record):
+        """Aceita o formato enxuto e o antigo (cópia completa do catálogo, que vira last_known)."""
+        last_known = None
+        if record.get('overall') is not None:
+            last_known = Player(record['name'], record.get('image') or "", record['overall'],
+                                record.get('position') or "?", record.get('value') or 0)
+        return cls(record['name'], record.get('nickname'), record.get('training_level') or 0, last_known)
+
+    @property
+    def in_catalog(self):
+        return _active_catalog is not None and self.name in _active_catalog.by_name
+
+    @property
+    def record(self):
+        """Dados de catálogo do jogador: o catálogo ativo, senão os últimos conhecidos."""
+        player = _active_catalog.get(self.name) if _active_catalog is not None else None
+        if player is None:
+            player = self.last_known or Player(self.name, "", 0, "?", 0)
+        return player
+
+    def __getitem__(self, key):
+        if key in self.OWN_FIELDS:
+            return getattr(self, key)
+        return self.record[key]
+
+    def get(self, key, default=None):
+        if key in self.OWN_FIELDS:
+            return getattr(self, key)
+        return self.record.get(key, default)
+
+    def __setitem__(self, key, value):
+        if key not in ("nickname", "training_level"):
+            raise KeyError(f"{key} vem do catálogo e não pode ser alterado no elenco")
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.OWN_FIELDS or key in CATALOG_FIELDS
+
+    def to_record(self):
+        record = {"name": self.name, "nickname": self.nickname, "training_level": self.training_level}
+        if self.last_known is not None and not self.in_catalog:
+            record.update({f: getattr(self.last_known, f) for f in CATALOG_FIELDS})
+        return record
+
+    def __repr__(self):
+        return f"OwnedPlayer({self.name!r}, nickname={self.nickname!r}, training_level={self.training_level})"
+
+
+def iter_parse_players(lines, errors=None):
+    """Lê o catálogo linha a linha; linhas inválidas vão para errors como (nº da linha, trecho)."""
+    for line_no, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        match = PLAYER_REGEX.match(line)
+        if match is None:
+            if errors is not None:
+                errors.append((line_no, line[:80]))
+            continue
+        yield Player(match.group(1), match.group(2), int(match.group(3)), match.group(4), int(match.group(5)))
+
+def parse_players(lines, errors=None):
+    """Converte o catálogo (texto ou iterável de linhas) na lista de jogadores, sem copiar o texto inteiro."""
+    if isinstance(lines, str):
+        lines = io.StringIO(lines)
+    return list(iter_parse_players(lines, errors))
+
+def report_parse_errors(errors, limit=5):
+    if not errors:
+        return
+    print(f"⚠️ {len(errors)} linhas do catálogo ignoradas por formato inválido.")
+    for line_no, snippet in errors[:limit]:
+        print(f"   linha {line_no}: {snippet}")
+
+def diff_catalogs(old, new):
+    """Jogadores presentes nos dois catálogos cujos dados mudaram: nome -> jogador novo."""
+    changed = {}
+    for p in new:
+        previous = old.get(p['name'])
+        if previous is not None and any(previous[f] != p[f] for f in CATALOG_FIELDS):
+            changed[p['name']] = p
+    return changed
+
+
+class CatalogSource:
+    """Fonte remota do catálogo com última cópia boa em disco e requisições condicionais (ETag/Last-Modified)."""
+
+    def __init__(self, url, cache_file, timeout=15):
+        self.url = url
+        self.cache_file = cache_file
+        self.meta_file = f"{cache_file}.meta.json"
+        self.timeout = timeout
+        self.meta = load_data(self.meta_file, {})
+        self.download_file = f"{cache_file}.download"
+
+    def load_cached(self, errors=None):
+        """Jogadores da última cópia boa em disco (lida em streaming), ou None se não houver cópia."""
+        if not os.path.exists(self.cache_file):
+            return None
+        with open(self.cache_file, 'r', encoding='utf-8') as f:
+            return parse_players(f, errors)
+
+    async def download(self, http):
+        """Baixa o catálogo em streaming para um arquivo temporário pela sessão compartilhada.
+
+        Devolve os validadores HTTP, ou None se o catálogo não mudou (HTTP 304).
+        O arquivo só vira a cópia boa quando store() é chamado.
+        """
+        headers = {}
+        if self.meta.get('etag'): headers['If-None-Match'] = self.meta['etag']
+        if self.meta.get('last_modified'): headers['If-Modified-Since'] = self.meta['last_modified']
+        async with http.stream(self.url, headers=headers, timeout=self.timeout) as response:
+            if response.status == 304:
+                return None
+            response.raise_for_status()
+            with open(self.download_file, 'wb') as f:
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    f.write(chunk)
+            return {'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified')}
+
+    def parse_download(self, errors=None):
+        """Jogadores do último download, lidos linha a linha. Bloqueante: rodar fora do loop."""
+        with open(self.download_file, 'r', encoding='utf-8', errors='replace') as f:
+            return parse_players(f, errors)
+
+    def store(self, validators):
+        """Promove o último download a cópia boa e guarda os validadores HTTP."""
+        os.replace(self.download_file, self.cache_file)
+        self.meta = validators
+        save_data(self.meta_file, self.meta)
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# RafutBot - Adivinhe o Jogador
+# ----------------------------------------------------------------------
+# Rodadas do --guesstheplayer preparadas em segundo plano: um produtor
+# mantém uma pequena fila de rodadas prontas (jogador + imagem borrada),
+# então o comando responde na hora. Cada rodada já traz o conjunto de
+# respostas aceitas normalizado, e a conferência das mensagens do chat é
+# só uma busca nesse conjunto.
+# ----------------------------------------------------------------------
+
+import asyncio
+from io import BytesIO
+
+from PIL import ImageFilter
+
+from catalog import normalize_words
+
+
+def blur_png(image, radius=15):
+    """PNG da imagem borrada. Bloqueante: rodar fora do loop."""
+    buffer = BytesIO()
+    image.filter(ImageFilter.GaussianBlur(radius)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def answer_aliases(name, surname_counts=None):
+    """Respostas aceitas para um jogador, já normalizadas.
+
+    Nome completo (com e sem acentos/pontuação), primeiro + último nome e,
+    se nenhum outro jogador do catálogo tiver o mesmo sobrenome, só o sobrenome.
+    """
+    full = normalize_words(name)
+    aliases = {full, name.strip().casefold()}
+    words = full.split()
+    if len(words) > 2:
+        aliases.add(f"{words[0]} {words[-1]}")
+    if len(words) > 1 and len(words[-1]) >= 4 and surname_counts is not None and surname_counts.get(words[-1]) == 1:
+        aliases.add(words[-1])
+    return aliases
+
+
+class GuessRound:
+    """Uma rodada pronta: o jogador, a imagem borrada e as respostas aceitas."""
+
+    def __init__(self, player, image_bytes, answers):
+        self.player = player
+        self.image_bytes = image_bytes
+        self.answers = frozenset(answers)
+        self.min_len = min(len(a) for a in self.answers)
+        self.max_len = max(len(a) for a in self.answers) + 4
+
+    def matches(self, text):
+        """True se a mensagem acerta o jogador. Mensagens fora do tamanho das respostas nem são normalizadas."""
+        text = text.strip()
+        if not self.min_len <= len(text) <= self.max_len:
+            return False
+        lowered = text.casefold()
+        return lowered in self.answers or normalize_words(lowered) in self.answers
+
+
+class GuessPool:
+    """Fila de rodadas prontas, reabastecida por uma tarefa em segundo plano.
+
+    make_round é uma corrotina que monta uma GuessRound; falhas (catálogo
+    vazio, imagem fora do ar) só fazem o produtor esperar e tentar de novo.
+    """
+
+    def __init__(self, make_round, size=3, retry_delay=30.0):
+        self.make_round = make_round
+        self.size = size
+        self.retry_delay = retry_delay
+        self._rounds = asyncio.Queue(maxsize=size)
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._produce())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _produce(self):
+        while True:
+            try:
+                new_round = await self.make_round()
+            except Exception as e:
+                print(f"⚠️ Não foi possível preparar uma rodada do Adivinhe o Jogador: {e}")
+                await asyncio.sleep(self.retry_delay)
+                continue
+            await self._rounds.put(new_round)
+
+    async def take(self):
+        """Uma rodada pronta da fila; se estiver vazia, monta uma na hora."""
+        try:
+            return self._rounds.get_nowait()
+        except asyncio.QueueEmpty:
+            return await self.make_round()
+
+    def clear(self):
+        """Descarta as rodadas prontas (ex.: depois que o catálogo mudou)."""
+        while not self._rounds.empty():
+            self._rounds.get_nowait()
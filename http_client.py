@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# RafutBot - Cliente HTTP
+# ----------------------------------------------------------------------
+# Uma única sessão aiohttp para todas as buscas externas do bot (imagens
+# de jogadores, fundo do campo, logos e catálogo). As conexões ficam num
+# pool reaproveitado, com limite total e por host, e toda requisição tem
+# timeout: um host de imagens lento não trava mais o loop do discord.py.
+# ----------------------------------------------------------------------
+
+import aiohttp
+
+
+class HttpClient:
+    """Sessão aiohttp compartilhada, criada no setup_hook e fechada no close do bot."""
+
+    def __init__(self, limit=64, limit_per_host=8, timeout=15.0, connect_timeout=5.0):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self._session = None
+
+    async def start(self):
+        """Abre a sessão (precisa de um loop ativo)."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout, headers={"User-Agent": "RafutBot"})
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    @property
+    def session(self):
+        if self._session is None or self._session.closed:
+            raise RuntimeError("Sessão HTTP não iniciada: chame HttpClient.start() antes.")
+        return self._session
+
+    def _timeout(self, timeout):
+        return {"timeout": aiohttp.ClientTimeout(total=timeout, connect=self.timeout.connect)} if timeout else {}
+
+    def stream(self, url, headers=None, timeout=None):
+        """Context manager da resposta, para ler o corpo aos poucos (response.content)."""
+        return self.session.get(url, headers=headers, **self._timeout(timeout))
+
+    async def get_bytes(self, url, timeout=None):
+        """Corpo inteiro de uma URL; levanta exceção em erro HTTP ou timeout."""
+        async with self.session.get(url, **self._timeout(timeout)) as response:
+            response.raise_for_status()
+            return await response.read()
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# RafutBot - Cache de Imagens
+# ----------------------------------------------------------------------
+# Fotos de jogadores, logos e o fundo do campo em dois níveis: na memória
+# ficam as imagens já decodificadas e reduzidas (LRU); no disco (/data)
+# ficam os bytes originais, endereçados pelo conteúdo, com TTL e limite
+# de tamanho. Com o cache quente, montar um time não faz nenhuma
+# requisição de rede.
+# ----------------------------------------------------------------------
+
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from io import BytesIO
+
+from PIL import Image
+
+
+def _decode(data, size):
+    image = Image.open(BytesIO(data)).convert("RGBA")
+    if size:
+        image.thumbnail(size, Image.Resampling.LANCZOS)
+    return image
+
+
+class ImageCache:
+    """Cache de imagens em memória e em disco na frente do HttpClient.
+
+    No disco, blobs/<sha256 do conteúdo> guarda os bytes e urls/<sha1 da URL>
+    guarda o hash do conteúdo baixado daquela URL (o mtime do arquivo é a data
+    do download). URLs diferentes com a mesma imagem dividem o mesmo blob.
+    Entradas vencidas (TTL) são baixadas de novo; se o download falhar, a cópia
+    antiga continua sendo usada. Passando de max_disk_bytes, os blobs usados há
+    mais tempo são apagados.
+
+    As imagens devolvidas são compartilhadas entre chamadas: não as altere
+    (use .copy() antes de desenhar nelas).
+    """
+
+    def __init__(self, http, directory, max_items=256, max_disk_bytes=256 * 1024 * 1024,
+                 ttl=7 * 24 * 3600, negative_ttl=600):
+        self.http = http
+        self.directory = directory
+        self.max_items = max_items
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._memory = OrderedDict()
+        self._failures = {}
+        self._inflight = {}
+        self._disk_lock = threading.Lock()
+        self._disk_bytes = None
+
+    # --- Memória ---
+    async def get(self, url, size=None, timeout=None, keep_in_memory=True):
+        """Imagem RGBA da URL, reduzida para caber em size (largura, altura) se informado.
+
+        keep_in_memory=False não guarda a imagem no LRU de memória (só no disco):
+        para imagens de uso único, que só tirariam do cache as que se repetem.
+        """
+        key = (url, size)
+        image = self._memory.get(key)
+        if image is not None:
+            self._memory.move_to_end(key)
+            return image
+        failure = self._failures.get(url)
+        if failure is not None:
+            if failure[0] > time.monotonic():
+                raise failure[1]
+            del self._failures[url]
+        # Pedidos simultâneos da mesma imagem esperam o mesmo download.
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(url, size, timeout, keep_in_memory))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _load(self, url, size, timeout, keep_in_memory=True):
+        try:
+            cached = await asyncio.to_thread(self._read_disk, url)
+            if cached is None or not cached[1]:
+                try:
+                    data = await self.http.get_bytes(url, timeout)
+                except Exception:
+                    if cached is None:
+                        raise
+                    data = cached[0]
+                else:
+                    await asyncio.to_thread(self._write_disk, url, data)
+            else:
+                data = cached[0]
+            image = await asyncio.to_thread(_decode, data, size)
+        except Exception as e:
+            self._failures[url] = (time.monotonic() + self.negative_ttl, e)
+            raise
+        if keep_in_memory:
+            self._memory[(url, size)] = image
+            if len(self._memory) > self.max_items:
+                self._memory.popitem(last=False)
+        return image
+
+    def clear_memory(self):
+        self._memory.clear()
+        self._failures.clear()
+
+    # --- Disco ---
+    def _blob_path(self, digest):
+        return os.path.join(self.directory, "blobs", digest)
+
+    def _ref_path(self, url):
+        return os.path.join(self.directory, "urls", hashlib.sha1(url.encode("utf-8")).hexdigest())
+
+    def _read_disk(self, url):
+        """(bytes, ainda_no_ttl) da cópia em disco, ou None."""
+        ref_path = self._ref_path(url)
+        try:
+            with open(ref_path, "r", encoding="ascii") as f:
+                digest = f.read().strip()
+            fresh = time.time() - os.path.getmtime(ref_path) < self.ttl
+            blob_path = self._blob_path(digest)
+            with open(blob_path, "rb") as f:
+                data = f.read()
+            os.utime(blob_path)  # marca o uso para a remoção por tamanho
+        except (OSError, ValueError):
+            return None
+        return data, fresh
+
+    def _write_atomic(self, path, payload, mode):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, mode) as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+    def _write_disk(self, url, data):
+        digest = hashlib.sha256(data).hexdigest()
+        blob_path = self._blob_path(digest)
+        with self._disk_lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_disk_bytes()
+            if not os.path.exists(blob_path):
+                self._write_atomic(blob_path, data, "wb")
+                self._disk_bytes += len(data)
+            else:
+                os.utime(blob_path)
+            self._write_atomic(self._ref_path(url), digest, "w")
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict()
+
+    def _scan_disk_bytes(self):
+        blobs_dir = os.path.join(self.directory, "blobs")
+        if not os.path.isdir(blobs_dir):
+            return 0
+        return sum(entry.stat().st_size for entry in os.scandir(blobs_dir) if entry.is_file())
+
+    def _evict(self):
+        """Apaga os blobs usados há mais tempo até ficar abaixo de 90% do limite (chamado com o lock)."""
+        blobs_dir = os.path.join(self.directory, "blobs")
+        entries = sorted((e for e in os.scandir(blobs_dir) if e.is_file()), key=lambda e: e.stat().st_mtime)
+        target = self.max_disk_bytes * 0.9
+        removed = set()
+        for entry in entries:
+            if self._disk_bytes <= target:
+                break
+            size = entry.stat().st_size
+            try:
+                os.remove(entry.path)
+            except OSError:
+                continue
+            self._disk_bytes -= size
+            removed.add(entry.name)
+        # Referências para blobs apagados só ocupariam espaço.
+        urls_dir = os.path.join(self.directory, "urls")
+        for entry in os.scandir(urls_dir):
+            try:
+                with open(entry.path, "r", encoding="ascii") as f:
+                    if f.read().strip() in removed:
+                        os.remove(entry.path)
+            except OSError:
+                pass
@@ -7,31 +7,97 @@
 # ----------------------------------------------------------------------
 
 import discord
-from discord.ext import commands
-import requests
-import json
+from discord.ext import commands, tasks
 import os
 import random
-import re
 import asyncio
-import unicodedata
-from PIL import Image, ImageDraw, ImageFont, UnidentifiedImageError, ImageFilter
+import contextlib
+import weakref
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
 from keep_alive import keep_alive
+from http_client import HttpClient
+from image_cache import ImageCache
+from guess_game import GuessPool, GuessRound, answer_aliases, blur_png
+from narration import NarrationService
+from commentary import LocalCommentary
+from match_engine import TeamSheet, simulate_match, HALF_TIME_MINUTE
+from predictor import predict_match
+from tournament import run_league, run_cup
+from message_edits import EditCoalescer
+from match_manager import MatchManager, MatchLimitReached
+from render import TeamRenderer, TeamImages, RendererBusy, RenderCache, PLAYER_IMAGE_SIZE
+from storage import load_data, save_data, UserStore, SqliteUserStore, ContractRegistry
+from catalog import PlayerCatalog, CatalogSource, OwnedPlayer, use_catalog, normalize_str, search_owned, diff_catalogs, report_parse_errors
 import google.generativeai as genai
 from datetime import datetime, timedelta
+from itertools import islice
+from collections import Counter, namedtuple
 
 # --- CONFIGURAÇÕES GERAIS ---
 BOT_PREFIX = "--"
 PASTEBIN_URL = "https://pastebin.com/raw/YpjKyzdw"
+FIELD_BACKGROUND_URL = "https://i.ibb.co/5W8Rvh2F/uaaaa.png"
+PLAYER_FALLBACK_IMAGE_URL = "https://i.imgur.com/M43Amw2.png"
+# Conexões simultâneas por host de imagens (o pool total é HTTP_POOL_SIZE)
+HTTP_POOL_SIZE = int(os.environ.get('RAFUT_HTTP_POOL_SIZE', 64))
+HTTP_PER_HOST_LIMIT = int(os.environ.get('RAFUT_HTTP_PER_HOST', 8))
+# Cache de imagens: itens decodificados em memória, limite do disco (MB) e validade (horas)
+IMAGE_CACHE_DIR = "/data/rafutbot_image_cache"
+IMAGE_CACHE_MEMORY_ITEMS = int(os.environ.get('RAFUT_IMAGE_CACHE_ITEMS', 256))
+IMAGE_CACHE_DISK_MB = int(os.environ.get('RAFUT_IMAGE_CACHE_MB', 256))
+IMAGE_CACHE_TTL_HOURS = float(os.environ.get('RAFUT_IMAGE_CACHE_TTL_HOURS', 168))
+# Render das imagens de time: processos do pool e pedidos que podem esperar na fila
+RENDER_WORKERS = int(os.environ.get('RAFUT_RENDER_WORKERS', 2))
+RENDER_QUEUE_SIZE = int(os.environ.get('RAFUT_RENDER_QUEUE', 8))
+RENDER_CACHE_ITEMS = int(os.environ.get('RAFUT_RENDER_CACHE_ITEMS', 128))
+# Formato das imagens enviadas ao Discord: "png", "png-optimized" (menor, mais lento) ou "webp" (bem menor)
+RENDER_FORMAT = os.environ.get('RAFUT_RENDER_FORMAT', 'png')
+# Quantos times entram no quadro do --rankingovr quadro
+RANKING_SHEET_SIZE = int(os.environ.get('RAFUT_RANKING_SHEET_SIZE', 6))
+# Rodadas do --guesstheplayer mantidas prontas em segundo plano
+GUESS_POOL_SIZE = int(os.environ.get('RAFUT_GUESS_POOL_SIZE', 3))
+GUESS_IMAGE_SIZE = (360, 468) # Tamanho máximo da foto borrada do --guesstheplayer
+# Narração da IA nas partidas: chamadas simultâneas à API e tempo máximo (s) que um lance espera por ela,
+# contado desde a decisão do lance (já inclui a pausa de 2s do --confrontar)
+NARRATION_CONCURRENCY = int(os.environ.get('RAFUT_NARRATION_CONCURRENCY', 4))
+NARRATION_BUDGET_SECONDS = float(os.environ.get('RAFUT_NARRATION_BUDGET', 2.5))
+# Partidas simuladas por --prever (com NumPy; sem ele o previsor usa no máximo 1000)
+PREDICTION_SIMULATIONS = int(os.environ.get('RAFUT_PREDICTION_SIMULATIONS', 10000))
+# Processos usados para simular os torneios (--liga, --copa)
+TOURNAMENT_WORKERS = int(os.environ.get('RAFUT_TOURNAMENT_WORKERS', 2))
+# Edições de mensagens animadas (partidas, foguete, tigrinho): cota por canal (edições a cada N s)
+# e intervalo mínimo entre edições da mesma mensagem; quadros que excedem a cota são juntados
+MESSAGE_EDIT_RATE = int(os.environ.get('RAFUT_EDIT_RATE', 5))
+MESSAGE_EDIT_PER_SECONDS = float(os.environ.get('RAFUT_EDIT_PER_SECONDS', 5))
+MESSAGE_EDIT_MIN_INTERVAL = float(os.environ.get('RAFUT_EDIT_MIN_INTERVAL', 1.0))
+# Partidas do --confrontar que um mesmo usuário pode jogar ao mesmo tempo
+MAX_MATCHES_PER_USER = int(os.environ.get('RAFUT_MAX_MATCHES_PER_USER', 1))
+# Ritmo do --confrontar: pausa antes de cada lance e duração do lance (s)
+MATCH_TICK_SECONDS = 1.5
+MATCH_PLAY_SECONDS = 2.0
+RENDER_BUSY_MESSAGE = "⏳ Muitas imagens sendo geradas agora. Tente de novo em alguns segundos."
 # Caminhos de arquivo para persistência no Railway/Render (Volume)
 USER_DATA_FILE = "/data/rafutbot_user_data.json"
 CONTRACTED_PLAYERS_FILE = "/data/rafutbot_contracted_players.json"
 GLOBAL_STATS_FILE = "/data/rafutbot_global_stats.json"
-GAME_STATE_FILE = "/data/rafutbot_game_state.json" # Para o minigame
+GUILD_SETTINGS_FILE = "/data/rafutbot_guild_settings.json" # Preferências por servidor (ex.: narrador)
+LIVE_MATCHES_FILE = "/data/rafutbot_live_matches.json" # Checkpoint das partidas no ar (retomadas depois de uma queda)
+CATALOG_CACHE_FILE = "/data/rafutbot_catalog.txt" # Última cópia boa do Pastebin
+CATALOG_REFRESH_MINUTES = float(os.environ.get('RAFUT_CATALOG_REFRESH_MINUTES', 30))
 INITIAL_MONEY = 1000000000
 SALE_PERCENTAGE = 0.5
 DAILY_REWARD = 25000000
+# Write-behind dos dados de usuários: intervalo (s) e nº de usuários alterados que forçam gravação
+USER_FLUSH_INTERVAL = float(os.environ.get('RAFUT_FLUSH_INTERVAL', 30))
+USER_FLUSH_THRESHOLD = int(os.environ.get('RAFUT_FLUSH_THRESHOLD', 50))
+# Modo de persistência: "journal" (append por alteração + snapshot compactado), "snapshot" (só write-behind)
+# ou "sqlite" (tabelas normalizadas; migra os arquivos JSON na primeira execução)
+STORAGE_MODE = os.environ.get('RAFUT_STORAGE', 'journal')
+USER_JOURNAL_FILE = "/data/rafutbot_user_data.journal"
+SQLITE_DB_FILE = "/data/rafutbot.db"
+JOURNAL_COMPACT_INTERVAL = float(os.environ.get('RAFUT_COMPACT_INTERVAL', 600))
+JOURNAL_COMPACT_THRESHOLD = int(os.environ.get('RAFUT_COMPACT_THRESHOLD', 5000))
 
 # --- CONFIGURAÇÃO DA IA GEMINI ---
 try:
@@ -49,11 +115,98 @@ except Exception as e:
 
 # --- MAPEAMENTO E INICIALIZAÇÃO ---
 SLOT_MAPPING = {"GOL": [0], "ZAG": [1, 2], "LE": [3], "LD": [4], "VOL": [5], "MC": [6], "MEI": [7], "PE": [8], "PD": [9], "CA": [10]}
-POSITIONS_COORDS = {0: (350, 780), 1: (180, 650), 2: (520, 650), 3: (60, 550), 4: (640, 550), 5: (350, 500), 6: (220, 370), 7: (480, 370), 8: (90, 200), 9: (610, 200), 10: (350, 160)}
-ALL_PLAYERS = []
-data_lock = asyncio.Lock()
+catalog = PlayerCatalog([]); use_catalog(catalog)
+catalog_source = CatalogSource(PASTEBIN_URL, CATALOG_CACHE_FILE)
+http = HttpClient(limit=HTTP_POOL_SIZE, limit_per_host=HTTP_PER_HOST_LIMIT)
+image_cache = ImageCache(http, IMAGE_CACHE_DIR, max_items=IMAGE_CACHE_MEMORY_ITEMS,
+                         max_disk_bytes=IMAGE_CACHE_DISK_MB * 1024 * 1024, ttl=IMAGE_CACHE_TTL_HOURS * 3600)
+renderer = TeamRenderer(workers=RENDER_WORKERS, max_queue=RENDER_QUEUE_SIZE, image_format=RENDER_FORMAT)
+render_cache = RenderCache(max_items=RENDER_CACHE_ITEMS)
+team_images = TeamImages(image_cache, renderer, render_cache, FIELD_BACKGROUND_URL, PLAYER_FALLBACK_IMAGE_URL,
+                         overall=lambda player: get_player_effective_overall(player))
+async def gemini_generate(prompt_text):
+    response = await gemini_model.generate_content_async(prompt_text, safety_settings={'HARM_CATEGORY_HARASSMENT':'block_none'})
+    return response.text.strip()
+commentary = LocalCommentary()
+narration = NarrationService(gemini_generate if gemini_model else None, commentary, max_concurrency=NARRATION_CONCURRENCY, budget=NARRATION_BUDGET_SECONDS)
+match_manager = MatchManager(LIVE_MATCHES_FILE, max_per_user=MAX_MATCHES_PER_USER,
+                             resolver=lambda checkpoint: resolve_interrupted_match(checkpoint))
+message_edits = EditCoalescer(rate=MESSAGE_EDIT_RATE, per=MESSAGE_EDIT_PER_SECONDS, min_interval=MESSAGE_EDIT_MIN_INTERVAL)
+# Rodada em andamento do --guesstheplayer em cada canal (só em memória)
+active_guess_rounds = {}
+
+class LockManager:
+    """Locks por usuário, mais um lock para o registro de contratados e outro para as estatísticas globais.
+
+    Para evitar deadlock, quem precisa de vários locks os pega sempre pelo hold(), que segue
+    uma ordem fixa: usuários em ordem crescente de id, depois contratados, depois estatísticas.
+    Nunca segure um lock enquanto espera a resposta de uma pessoa (botões, wait_for).
+    """
+    def __init__(self):
+        self._user_locks = weakref.WeakValueDictionary()
+        self.contracts = asyncio.Lock()
+        self.stats = asyncio.Lock()
+
+    def user(self, user_id):
+        key = str(user_id)
+        lock = self._user_locks.get(key)
+        if lock is None:
+            lock = asyncio.Lock(); self._user_locks[key] = lock
+        return lock
+
+    @contextlib.asynccontextmanager
+    async def hold(self, *user_ids, contracts=False, stats=False):
+        ordered_ids = sorted({str(uid) for uid in user_ids}, key=lambda uid: (len(uid), uid))
+        to_acquire = [self.user(uid) for uid in ordered_ids]
+        if contracts: to_acquire.append(self.contracts)
+        if stats: to_acquire.append(self.stats)
+        async with contextlib.AsyncExitStack() as stack:
+            for lock in to_acquire:
+                await stack.enter_async_context(lock)
+            yield
+
+locks = LockManager()
+contracts = ContractRegistry(CONTRACTED_PLAYERS_FILE, flush_interval=USER_FLUSH_INTERVAL)
+if STORAGE_MODE == 'sqlite':
+    user_store = SqliteUserStore(
+        SQLITE_DB_FILE, flush_interval=USER_FLUSH_INTERVAL, flush_threshold=USER_FLUSH_THRESHOLD,
+        documents={CONTRACTED_PLAYERS_FILE: 'contracts', GLOBAL_STATS_FILE: 'global_stats'},
+        legacy_user_file=USER_DATA_FILE, legacy_journal_file=USER_JOURNAL_FILE,
+        player_factory=OwnedPlayer.from_record,
+    )
+else:
+    user_store = UserStore(
+        USER_DATA_FILE, flush_interval=USER_FLUSH_INTERVAL, flush_threshold=USER_FLUSH_THRESHOLD,
+        journal_file=USER_JOURNAL_FILE if STORAGE_MODE == 'journal' else None,
+        compact_interval=JOURNAL_COMPACT_INTERVAL, compact_threshold=JOURNAL_COMPACT_THRESHOLD,
+        player_factory=OwnedPlayer.from_record,
+    )
+
+class RafutBot(commands.Bot):
+    async def setup_hook(self):
+        await http.start()
+        renderer.start()
+        user_store.start()
+        contracts.reconcile(user_store.all())
+        contracts.start()
+        load_cached_catalog()
+        refresh_catalog_loop.start()
+        guess_pool.start()
+        self.match_recovery = asyncio.create_task(recover_interrupted_matches())
+
+    async def close(self):
+        await match_manager.stop()
+        await guess_pool.stop()
+        await narration.close()
+        await message_edits.close()
+        await user_store.stop()
+        await contracts.stop()
+        await http.close()
+        renderer.shutdown()
+        await super().close()
+
 intents = discord.Intents.default(); intents.message_content = True; intents.members = True
-bot = commands.Bot(command_prefix=BOT_PREFIX, intents=intents, help_command=None)
+bot = RafutBot(command_prefix=BOT_PREFIX, intents=intents, help_command=None)
 
 # --- ESTRUTURAS DE DADOS DOS NOVOS COMANDOS ---
 ACHIEVEMENTS = {
@@ -74,26 +227,6 @@ DAILY_CHALLENGES = [
 ]
 
 # --- FUNÇÕES AUXILIARES ---
-def normalize_str(s):
-    return ''.join(c for c in unicodedata.normalize('NFD', s) if unicodedata.category(c) != 'Mn').lower()
-
-def load_data(filename, default_data=None):
-    if default_data is None:
-        default_data = {}
-    if not os.path.exists(os.path.dirname(filename)):
-        os.makedirs(os.path.dirname(filename))
-    if not os.path.exists(filename):
-        return default_data
-    try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, FileNotFoundError):
-        return default_data
-
-def save_data(filename, data):
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
-
 def get_player_effective_overall(player):
     """Calcula o overall do jogador incluindo o bônus de treino."""
     base_ovr = player.get('overall', 0)
@@ -101,17 +234,17 @@ def get_player_effective_overall(player):
     return base_ovr + training_bonus
     
 async def get_user_data(user_id):
-    user_data = load_data(USER_DATA_FILE, {})
+    user_data = user_store.all()
     user_id_str = str(user_id)
     if user_id_str not in user_data:
-        user_data[user_id_str] = {
+        user_store.create(user_id_str, {
             "squad": [], "team": [None] * 11, "wins": 0, "money": INITIAL_MONEY,
             "last_daily": "2000-01-01T00:00:00", "player_stats": {},
             # Novos campos da V19.1
             "club_name": None, "club_logo": None, "stadium_level": 1,
             "achievements": [], "match_history": [],
             "daily_challenge": {"task_id": None, "completed": True, "date": "2000-01-01"},
-        }
+        })
     # Garantir que todos os campos novos existam para usuários antigos
     if "stadium_level" not in user_data[user_id_str]:
         user_data[user_id_str]["stadium_level"] = 1
@@ -127,30 +260,36 @@ async def get_user_data(user_id):
     
     return user_data
 
-def add_player_defaults(player):
-    """Garante que um jogador tenha os campos de nickname e treino."""
-    if 'nickname' not in player:
-        player['nickname'] = None
-    if 'training_level' not in player:
-        player['training_level'] = 0
-    return player
+def save_user_data(*user_ids):
+    """Registra o estado completo dos usuários; a gravação em disco é feita pelo user_store.
+
+    Dinheiro, elenco, time, treino e apelido têm operações próprias no user_store (add_money,
+    squad_add, squad_remove, team_set, set_training, set_nickname), que custam bem menos no journal.
+    """
+    user_store.mark_dirty(*user_ids)
+
+def new_owned_player(player):
+    """Jogador de elenco para um jogador do catálogo (sem apelido e sem treino)."""
+    return OwnedPlayer.from_catalog(player)
 
 async def check_and_grant_achievement(user_id, achievement_id, ctx=None):
-    """Verifica se um usuário pode receber uma conquista e a concede."""
-    async with data_lock:
+    """Verifica se um usuário pode receber uma conquista e a concede. Não chamar segurando o lock do usuário."""
+    async with locks.hold(user_id):
         all_data = await get_user_data(user_id)
         user_id_str = str(user_id)
         if achievement_id not in all_data[user_id_str]["achievements"]:
             all_data[user_id_str]["achievements"].append(achievement_id)
-            save_data(USER_DATA_FILE, all_data)
+            save_user_data(user_id_str)
             if ctx:
-                ach_info = ACHIEVEMENTS[achievement_id]
-                embed = discord.Embed(
-                    title=f"{ach_info['emoji']} Conquista Desbloqueada! {ach_info['emoji']}",
-                    description=f"**{ach_info['name']}**: {ach_info['desc']}",
-                    color=discord.Color.gold()
-                )
-                await ctx.send(embed=embed)
+                await ctx.send(embed=achievement_embed(achievement_id))
+
+def achievement_embed(achievement_id):
+    ach_info = ACHIEVEMENTS[achievement_id]
+    return discord.Embed(
+        title=f"{ach_info['emoji']} Conquista Desbloqueada! {ach_info['emoji']}",
+        description=f"**{ach_info['name']}**: {ach_info['desc']}",
+        color=discord.Color.gold()
+    )
 
 def get_global_stats():
     return load_data(GLOBAL_STATS_FILE, default_data={"top_scorers": []})
@@ -158,120 +297,126 @@ def get_global_stats():
 def save_global_stats(data):
     save_data(GLOBAL_STATS_FILE, data)
 
-def fetch_and_parse_players():
-    global ALL_PLAYERS
+def add_top_scorers(global_stats, goals):
+    """Soma gols na artilharia global: goals = [(jogador, nome do dono, gols)]."""
+    entries = {item['name']: item for item in global_stats['top_scorers']}
+    for player, owner_name, count in goals:
+        entry = entries.get(player['name'])
+        if entry:
+            entry['goals'] += count
+        else:
+            entry = entries[player['name']] = {'name': player['name'], 'nickname': player.get('nickname'), 'owner_name': owner_name, 'goals': count}
+            global_stats['top_scorers'].append(entry)
+
+def get_guild_settings():
+    return load_data(GUILD_SETTINGS_FILE, default_data={})
+
+def save_guild_settings(data):
+    save_data(GUILD_SETTINGS_FILE, data)
+
+def narrator_for(guild):
+    """Narrador das partidas do servidor: a IA (com o local de reserva) ou só o narrador local."""
+    if guild is None: return narration
+    mode = get_guild_settings().get(str(guild.id), {}).get('narrator', 'ia')
+    return commentary if mode == 'local' else narration
+
+def load_cached_catalog():
+    """Carrega a última cópia boa do catálogo do disco, para o bot já subir com jogadores."""
+    global catalog
+    errors = []
+    players = catalog_source.load_cached(errors)
+    if players:
+        catalog = PlayerCatalog(players); use_catalog(catalog)
+        report_parse_errors(errors)
+        print(f"📦 {len(catalog)} jogadores carregados do cache local.")
+
+def keep_removed_players(old_catalog):
+    """Guarda os últimos dados dos jogadores de elenco que saíram do catálogo novo.
+
+    Os demais não precisam de nada: os elencos leem overall/valor/imagem/posição
+    direto do catálogo ativo.
+    """
+    # Sem await no meio: a verificação inteira acontece de uma vez no loop.
+    for user_id, user in user_store.all().items():
+        touched = False
+        for p in user.get('squad', []):
+            if not p.in_catalog and p.last_known is None and (previous := old_catalog.get(p.name)) is not None:
+                p.last_known = previous; touched = True
+        if touched:
+            save_user_data(user_id)
+
+async def refresh_catalog():
+    """Busca o catálogo no Pastebin sem bloquear o loop e troca o catálogo em memória se ele mudou."""
+    global catalog
     try:
-        response = requests.get(PASTEBIN_URL); response.raise_for_status()
-        lines = response.text.strip().split('\n')
-        player_regex = re.compile(r'"(.*?)"\s+(https?://[^\s]+)\s+(\d+)\s+([A-Z/]+)\s+(\d+)')
-        ALL_PLAYERS = [{"name": match.group(1), "image": match.group(2), "overall": int(match.group(3)), "position": match.group(4), "value": int(match.group(5))} for line in lines if (match := player_regex.match(line.strip()))]
-        print(f"✅ Sucesso! {len(ALL_PLAYERS)} jogadores carregados.")
-    except Exception as e: print(f"❌ Erro ao carregar jogadores: {e}")
+        errors = []
+        validators = await catalog_source.download(http)
+        if validators is None: return False
+        players = await asyncio.to_thread(catalog_source.parse_download, errors)
+        report_parse_errors(errors)
+        if not players:
+            print("⚠️ Catálogo baixado veio vazio; mantendo o catálogo atual.")
+            return False
+        new_catalog = await asyncio.to_thread(PlayerCatalog, players)
+        changed = diff_catalogs(catalog.by_name, players)
+        old_catalog, catalog = catalog, new_catalog
+        use_catalog(catalog)
+        keep_removed_players(old_catalog)
+        guess_pool.clear()
+        await asyncio.to_thread(catalog_source.store, validators)
+        print(f"✅ Sucesso! {len(catalog)} jogadores carregados ({len(changed)} com dados novos).")
+        return True
+    except Exception as e:
+        print(f"❌ Erro ao carregar jogadores: {e}")
+        return False
+
+@tasks.loop(minutes=CATALOG_REFRESH_MINUTES)
+async def refresh_catalog_loop():
+    await refresh_catalog()
 
 async def generate_ai_narration(prompt_text, fallback_text):
-    if not gemini_model: return fallback_text
-    try:
-        response = await gemini_model.generate_content_async(prompt_text, safety_settings={'HARM_CATEGORY_HARASSMENT':'block_none'})
-        return response.text.strip()
-    except Exception as e:
-        print(f"Erro na API Gemini: {e}")
-        return fallback_text
+    return await narration.complete(prompt_text, fallback_text)
+
+async def fetch_image(url, size=None, timeout=None, keep_in_memory=True):
+    """Imagem RGBA pelo cache (memória, disco, rede), reduzida para size; None se não houver URL.
+
+    A imagem é compartilhada pelo cache: use .copy() antes de desenhar nela.
+    """
+    if not url:
+        return None
+    return await image_cache.get(url, size, timeout, keep_in_memory)
+
+async def generate_team_image(team_players, user, images=None):
+    """Imagem do time (com nome e logo do clube): do cache se nada mudou, senão do pool de render.
 
-async def generate_team_image(team_players, user):
-    """Gera a imagem do time, agora com nome e logo do clube."""
+    Pode levantar RendererBusy.
+    """
     user_data = await get_user_data(user.id)
     user_info = user_data[str(user.id)]
     club_name = user_info.get('club_name') or f"Time de {user.display_name}"
     club_logo_url = user_info.get('club_logo')
+    return BytesIO(await team_images.build(user.id, team_players, club_name, club_logo_url, images))
 
-    try:
-        background_url = "https://i.ibb.co/5W8Rvh2F/uaaaa.png"
-        background_response = requests.get(background_url)
-        background_response.raise_for_status()
-        field_img = Image.open(BytesIO(background_response.content)).convert("RGBA")
-    except Exception as e:
-        print(f"Erro ao carregar imagem de fundo: {e}. Usando fallback.")
-        field_img = Image.new("RGB", (700, 900), color=(8, 43, 27))
+async def generate_team_images(entries):
+    """Imagens de vários times [(user, time)], entregues como (user, BytesIO | exceção) à medida que ficam prontas.
 
-    draw = ImageDraw.Draw(field_img)
-    width, height = field_img.size
+    As fotos repetidas entre os times são baixadas uma vez só para o lote inteiro, e o
+    lote mantém no máximo renderer.workers renders em andamento, deixando a fila livre
+    para os comandos interativos.
+    """
+    entries = list(entries)
+    urls = list({p['image'] for _, team in entries for p in team if p})
+    fetched = await asyncio.gather(*(fetch_image(url, size=PLAYER_IMAGE_SIZE, timeout=5) for url in urls), return_exceptions=True)
+    images = dict(zip(urls, fetched))
+    slots = asyncio.Semaphore(renderer.workers)
 
-    try:
-        title_font = ImageFont.truetype("arialbd.ttf", 42)
-        player_name_font = ImageFont.truetype("arialbd.ttf", 18)
-        player_pos_font = ImageFont.truetype("arial.ttf", 16)
-        player_stats_font = ImageFont.truetype("arialbd.ttf", 15)
-        team_stats_font = ImageFont.truetype("arialbd.ttf", 24)
-    except IOError:
-        title_font = player_name_font = player_pos_font = player_stats_font = team_stats_font = ImageFont.load_default()
-
-    draw.text((width/2, 38), club_name, font=title_font, fill=(0,0,0,120), anchor="mt", stroke_width=2)
-    draw.text((width/2, 35), club_name, font=title_font, fill="#FFFFFF", anchor="mt")
-
-    if club_logo_url:
-        try:
-            logo_res = requests.get(club_logo_url, timeout=5)
-            logo_img = Image.open(BytesIO(logo_res.content)).convert("RGBA")
-            logo_img.thumbnail((80, 80), Image.Resampling.LANCZOS)
-            field_img.paste(logo_img, (25, 25), logo_img)
-        except Exception as e:
-            print(f"Erro ao carregar logo do clube: {e}")
-
-    total_overall = 0; total_value = 0
-    img_size = (120, 156)
-
-    for i, player in enumerate(team_players):
-        x, y = POSITIONS_COORDS[i]
-        if player:
-            player = add_player_defaults(player)
-            effective_ovr = get_player_effective_overall(player)
-            total_overall += effective_ovr
-            total_value += player['value']
-            
-            try:
-                player_img_response = requests.get(player["image"], timeout=5); player_img_response.raise_for_status()
-                player_img = Image.open(BytesIO(player_img_response.content)).convert("RGBA")
-            except Exception:
-                try:
-                    fallback_response = requests.get("https://i.imgur.com/M43Amw2.png", timeout=5); fallback_response.raise_for_status()
-                    player_img = Image.open(BytesIO(fallback_response.content)).convert("RGBA")
-                except Exception: player_img = Image.new('RGBA', img_size, color='grey')
-            
-            await asyncio.sleep(0.05)
-            player_img.thumbnail(img_size, Image.Resampling.LANCZOS)
-            
-            paste_x = x - player_img.width // 2
-            paste_y = y - player_img.height // 2
-            field_img.paste(player_img, (paste_x, paste_y), player_img)
-            
-            base_text_y = y + (img_size[1] // 2) + 5
-            player_display_name = player.get('nickname') or player['name'].split(' ')[-1]
-            draw.text((x, base_text_y + 2), player_display_name, font=player_name_font, fill="black", anchor="mt", stroke_width=2)
-            draw.text((x, base_text_y), player_display_name, font=player_name_font, fill="white", anchor="mt")
-
-            player_pos_text = player['position']
-            draw.text((x, base_text_y + 22), player_pos_text, font=player_pos_font, fill="black", anchor="mt", stroke_width=1)
-            draw.text((x, base_text_y + 21), player_pos_text, font=player_pos_font, fill="#CCCCCC", anchor="mt")
-
-            player_stats_text = f"OVR {effective_ovr}"
-            text_color = "lime" if player.get('training_level', 0) > 0 else "yellow"
-            draw.text((x, base_text_y + 42), player_stats_text, font=player_stats_font, fill="black", anchor="mt", stroke_width=2)
-            draw.text((x, base_text_y + 41), player_stats_text, font=player_stats_font, fill=text_color, anchor="mt")
-        else:
-            draw.rectangle((x - 40, y - 40, x + 40, y + 40), outline=(255,255,255,100), width=2)
-            draw.text((x, y), "?", fill=(255,255,255,100), font=title_font, anchor="mm")
-
-    stats_overall_text = f"⭐ Overall Total: {total_overall}"
-    stats_value_text = f"💰 Valor de Mercado: R$ {total_value:,}"
-    draw.text((35, height - 48), stats_overall_text, font=team_stats_font, fill="black", anchor="ls", stroke_width=2)
-    draw.text((35, height - 50), stats_overall_text, font=team_stats_font, fill="white", anchor="ls")
-    draw.text((35, height - 18), stats_value_text, font=team_stats_font, fill="black", anchor="ls", stroke_width=2)
-    draw.text((35, height - 20), stats_value_text, font=team_stats_font, fill="#39FF14", anchor="ls")
-    
-    img_byte_arr = BytesIO()
-    field_img.save(img_byte_arr, format='PNG')
-    img_byte_arr.seek(0)
-    return img_byte_arr
+    async def render_one(user, team):
+        async with slots:
+            try: return user, await generate_team_image(team, user, images)
+            except Exception as e: return user, e
+
+    for next_done in asyncio.as_completed([render_one(user, team) for user, team in entries]):
+        yield await next_done
 
 # --- VIEWS DE INTERAÇÃO (EXISTENTES E NOVAS) ---
 class ConfirmationView(discord.ui.View):
@@ -327,33 +472,27 @@ class KeepOrSellView(discord.ui.View):
     async def keep_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         if interaction.user != self.author: return await interaction.response.send_message("Você não pode decidir por outro jogador.", ephemeral=True)
         self.decision_made = True
-        async with data_lock:
-            user_data = await get_user_data(self.author.id)
+        async with locks.hold(self.author.id):
+            await get_user_data(self.author.id)
             # Adiciona os campos padrão ao jogador antes de salvar
-            player_with_defaults = add_player_defaults(self.player)
-            user_data[str(self.author.id)]["squad"].append(player_with_defaults)
-            save_data(USER_DATA_FILE, user_data)
+            user_store.squad_add(self.author.id, new_owned_player(self.player))
         await interaction.message.edit(content=f"✅ **{self.player['name']}** foi adicionado ao seu elenco!", view=None)
     @discord.ui.button(label="Vender", style=discord.ButtonStyle.red)
     async def sell_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         if interaction.user != self.author: return await interaction.response.send_message("Você não pode decidir por outro jogador.", ephemeral=True)
         self.decision_made = True; sale_price = int(self.player['value'] * SALE_PERCENTAGE)
-        async with data_lock:
-            user_data = await get_user_data(self.author.id); user_data[str(self.author.id)]["money"] += sale_price
-            contracted = load_data(CONTRACTED_PLAYERS_FILE, []); contracted = [p for p in contracted if p != self.player['name']]
-            save_data(USER_DATA_FILE, user_data); save_data(CONTRACTED_PLAYERS_FILE, contracted)
+        async with locks.hold(self.author.id, contracts=True):
+            await get_user_data(self.author.id); user_store.add_money(self.author.id, sale_price)
+            contracts.release(self.player['name'])
         await interaction.message.edit(content=f"💰 Você vendeu **{self.player['name']}** e ganhou **R$ {sale_price:,}**!", view=None)
     async def on_timeout(self):
         if not self.decision_made and self.message:
             try:
                 sale_price = int(self.player['value'] * SALE_PERCENTAGE)
-                async with data_lock:
-                    user_data = await get_user_data(self.author.id)
-                    user_data[str(self.author.id)]["money"] += sale_price
-                    contracted = load_data(CONTRACTED_PLAYERS_FILE, [])
-                    contracted = [p_name for p_name in contracted if p_name != self.player['name']]
-                    save_data(USER_DATA_FILE, user_data)
-                    save_data(CONTRACTED_PLAYERS_FILE, contracted)
+                async with locks.hold(self.author.id, contracts=True):
+                    await get_user_data(self.author.id)
+                    user_store.add_money(self.author.id, sale_price)
+                    contracts.release(self.player['name'])
                 await self.message.edit(content=f"⏰ Tempo esgotado! **{self.player['name']}** foi vendido automaticamente por **R$ {sale_price:,}**.", view=None)
             except discord.NotFound: pass
 
@@ -384,20 +523,17 @@ class ContractView(discord.ui.View):
     async def buy_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         if interaction.user != self.ctx.author: return await interaction.response.send_message("Apenas o autor do comando pode comprar.", ephemeral=True)
         player_to_buy = self.results[self.current_index]
-        async with data_lock:
+        async with locks.hold(self.ctx.author.id, contracts=True):
             user_data = await get_user_data(self.ctx.author.id); user_id = str(self.ctx.author.id); user_money = user_data[user_id]['money']
-            contracted_check = load_data(CONTRACTED_PLAYERS_FILE, [])
-            if player_to_buy['name'] in contracted_check:
+            if not contracts.is_free(player_to_buy['name']):
                 await interaction.response.send_message(f"😔 Que pena! **{player_to_buy['name']}** foi contratado.", ephemeral=True)
                 return await self.message.delete()
             if user_money < player_to_buy['value']: return await interaction.response.send_message(f"💸 **Dinheiro insuficiente!**", ephemeral=True)
             
-            player_with_defaults = add_player_defaults(player_to_buy)
-            user_data[user_id]['money'] -= player_to_buy['value']
-            user_data[user_id]['squad'].append(player_with_defaults)
-            contracted_check.append(player_to_buy['name'])
-            
-            save_data(USER_DATA_FILE, user_data); save_data(CONTRACTED_PLAYERS_FILE, contracted_check)
+            new_player = new_owned_player(player_to_buy)
+            user_store.add_money(user_id, -player_to_buy['value'])
+            user_store.squad_add(user_id, new_player)
+            contracts.claim(player_to_buy['name'], user_id)
         for item in self.children: item.disabled = True
         final_embed = await self.create_embed(); final_embed.color = discord.Color.green(); final_embed.title = f"Contratado! ✅"
         await interaction.response.edit_message(embed=final_embed, view=self)
@@ -413,7 +549,6 @@ class ActionView(discord.ui.View):
         self.action_button.label = action_name
     async def create_embed(self, interaction: discord.Interaction = None):
         player = self.results[self.current_index]
-        player = add_player_defaults(player)
         effective_ovr = get_player_effective_overall(player)
         
         embed = discord.Embed(title=f"Selecione para '{self.action_name}'", color=discord.Color.orange())
@@ -458,27 +593,31 @@ class TradeConfirmationView(discord.ui.View):
         if interaction.user != self.target: return await interaction.response.send_message("Apenas o destinatário da proposta pode aceitar.", ephemeral=True)
         self.decision = True
         for item in self.children: item.disabled = True
-        async with data_lock:
-            all_data = load_data(USER_DATA_FILE, {})
+        async with locks.hold(self.proposer.id, self.target.id, contracts=True):
+            all_data = user_store.all()
             prop_id, targ_id = str(self.proposer.id), str(self.target.id)
             
-            # Garante que os jogadores tenham os campos padrão
-            offered_with_defaults = add_player_defaults(self.offered_player)
-            requested_with_defaults = add_player_defaults(self.requested_player)
-
+            # A proposta ficou aberta sem lock: confere se os dois ainda têm os jogadores
+            offered_owned = next((p for p in all_data[prop_id]['squad'] if p['name'] == self.offered_player['name']), None) if prop_id in all_data else None
+            requested_owned = next((p for p in all_data[targ_id]['squad'] if p['name'] == self.requested_player['name']), None) if targ_id in all_data else None
+            if not (offered_owned and requested_owned):
+                await interaction.response.edit_message(content="❌ **Troca cancelada!** Um dos jogadores não está mais disponível.", embed=None, view=self)
+                return self.stop()
+
+            # Os jogadores mudam de elenco levando apelido e treino
             # Proposer
-            all_data[prop_id]['squad'] = [p for p in all_data[prop_id]['squad'] if p['name'] != self.offered_player['name']]
-            all_data[prop_id]['squad'].append(requested_with_defaults)
+            user_store.squad_remove(prop_id, [self.offered_player['name']])
+            user_store.squad_add(prop_id, requested_owned)
             for i, p in enumerate(all_data[prop_id]['team']):
-                if p and p['name'] == self.offered_player['name']: all_data[prop_id]['team'][i] = None
+                if p and p['name'] == self.offered_player['name']: user_store.team_set(prop_id, i, None)
             
             # Target
-            all_data[targ_id]['squad'] = [p for p in all_data[targ_id]['squad'] if p['name'] != self.requested_player['name']]
-            all_data[targ_id]['squad'].append(offered_with_defaults)
+            user_store.squad_remove(targ_id, [self.requested_player['name']])
+            user_store.squad_add(targ_id, offered_owned)
             for i, p in enumerate(all_data[targ_id]['team']):
-                if p and p['name'] == self.requested_player['name']: all_data[targ_id]['team'][i] = None
-            
-            save_data(USER_DATA_FILE, all_data)
+                if p and p['name'] == self.requested_player['name']: user_store.team_set(targ_id, i, None)
+            contracts.claim(self.offered_player['name'], targ_id)
+            contracts.claim(self.requested_player['name'], prop_id)
         await interaction.response.edit_message(content=f"✅ **Troca Aceita!** **{self.proposer.display_name}** e **{self.target.display_name}** trocaram seus jogadores.", embed=None, view=self)
         self.stop()
     @discord.ui.button(label="Recusar", style=discord.ButtonStyle.red)
@@ -498,7 +637,7 @@ class TradeConfirmationView(discord.ui.View):
 # --- EVENTOS E COMANDOS ---
 @bot.event
 async def on_ready():
-    print(f'🚀 {bot.user.name} V19.1 (Expansão) está no ar!'); fetch_and_parse_players()
+    print(f'🚀 {bot.user.name} V19.1 (Expansão) está no ar!')
     await bot.change_presence(activity=discord.Game(name=f"Use {BOT_PREFIX}help"))
 
 # --- COMANDO HELP ATUALIZADO ---
@@ -519,9 +658,11 @@ async def help_command(ctx):
 
     embed.add_field(name="**🏆 Competição e Rankings**", value="-"*25, inline=False)
     embed.add_field(name=f"⚔️ `{BOT_PREFIX}confrontar @usuario`", value="Inicia uma partida narrada por IA!", inline=False)
+    embed.add_field(name=f"📺 `{BOT_PREFIX}partidas`", value="Lista as partidas ao vivo no servidor, com o placar.", inline=False)
+    embed.add_field(name=f"🔮 `{BOT_PREFIX}prever @usuario`", value="Mostra as chances de cada time num confronto.", inline=False)
     embed.add_field(name=f"📜 `{BOT_PREFIX}historico [@usuario]`", value="Mostra o histórico de partidas.", inline=False)
     embed.add_field(name=f"🏆 `{BOT_PREFIX}ranking`", value="Exibe o ranking de vitórias.", inline=False)
-    embed.add_field(name=f"⭐ `{BOT_PREFIX}rankingovr`", value="Exibe o ranking de overall do time titular.", inline=False)
+    embed.add_field(name=f"⭐ `{BOT_PREFIX}rankingovr`", value="Exibe o ranking de overall do time titular. Use `quadro` para ver os times.", inline=False)
     embed.add_field(name=f"⚽ `{BOT_PREFIX}artilheiros`", value="Mostra os maiores goleadores do servidor.", inline=False)
     embed.add_field(name=f"👀 `{BOT_PREFIX}previewtime @usuario`", value="Espia o time de outro usuário.", inline=False)
 
@@ -559,6 +700,8 @@ async def help_command(ctx):
         embed.add_field(name=f"⭐ `{BOT_PREFIX}bestteam @usuario`", value="Monta o melhor time possível para um usuário.", inline=False)
         embed.add_field(name=f"💰 `{BOT_PREFIX}money @usuario <quantia>`", value="Dá ou remove dinheiro de um usuário.", inline=False)
         embed.add_field(name=f"🚨 `{BOT_PREFIX}fullreset`", value="Apaga TODOS os dados salvos do bot.", inline=False)
+        embed.add_field(name=f"🏟️ `{BOT_PREFIX}liga` / `{BOT_PREFIX}copa`", value="Disputa uma liga ou copa com todos os times completos do servidor.", inline=False)
+        embed.add_field(name=f"🎙️ `{BOT_PREFIX}narrador [ia|local]`", value="Escolhe quem narra as partidas do servidor.", inline=False)
     await ctx.send(embed=embed)
 
 
@@ -570,7 +713,7 @@ async def perfil(ctx, user: discord.Member = None):
     if user is None:
         user = ctx.author
     
-    async with data_lock:
+    async with locks.hold(user.id):
         user_data = await get_user_data(user.id)
         data = user_data[str(user.id)]
 
@@ -605,24 +748,15 @@ async def perfil(ctx, user: discord.Member = None):
 @bot.command(name='treinar')
 async def train_player(ctx, *, query: str):
     """Gasta dinheiro para melhorar o overall de um jogador."""
-    search_query = normalize_str(query)
-    async with data_lock:
+    async with locks.hold(ctx.author.id):
         all_data = await get_user_data(ctx.author.id)
         user_id_str = str(ctx.author.id)
-        squad = all_data[user_id_str]['squad']
-        
-        target_player_index = -1
-        for i, p in enumerate(squad):
-            p_name = p.get('nickname') or p['name']
-            if search_query in normalize_str(p_name):
-                target_player_index = i
-                break
-
-        if target_player_index == -1:
+        results = search_owned(all_data[user_id_str]['squad'], query)
+
+        if not results:
             return await ctx.send(f"❌ Jogador `{query}` não encontrado no seu elenco.")
 
-        player = squad[target_player_index]
-        player = add_player_defaults(player)
+        player = results[0]
         
         current_level = player.get('training_level', 0)
         current_ovr = player['overall'] + current_level
@@ -635,29 +769,30 @@ async def train_player(ctx, *, query: str):
         if all_data[user_id_str]['money'] < cost:
             return await ctx.send(f"💸 Dinheiro insuficiente! Você precisa de **R$ {cost:,}** para o próximo nível de treino.")
 
-        view = ConfirmationView(ctx.author)
-        msg = await ctx.send(
-            f"Você tem certeza que quer gastar **R$ {cost:,}** para aumentar o overall de **{player.get('nickname') or player['name']}** de **{current_ovr}** para **{current_ovr + 1}**?",
-            view=view
-        )
-        await view.wait()
-        
-        if view.value is True:
-            all_data[user_id_str]['money'] -= cost
-            all_data[user_id_str]['squad'][target_player_index]['training_level'] += 1
-            
-            # Atualiza o jogador no time titular também, se ele estiver lá
-            for i, team_player in enumerate(all_data[user_id_str]['team']):
-                if team_player and team_player['name'] == player['name']:
-                    all_data[user_id_str]['team'][i]['training_level'] += 1
-                    break
-            
-            save_data(USER_DATA_FILE, all_data)
-            await msg.edit(content=f"💪 **{player.get('nickname') or player['name']}** treinou duro e agora tem **{current_ovr + 1}** de OVR!", view=None)
-            if current_ovr + 1 >= 99:
-                 await check_and_grant_achievement(ctx.author.id, "lenda", ctx)
-        else:
-            await msg.edit(content="✅ Treinamento cancelado.", view=None)
+    # A confirmação é esperada sem lock; o estado é conferido de novo antes de aplicar.
+    view = ConfirmationView(ctx.author)
+    msg = await ctx.send(
+        f"Você tem certeza que quer gastar **R$ {cost:,}** para aumentar o overall de **{player.get('nickname') or player['name']}** de **{current_ovr}** para **{current_ovr + 1}**?",
+        view=view
+    )
+    await view.wait()
+    if view.value is not True:
+        return await msg.edit(content="✅ Treinamento cancelado.", view=None)
+
+    async with locks.hold(ctx.author.id):
+        all_data = await get_user_data(ctx.author.id)
+        current = next((p for p in all_data[user_id_str]['squad'] if p['name'] == player['name']), None)
+        if current is None or current.get('training_level', 0) != current_level:
+            return await msg.edit(content="❌ O elenco mudou enquanto você decidia. Tente novamente.", view=None)
+        if all_data[user_id_str]['money'] < cost:
+            return await msg.edit(content=f"💸 Dinheiro insuficiente! Você precisa de **R$ {cost:,}** para o próximo nível de treino.", view=None)
+        user_store.add_money(user_id_str, -cost)
+        # Atualiza o jogador no elenco e no time titular, se ele estiver lá
+        user_store.set_training(user_id_str, player['name'], current_level + 1)
+        render_cache.invalidate(user_id_str)
+    await msg.edit(content=f"💪 **{player.get('nickname') or player['name']}** treinou duro e agora tem **{current_ovr + 1}** de OVR!", view=None)
+    if current_ovr + 1 >= 99:
+         await check_and_grant_achievement(ctx.author.id, "lenda", ctx)
 
 
 @bot.command(name='clubinfo')
@@ -665,19 +800,20 @@ async def set_club_info(ctx, name: str, logo_url: str = None):
     """Define o nome e, opcionalmente, o logo do seu clube."""
     if len(name) > 25:
         return await ctx.send("❌ O nome do clube pode ter no máximo 25 caracteres.")
+    # Validação simples de URL (antes de mexer nos dados: o usuário fica em memória)
+    if logo_url and not (logo_url.startswith('http://') or logo_url.startswith('https://')):
+        return await ctx.send("❌ URL do logo inválida. Deve começar com `http://` ou `https://`.")
     
-    async with data_lock:
+    async with locks.hold(ctx.author.id):
         all_data = await get_user_data(ctx.author.id)
         user_id_str = str(ctx.author.id)
         
         all_data[user_id_str]['club_name'] = name
         if logo_url:
-            # Validação simples de URL
-            if not (logo_url.startswith('http://') or logo_url.startswith('https://')):
-                 return await ctx.send("❌ URL do logo inválida. Deve começar com `http://` ou `https://`.")
             all_data[user_id_str]['club_logo'] = logo_url
 
-        save_data(USER_DATA_FILE, all_data)
+        save_user_data(user_id_str)
+        render_cache.invalidate(user_id_str)
 
     await ctx.send(f"👑 Informações do clube atualizadas! Novo nome: **{name}**.")
 
@@ -693,30 +829,23 @@ async def set_nickname(ctx, *, query: str):
     if len(nickname) > 20:
         return await ctx.send("❌ O apelido pode ter no máximo 20 caracteres.")
 
-    search_query = normalize_str(player_query)
-    async with data_lock:
-        all_data = await get_user_data(ctx.author.id)
-        user_id_str = str(ctx.author.id)
-        
-        squad = all_data[user_id_str]['squad']
-        player_found = False
-        for p in squad:
-            if search_query in normalize_str(p['name']):
-                p['nickname'] = nickname
-                player_found = True
-                break
-        
-        if not player_found:
-            return await ctx.send(f"❌ Jogador `{player_query}` não encontrado no seu elenco.")
-
-        # Atualiza o apelido no time titular também
-        for p_team in all_data[user_id_str]['team']:
-            if p_team and search_query in normalize_str(p_team['name']):
-                p_team['nickname'] = nickname
-                break
-        
-        save_data(USER_DATA_FILE, all_data)
-    await ctx.send(f"✒️ O jogador **{player_query}** agora é conhecido como **{nickname}**!")
+    user_data = await get_user_data(ctx.author.id)
+    results = search_owned(user_data[str(ctx.author.id)]['squad'], player_query)
+    if not results:
+        return await ctx.send(f"❌ Jogador `{player_query}` não encontrado no seu elenco.")
+    # Resultado aproximado (erro de digitação) sempre passa pela tela de seleção antes de agir
+    if len(results) == 1 and not results.fuzzy: await perform_apelido(ctx, results[0], nickname=nickname)
+    else: view = ActionView(ctx, results, perform_apelido, "Dar Apelido", nickname=nickname); embed = await view.create_embed(); view.message = await ctx.send(embed=embed, view=view)
+
+async def perform_apelido(ctx, player, nickname, **kwargs):
+    async with locks.hold(ctx.author.id):
+        all_data = await get_user_data(ctx.author.id); user_id_str = str(ctx.author.id)
+        if not any(p['name'] == player['name'] for p in all_data[user_id_str]['squad']):
+            return await ctx.send(f"**{player['name']}** não está mais no seu elenco.")
+        # O titular é o mesmo objeto do elenco: o apelido vale para os dois
+        user_store.set_nickname(user_id_str, player['name'], nickname)
+        render_cache.invalidate(user_id_str)
+    await ctx.send(f"✒️ O jogador **{player['name']}** agora é conhecido como **{nickname}**!")
 
 
 @bot.command(name='conquistas')
@@ -743,7 +872,7 @@ async def achievements(ctx, user: discord.Member = None):
 @bot.command(name='estadio')
 async def stadium(ctx):
     """Mostra o status do estádio e permite upgrades."""
-    async with data_lock:
+    async with locks.hold(ctx.author.id):
         all_data = await get_user_data(ctx.author.id)
         user_id_str = str(ctx.author.id)
         level = all_data[user_id_str]['stadium_level']
@@ -760,12 +889,12 @@ async def stadium(ctx):
     
     args = ctx.message.content.split()
     if len(args) > 1 and args[1].lower() == 'melhorar':
-        async with data_lock:
+        async with locks.hold(ctx.author.id):
             all_data = await get_user_data(ctx.author.id) # Recarregar dados
             if all_data[user_id_str]['money'] >= cost:
                 all_data[user_id_str]['money'] -= cost
                 all_data[user_id_str]['stadium_level'] += 1
-                save_data(USER_DATA_FILE, all_data)
+                save_user_data(user_id_str)
                 await ctx.send(f"🎉 Parabéns! Você melhorou seu estádio para o **Nível {level + 1}**!")
             else:
                 await ctx.send(f"💸 Dinheiro insuficiente para melhorar o estádio. Você precisa de R$ {cost:,}.")
@@ -776,8 +905,7 @@ async def stadium(ctx):
 @bot.command(name='mercadolivre')
 async def free_agents(ctx):
     """Mostra jogadores de baixo custo para contratação imediata."""
-    contracted = load_data(CONTRACTED_PLAYERS_FILE, [])
-    free_agents = [p for p in ALL_PLAYERS if p['value'] <= 1000000 and p['name'] not in contracted]
+    free_agents = [p for p in catalog.cheaper_than(1000000) if contracts.is_free(p['name'])]
     
     if not free_agents:
         return await ctx.send("😔 Parece que não há jogadores baratos disponíveis no momento.")
@@ -798,7 +926,7 @@ async def free_agents(ctx):
 async def daily_challenge(ctx):
     """Mostra e gerencia o desafio diário do usuário."""
     today = datetime.utcnow().date().isoformat()
-    async with data_lock:
+    async with locks.hold(ctx.author.id):
         all_data = await get_user_data(ctx.author.id)
         user_id_str = str(ctx.author.id)
         challenge = all_data[user_id_str]['daily_challenge']
@@ -809,7 +937,7 @@ async def daily_challenge(ctx):
             challenge['task_id'] = new_challenge_info['id']
             challenge['completed'] = False
             challenge['date'] = today
-            save_data(USER_DATA_FILE, all_data)
+            save_user_data(user_id_str)
     
     challenge_info = next((c for c in DAILY_CHALLENGES if c['id'] == challenge['task_id']), None)
     
@@ -848,28 +976,32 @@ async def match_history(ctx, user: discord.Member = None):
     await ctx.send(embed=embed)
 
 
+async def make_guess_round():
+    """Sorteia um jogador e prepara a imagem borrada e as respostas aceitas."""
+    if not catalog: raise RuntimeError("catálogo ainda vazio")
+    current_catalog = catalog
+    player = random.choice(current_catalog.players)
+    # Rodadas são sorteadas e não se repetem: tamanho limitado e fora do cache de memória.
+    img = await fetch_image(player['image'], size=GUESS_IMAGE_SIZE, timeout=10, keep_in_memory=False)
+    image_bytes = await asyncio.to_thread(blur_png, img)
+    return GuessRound(player, image_bytes, answer_aliases(player['name'], current_catalog.surname_counts))
+
+guess_pool = GuessPool(make_guess_round, size=GUESS_POOL_SIZE)
+
 @bot.command(name='guesstheplayer')
 async def guess_the_player(ctx):
     """Minigame para adivinhar o jogador."""
-    game_state = load_data(GAME_STATE_FILE, default_data={"active": False})
-    if game_state.get("active", False):
-        return await ctx.send("Um jogo de 'Adivinhe o Jogador' já está em andamento!")
-
-    player = random.choice(ALL_PLAYERS)
-    
-    game_state["active"] = True
-    game_state["answer"] = player['name']
-    save_data(GAME_STATE_FILE, game_state)
+    if ctx.channel.id in active_guess_rounds:
+        return await ctx.send("Um jogo de 'Adivinhe o Jogador' já está em andamento neste canal!")
+    active_guess_rounds[ctx.channel.id] = None
 
     try:
-        response = requests.get(player['image'])
-        img = Image.open(BytesIO(response.content))
-        blurred_img = img.filter(ImageFilter.GaussianBlur(15))
-        
-        buffer = BytesIO()
-        blurred_img.save(buffer, format='PNG')
-        buffer.seek(0)
-        file = discord.File(buffer, 'player.png')
+        try: game_round = await guess_pool.take()
+        except Exception as e:
+            return await ctx.send(f"❌ Não foi possível preparar o jogo agora: {e}")
+        active_guess_rounds[ctx.channel.id] = game_round
+        player = game_round.player
+        file = discord.File(BytesIO(game_round.image_bytes), 'player.png')
 
         embed = discord.Embed(title="🤔 Quem é esse jogador?", color=discord.Color.orange())
         embed.description = "O primeiro a digitar o nome correto no chat vence `R$ 10,000,000`!"
@@ -881,16 +1013,15 @@ async def guess_the_player(ctx):
         await ctx.send(embed=embed, file=file)
 
         def check(m):
-            return m.channel == ctx.channel and normalize_str(m.content) == normalize_str(player['name'])
+            return m.channel == ctx.channel and not m.author.bot and game_round.matches(m.content)
 
         try:
             winner_message = await bot.wait_for('message', timeout=30.0, check=check)
             winner = winner_message.author
             
-            async with data_lock:
-                all_data = await get_user_data(winner.id)
-                all_data[str(winner.id)]['money'] += 10000000
-                save_data(USER_DATA_FILE, all_data)
+            async with locks.hold(winner.id):
+                await get_user_data(winner.id)
+                user_store.add_money(winner.id, 10000000)
 
             await ctx.send(f"🎉 **{winner.mention}** acertou! O jogador era **{player['name']}**. Você ganhou `R$ 10,000,000`!")
 
@@ -898,8 +1029,7 @@ async def guess_the_player(ctx):
             await ctx.send(f"⏰ Tempo esgotado! Ninguém acertou. O jogador era **{player['name']}**.")
 
     finally:
-        game_state["active"] = False
-        save_data(GAME_STATE_FILE, game_state)
+        active_guess_rounds.pop(ctx.channel.id, None)
 
 
 # --- COMANDOS EXISTENTES (RESTO DO CÓDIGO) ---
@@ -907,7 +1037,7 @@ async def guess_the_player(ctx):
 @commands.cooldown(1, 5, commands.BucketType.user)
 async def daily(ctx):
     user_id = str(ctx.author.id)
-    async with data_lock:
+    async with locks.hold(user_id):
         user_data = await get_user_data(user_id)
         last_daily_str = user_data[user_id].get("last_daily", "2000-01-01T00:00:00")
         last_daily_time = datetime.fromisoformat(last_daily_str)
@@ -919,7 +1049,7 @@ async def daily(ctx):
             
             user_data[user_id]["money"] += total_reward
             user_data[user_id]["last_daily"] = datetime.utcnow().isoformat()
-            save_data(USER_DATA_FILE, user_data)
+            save_user_data(user_id)
             
             await ctx.send(f"☀️ {ctx.author.mention}, você coletou sua recompensa diária de **R$ {DAILY_REWARD:,}** + **R$ {stadium_bonus:,}** do estádio!")
         else:
@@ -931,8 +1061,7 @@ async def daily(ctx):
 
 @bot.command(name='buscar')
 async def buscar(ctx, *, query: str):
-    search_query = normalize_str(query)
-    results = [p for p in ALL_PLAYERS if search_query in normalize_str(p['name'])]
+    results = catalog.search(query)
     if not results: return await ctx.send(f"🔎 Nenhum jogador encontrado no universo com o nome: `{query}`")
     results = results[:5]
     embed = discord.Embed(title=f"🔎 Resultados da Busca Global por '{query}'", color=discord.Color.dark_magenta())
@@ -942,10 +1071,8 @@ async def buscar(ctx, *, query: str):
 
 @bot.command(name='destaques')
 async def destaques(ctx):
-    contracted = load_data(CONTRACTED_PLAYERS_FILE, [])
-    available_players = [p for p in ALL_PLAYERS if p["name"] not in contracted]
-    if not available_players: return await ctx.send("🤯 **Mercado Vazio!** Todos os jogadores foram contratados.")
-    top_5_available = sorted(available_players, key=lambda p: p['overall'], reverse=True)[:5]
+    top_5_available = list(islice((p for p in catalog.by_overall if contracts.is_free(p["name"])), 5))
+    if not top_5_available: return await ctx.send("🤯 **Mercado Vazio!** Todos os jogadores foram contratados.")
     embed = discord.Embed(title="🔥 Destaques do Mercado (Top 5 Livres) 🔥", color=discord.Color.orange())
     for player in top_5_available:
         embed.add_field(name=f"💎 {player['name']} (OVR: {player['overall']})", value=f"**Pos:** {player['position']} | **Preço:** R$ {player['value']:,}", inline=False)
@@ -971,27 +1098,30 @@ async def artilheiros(ctx):
 
 @bot.command(name='limparelenco')
 async def limparelenco(ctx):
-    async with data_lock:
-        all_data = await get_user_data(ctx.author.id)
-        user_id = str(ctx.author.id)
+    user_id = str(ctx.author.id)
+    async with locks.hold(user_id):
+        all_data = await get_user_data(user_id)
         squad = all_data[user_id].get('squad', [])
         team_player_names = {p['name'] for p in all_data[user_id].get('team', []) if p}
         benched_players = [p for p in squad if p['name'] not in team_player_names]
         if not benched_players: return await ctx.send("Você não tem jogadores no banco para vender.")
         total_value = sum(int(p['value'] * SALE_PERCENTAGE) for p in benched_players)
-        view = ConfirmationView(ctx.author)
-        msg = await ctx.send(f"Você tem certeza que quer vender **{len(benched_players)}** jogadores do banco por um total de **R$ {total_value:,}**? Esta ação não pode ser desfeita.", view=view)
-        await view.wait()
-        if view.value is True:
-            all_data[user_id]['money'] += total_value
-            all_data[user_id]['squad'] = [p for p in squad if p['name'] in team_player_names]
-            contracted = load_data(CONTRACTED_PLAYERS_FILE, [])
-            benched_player_names = {p['name'] for p in benched_players}
-            new_contracted = [name for name in contracted if name not in benched_player_names]
-            save_data(USER_DATA_FILE, all_data)
-            save_data(CONTRACTED_PLAYERS_FILE, new_contracted)
-            await msg.edit(content=f"💰 Jogadores vendidos! Você ganhou **R$ {total_value:,}**.", view=None)
-        else: await msg.edit(content="Ação cancelada.", view=None)
+    view = ConfirmationView(ctx.author)
+    msg = await ctx.send(f"Você tem certeza que quer vender **{len(benched_players)}** jogadores do banco por um total de **R$ {total_value:,}**? Esta ação não pode ser desfeita.", view=view)
+    await view.wait()
+    if view.value is not True: return await msg.edit(content="Ação cancelada.", view=None)
+    async with locks.hold(user_id, contracts=True):
+        # Só vende quem ainda está no banco: o elenco pode ter mudado durante a confirmação
+        all_data = await get_user_data(user_id)
+        team_player_names = {p['name'] for p in all_data[user_id].get('team', []) if p}
+        benched_player_names = {p['name'] for p in benched_players}
+        benched_players = [p for p in all_data[user_id]['squad'] if p['name'] in benched_player_names and p['name'] not in team_player_names]
+        benched_player_names = {p['name'] for p in benched_players}
+        total_value = sum(int(p['value'] * SALE_PERCENTAGE) for p in benched_players)
+        user_store.add_money(user_id, total_value)
+        user_store.squad_remove(user_id, benched_player_names)
+        contracts.release(*benched_player_names)
+    await msg.edit(content=f"💰 Jogadores vendidos! Você ganhou **R$ {total_value:,}**.", view=None)
 
 @bot.command(name='doar')
 async def doar(ctx, target: discord.Member, amount: int):
@@ -999,26 +1129,24 @@ async def doar(ctx, target: discord.Member, amount: int):
     if proposer == target: return await ctx.send("Você não pode doar para si mesmo.")
     if target.bot: return await ctx.send("Não doe dinheiro para bots, eles não sabem usar.")
     if amount <= 0: return await ctx.send("A quantia deve ser positiva.")
-    async with data_lock:
+    async with locks.hold(proposer.id, target.id):
         all_data = await get_user_data(proposer.id)
         if all_data[str(proposer.id)]['money'] < amount: return await ctx.send(f"💸 Você não tem **R$ {amount:,}** para doar.")
         all_data = await get_user_data(target.id) # Garante que o alvo exista nos dados
-        all_data[str(proposer.id)]['money'] -= amount
-        all_data[str(target.id)]['money'] += amount
-        save_data(USER_DATA_FILE, all_data)
+        user_store.add_money(proposer.id, -amount)
+        user_store.add_money(target.id, amount)
     await ctx.send(f"🎁 {proposer.mention} doou **R$ {amount:,}** para {target.mention}!")
 
 @bot.command(name='servidorstats')
 async def servidorstats(ctx):
-    user_data = load_data(USER_DATA_FILE, {})
-    contracted_players = load_data(CONTRACTED_PLAYERS_FILE, [])
+    user_data = user_store.all()
     total_users = len(user_data)
     total_money = sum(data.get('money', 0) for data in user_data.values())
-    total_players_owned = len(contracted_players)
+    total_players_owned = len(contracts)
     embed = discord.Embed(title="📊 Estatísticas do Servidor", color=discord.Color.dark_blue())
     embed.add_field(name="👥 Usuários Registrados", value=f"`{total_users}`", inline=True)
     embed.add_field(name="💰 Dinheiro em Circulação", value=f"`R$ {total_money:,}`", inline=True)
-    embed.add_field(name="👟 Jogadores Contratados", value=f"`{total_players_owned}` de `{len(ALL_PLAYERS)}`", inline=True)
+    embed.add_field(name="👟 Jogadores Contratados", value=f"`{total_players_owned}` de `{len(catalog)}`", inline=True)
     await ctx.send(embed=embed)
 
 @bot.command(name='previewtime')
@@ -1029,12 +1157,13 @@ async def previewtime(ctx, user: discord.Member):
     msg = await ctx.send(f"⚙️ Montando a imagem do time de **{user.display_name}**...");
     try:
         image_file = await generate_team_image(team, user)
-        await ctx.send(file=discord.File(image_file, f'time_{user.name}.png')); await msg.delete()
+        await ctx.send(file=discord.File(image_file, f'time_{user.name}.{renderer.extension}')); await msg.delete()
+    except RendererBusy: await msg.edit(content=RENDER_BUSY_MESSAGE)
     except Exception as e: await msg.edit(content=f"Ocorreu um erro ao gerar a imagem: {e}")
 
 @bot.command(name='timealeatorio')
 async def timealeatorio(ctx):
-    async with data_lock:
+    async with locks.hold(ctx.author.id):
         all_data = await get_user_data(ctx.author.id)
         user_id = str(ctx.author.id)
         squad = all_data[user_id].get('squad', [])
@@ -1049,18 +1178,16 @@ async def timealeatorio(ctx):
                 candidates = [p for p in available_squad if pos_needed in p['position'].split('/')]
                 if candidates:
                     chosen_player = random.choice(candidates)
-                    team[i] = chosen_player
+                    user_store.team_set(user_id, i, chosen_player)
                     available_squad.remove(chosen_player)
                     filled_count += 1
         if filled_count > 0:
-            all_data[user_id]['team'] = team
-            save_data(USER_DATA_FILE, all_data)
             await ctx.send(f"🎲 Time preenchido! **{filled_count}** jogadores foram escalados aleatoriamente.")
         else: await ctx.send("Não foi possível encontrar jogadores no seu elenco para as posições vagas.")
 
 @bot.command(name='valorizacao')
 async def valorizacao(ctx):
-    top_10_valuable = sorted(ALL_PLAYERS, key=lambda p: p['value'], reverse=True)[:10]
+    top_10_valuable = catalog.by_value[:10]
     embed = discord.Embed(title="💎 Top 10 Jogadores Mais Valiosos 💎", color=discord.Color.from_rgb(255, 215, 0))
     desc = []
     medals = ["🥇", "🥈", "🥉"]
@@ -1088,13 +1215,11 @@ async def news(ctx):
 
 @bot.command(name='info')
 async def info(ctx, *, query: str):
-    search_query = normalize_str(query)
     user_data = await get_user_data(ctx.author.id)
     squad = user_data[str(ctx.author.id)]['squad']
-    target_player = next((p for p in squad if search_query in normalize_str(p.get('nickname') or p['name'])), None)
+    target_player = next(iter(search_owned(squad, query)), None)
     if not target_player: return await ctx.send(f"Jogador `{query}` não encontrado no seu elenco.")
     
-    target_player = add_player_defaults(target_player)
     effective_ovr = get_player_effective_overall(target_player)
     player_display_name = target_player.get('nickname') or target_player['name']
 
@@ -1108,22 +1233,23 @@ async def info(ctx, *, query: str):
 
 @bot.command(name='contratar', aliases=['comprar'])
 async def contract_player(ctx, *, query: str):
-    search_query = normalize_str(query); contracted = load_data(CONTRACTED_PLAYERS_FILE, [])
-    available_players = [p for p in ALL_PLAYERS if p["name"] not in contracted]
-    results = [p for p in available_players if search_query in normalize_str(p['name']) or search_query.upper() in p['position'].split('/')]
+    # Busca por posição ("--contratar ZAG") lista do mais caro ao mais barato; por nome, pela relevância
+    by_position = sorted(catalog.at_position(normalize_str(query).upper()), key=lambda p: p['value'], reverse=True)
+    matches = {p['name']: p for p in catalog.search(query)}
+    matches.update((p['name'], p) for p in by_position)
+    results = [p for p in matches.values() if contracts.is_free(p["name"])]
     if not results: return await ctx.send(f"😥 Nenhum jogador disponível encontrado para a busca: `{query}`")
-    results.sort(key=lambda p: p['value'], reverse=True); view = ContractView(ctx, results)
+    view = ContractView(ctx, results)
     embed = await view.create_embed(); view.message = await ctx.send(embed=embed, view=view)
 
 
 @bot.command(name='obter')
 @commands.cooldown(1, 300, commands.BucketType.user)
 async def get_player(ctx):
-    async with data_lock:
-        contracted = load_data(CONTRACTED_PLAYERS_FILE, [])
-        available = [p for p in ALL_PLAYERS if p["name"] not in contracted]
+    async with locks.contracts:
+        available = [p for p in catalog if contracts.is_free(p["name"])]
         if not available: return await ctx.send("🤯 **Mercado Vazio!**")
-        player = random.choice(available); contracted.append(player["name"]); save_data(CONTRACTED_PLAYERS_FILE, contracted)
+        player = random.choice(available); contracts.claim(player["name"], ctx.author.id)
     sale_price = int(player['value'] * SALE_PERCENTAGE)
     embed = discord.Embed(title="🃏 Você tirou uma carta!", color=discord.Color.blue()); embed.set_image(url=player["image"])
     embed.add_field(name=player['name'], value=f"**Overall:** {player['overall']} | **Posição:** {player['position']}")
@@ -1142,7 +1268,7 @@ async def balance(ctx):
 
 
 async def perform_escalar(ctx, player, **kwargs):
-    async with data_lock:
+    async with locks.hold(ctx.author.id):
         all_data = await get_user_data(ctx.author.id); user_id = str(ctx.author.id)
         team = all_data[user_id]['team']
         if any(p and p['name'] == player['name'] for p in team): return await ctx.send(f"**{player.get('nickname') or player['name']}** já está escalado.")
@@ -1153,61 +1279,65 @@ async def perform_escalar(ctx, player, **kwargs):
                 slot_found = next((i for i in valid_slots if team[i] is None), -1)
                 if slot_found != -1: empty_slot = slot_found; chosen_pos = pos; break
         if empty_slot != -1:
-            team[empty_slot] = player; save_data(USER_DATA_FILE, all_data)
+            user_store.team_set(user_id, empty_slot, player)
+            render_cache.invalidate(user_id)
             await ctx.send(f"✅ **{player.get('nickname') or player['name']}** foi escalado como **{chosen_pos}**!")
         else: await ctx.send(f"🚫 **Posição Cheia!** Vagas de **{player['position']}** ocupadas.")
 
 
 @bot.command(name='escalar')
 async def set_player(ctx, *, query: str):
-    search_query = normalize_str(query); user_data = await get_user_data(ctx.author.id)
+    user_data = await get_user_data(ctx.author.id)
     squad = user_data[str(ctx.author.id)]['squad']
-    results = [p for p in squad if search_query in normalize_str(p.get('nickname') or p['name'])]
+    results = search_owned(squad, query)
     if not results: return await ctx.send(f"Nenhum jogador encontrado no seu elenco com o nome: `{query}`")
-    if len(results) == 1: await perform_escalar(ctx, results[0])
+    if len(results) == 1 and not results.fuzzy: await perform_escalar(ctx, results[0])
     else: view = ActionView(ctx, results, perform_escalar, "Escalar"); embed = await view.create_embed(); view.message = await ctx.send(embed=embed, view=view)
 
 async def perform_banco(ctx, player, **kwargs):
-    async with data_lock:
+    async with locks.hold(ctx.author.id):
         all_data = await get_user_data(ctx.author.id); user_id = str(ctx.author.id)
         team = all_data[user_id]['team']
         idx = next((i for i, p in enumerate(team) if p and p['name'] == player['name']), -1)
         if idx == -1: return
         player_unset = team[idx]
         player_display_name = player_unset.get('nickname') or player_unset['name']
-        team[idx] = None; save_data(USER_DATA_FILE, all_data)
+        user_store.team_set(user_id, idx, None)
+        render_cache.invalidate(user_id)
         await ctx.send(f"❌ **{player_display_name}** foi para o banco de reservas.")
 
 @bot.command(name='banco')
 async def unset_player(ctx, *, query: str):
-    search_query = normalize_str(query); user_data = await get_user_data(ctx.author.id)
+    user_data = await get_user_data(ctx.author.id)
     team = user_data[str(ctx.author.id)]['team']
-    results = [p for p in team if p and search_query in normalize_str(p.get('nickname') or p['name'])]
+    results = search_owned(team, query)
     if not results: return await ctx.send(f"Nenhum jogador encontrado no seu time titular com o nome: `{query}`")
-    if len(results) == 1: await perform_banco(ctx, results[0])
+    if len(results) == 1 and not results.fuzzy: await perform_banco(ctx, results[0])
     else: view = ActionView(ctx, results, perform_banco, "Mandar para o Banco"); embed = await view.create_embed(); view.message = await ctx.send(embed=embed, view=view)
 
 async def perform_vender(ctx, player, **kwargs):
-    async with data_lock:
+    async with locks.hold(ctx.author.id, contracts=True):
         user_data = await get_user_data(ctx.author.id); user_id = str(ctx.author.id)
+        if not any(p['name'] == player['name'] for p in user_data[user_id]['squad']):
+            return await ctx.send(f"**{player.get('nickname') or player['name']}** não está mais no seu elenco.")
         team = user_data[user_id]['team']
         for i, p_team in enumerate(team):
-            if p_team and p_team['name'] == player['name']: team[i] = None; break
+            if p_team and p_team['name'] == player['name']: user_store.team_set(user_id, i, None); break
         sale_price = int(player['value'] * SALE_PERCENTAGE)
-        user_data[user_id]['money'] += sale_price
-        user_data[user_id]['squad'] = [p for p in user_data[user_id]['squad'] if p['name'] != player['name']]
-        contracted = load_data(CONTRACTED_PLAYERS_FILE, []); contracted = [p_name for p_name in contracted if p_name != player['name']]
-        save_data(USER_DATA_FILE, user_data); save_data(CONTRACTED_PLAYERS_FILE, contracted)
+        user_store.add_money(user_id, sale_price)
+        user_store.squad_remove(user_id, [player['name']])
+        contracts.release(player['name'])
     player_display_name = player.get('nickname') or player['name']
     await ctx.send(f"💰 Você vendeu **{player_display_name}** por **R$ {sale_price:,}**!")
 
 @bot.command(name='vender')
 async def sell_player(ctx, *, query: str):
-    search_query = normalize_str(query); user_data = await get_user_data(ctx.author.id)
+    user_data = await get_user_data(ctx.author.id)
     squad = user_data[str(ctx.author.id)]['squad']
-    results = [p for p in squad if search_query in normalize_str(p.get('nickname') or p['name'])]
+    results = search_owned(squad, query)
     if not results: return await ctx.send(f"Nenhum jogador encontrado no seu elenco com o nome: `{query}`")
-    if len(results) == 1: await perform_vender(ctx, results[0])
+    # Resultado aproximado (erro de digitação) sempre passa pela tela de seleção antes de agir
+    if len(results) == 1 and not results.fuzzy: await perform_vender(ctx, results[0])
     else: view = ActionView(ctx, results, perform_vender, "Vender"); embed = await view.create_embed(); view.message = await ctx.send(embed=embed, view=view)
 
 @bot.command(name='elenco')
@@ -1218,7 +1348,6 @@ async def squad_command(ctx):
     
     player_lines = []
     for p in sorted(squad_players, key=lambda p: p['name']):
-        p = add_player_defaults(p)
         display_name = f"**{p.get('nickname') or p['name']}**"
         effective_ovr = get_player_effective_overall(p)
         player_lines.append(f"{display_name} | `{p['position']}` | OVR: **{effective_ovr}**")
@@ -1229,9 +1358,9 @@ async def squad_command(ctx):
 
 @bot.command(name='limpartime')
 async def clear_team(ctx):
-    async with data_lock:
+    async with locks.hold(ctx.author.id):
         all_data = await get_user_data(ctx.author.id)
-        all_data[str(ctx.author.id)]['team'] = [None] * 11; save_data(USER_DATA_FILE, all_data)
+        all_data[str(ctx.author.id)]['team'] = [None] * 11; save_user_data(ctx.author.id)
     await ctx.send("🗑️ **Time Limpo!**")
 
 
@@ -1240,12 +1369,13 @@ async def my_team(ctx):
     user_data = await get_user_data(ctx.author.id); team = user_data[str(ctx.author.id)]["team"]
     if not any(team): return await ctx.send(f"Você não escalou ninguém!")
     msg = await ctx.send("⚙️ Montando a imagem do time..."); 
-    image_file = await generate_team_image(team, ctx.author)
-    await ctx.send(file=discord.File(image_file, 'meutime.png')); await msg.delete()
+    try: image_file = await generate_team_image(team, ctx.author)
+    except RendererBusy: return await msg.edit(content=RENDER_BUSY_MESSAGE)
+    await ctx.send(file=discord.File(image_file, f'meutime.{renderer.extension}')); await msg.delete()
 
 @bot.command(name='ranking')
 async def ranking(ctx):
-    user_data = load_data(USER_DATA_FILE, {})
+    user_data = user_store.all()
     if not user_data: return await ctx.send("Ainda não há dados.")
     sorted_users = sorted([(uid, data.get('wins', 0)) for uid, data in user_data.items() if data.get('wins', 0) > 0], key=lambda i: i[1], reverse=True)
     if not sorted_users: return await ctx.send("🏆 **Ranking de Vitórias Vazio!** Ninguém venceu ainda.")
@@ -1258,8 +1388,8 @@ async def ranking(ctx):
     embed.description = "\n".join(desc); await ctx.send(embed=embed)
 
 @bot.command(name='rankingovr')
-async def ranking_overall(ctx):
-    user_data = load_data(USER_DATA_FILE, {});
+async def ranking_overall(ctx, opcao: str = None):
+    user_data = user_store.all();
     if not user_data: return await ctx.send("Ainda não há dados para gerar um ranking.")
     user_overalls = []
     for uid, data in user_data.items():
@@ -1270,9 +1400,9 @@ async def ranking_overall(ctx):
     if not user_overalls: return await ctx.send("⭐ **Ranking de Overall Vazio!** Ninguém montou um time ainda.")
     sorted_users = sorted(user_overalls, key=lambda i: i[1], reverse=True)
     embed = discord.Embed(title="⭐ Ranking de Overall do Time - Top 10 ⭐", color=discord.Color.gold())
-    desc = []; medals = ["🥇", "🥈", "🥉"]
+    desc = []; medals = ["🥇", "🥈", "🥉"]; ranked_users = []
     for i, (user_id, overall) in enumerate(sorted_users[:10]):
-        try: user = await bot.fetch_user(int(user_id)); user_name = user.display_name
+        try: user = await bot.fetch_user(int(user_id)); user_name = user.display_name; ranked_users.append((i + 1, user))
         except (discord.NotFound, ValueError): user_name = f"Usuário Desconhecido ({user_id})"
         medal = medals[i] if i < 3 else "🔹"; desc.append(f"{medal} **{user_name}** - Overall: `{overall}`")
     embed.description = "\n".join(desc)
@@ -1283,6 +1413,21 @@ async def ranking_overall(ctx):
             await check_and_grant_achievement(int(top_user_id), "time_galactico")
             
     await ctx.send(embed=embed)
+    if opcao and opcao.lower() == "quadro":
+        await send_ranking_sheet(ctx, ranked_users[:RANKING_SHEET_SIZE])
+
+async def send_ranking_sheet(ctx, ranked_users):
+    """Quadro com as imagens dos times do ranking, lado a lado."""
+    msg = await ctx.send("⚙️ Montando o quadro dos melhores times...")
+    position_of = {user.id: position for position, user in ranked_users}
+    all_data = user_store.all(); tiles = []
+    async for user, result in generate_team_images((user, all_data[str(user.id)]['team']) for _, user in ranked_users):
+        if isinstance(result, Exception): print(f"Erro ao gerar a imagem do time de {user}: {result}"); continue
+        tiles.append((position_of[user.id], f"{position_of[user.id]}º {user.display_name}", result.getvalue()))
+    if not tiles: return await msg.edit(content="Não foi possível gerar as imagens dos times.")
+    try: sheet = await renderer.contact_sheet([(caption, data) for _, caption, data in sorted(tiles)])
+    except RendererBusy: return await msg.edit(content=RENDER_BUSY_MESSAGE)
+    await ctx.send(file=discord.File(BytesIO(sheet), f'ranking.{renderer.extension}')); await msg.delete()
 
 
 @bot.command(name='resetar')
@@ -1292,28 +1437,27 @@ async def reset_account(ctx):
     def check(m): return m.author == ctx.author and m.channel == ctx.channel and m.content.lower() == 'sim'
     try: await bot.wait_for('message', timeout=30.0, check=check)
     except asyncio.TimeoutError: return await ctx.send("Reset cancelado.")
-    async with data_lock:
-        user_data = load_data(USER_DATA_FILE, {}); contracted_players = load_data(CONTRACTED_PLAYERS_FILE, [])
+    async with locks.hold(ctx.author.id, contracts=True):
+        user_data = user_store.all()
         user_id = str(ctx.author.id)
         if user_id in user_data:
             players_to_release = {p['name'] for p in user_data[user_id].get("squad", [])}
-            contracted_players = [name for name in contracted_players if name not in players_to_release]
-            del user_data[user_id]
-            save_data(USER_DATA_FILE, user_data); save_data(CONTRACTED_PLAYERS_FILE, contracted_players)
+            contracts.release(*players_to_release)
+            user_store.delete(user_id)
             await ctx.send("✅ **Conta resetada!**")
         else: await ctx.send("Você não possui dados para resetar.")
 
 @bot.command(name='tigrinho')
 async def tigrinho_game(ctx, bet: int):
     user_id = str(ctx.author.id)
-    async with data_lock:
+    async with locks.hold(user_id):
         user_data = await get_user_data(user_id); user_money = user_data[user_id]['money']
         if bet <= 0: return await ctx.send("A aposta deve ser um valor positivo, né?")
         if user_money < bet: return await ctx.send(f"💸 Você não tem dinheiro suficiente! Seu saldo é de R$ {user_money:,}.")
-        user_data[user_id]['money'] -= bet; save_data(USER_DATA_FILE, user_data)
+        user_store.add_money(user_id, -bet)
     emojis = ["🍒", "🍋", "🍊", "🍉", "⭐", "💎", "🐯"]; msg = await ctx.send(f"Você apostou R$ {bet:,}. Girando o tigrinho...\n\n| 🎰 | 🎰 | 🎰 |")
-    await asyncio.sleep(1); await msg.edit(content=f"Você apostou R$ {bet:,}. Girando o tigrinho...\n\n| {random.choice(emojis)} | 🎰 | 🎰 |")
-    await asyncio.sleep(1); await msg.edit(content=f"Você apostou R$ {bet:,}. Girando o tigrinho...\n\n| {random.choice(emojis)} | {random.choice(emojis)} | 🎰 |")
+    await asyncio.sleep(1); message_edits.submit(msg, content=f"Você apostou R$ {bet:,}. Girando o tigrinho...\n\n| {random.choice(emojis)} | 🎰 | 🎰 |")
+    await asyncio.sleep(1); message_edits.submit(msg, content=f"Você apostou R$ {bet:,}. Girando o tigrinho...\n\n| {random.choice(emojis)} | {random.choice(emojis)} | 🎰 |")
     await asyncio.sleep(1)
     reels = [random.choice(emojis) for _ in range(3)]; result_text = f"| {reels[0]} | {reels[1]} | {reels[2]} |"
     winnings = 0; multiplier = 0; result_title = "PERDEU!"; color = discord.Color.red()
@@ -1326,15 +1470,15 @@ async def tigrinho_game(ctx, bet: int):
     elif reels.count("🐯") == 1: multiplier = 1.5; result_title = "O TIGRINHO AJUDOU!"
     if multiplier > 0:
         winnings = int(bet * multiplier); color = discord.Color.green()
-        async with data_lock:
+        async with locks.hold(user_id):
             user_data = await get_user_data(user_id)
-            user_data[user_id]['money'] += winnings; save_data(USER_DATA_FILE, user_data)
+            user_store.add_money(user_id, winnings)
     embed = discord.Embed(title=result_title, color=color)
     embed.add_field(name="Resultado", value=result_text, inline=False)
     if winnings > 0: embed.add_field(name="Prêmio", value=f"Você ganhou **R$ {winnings:,}**!", inline=False)
     else: embed.add_field(name="Prêmio", value="Mais sorte na próxima vez!", inline=False)
     final_balance = user_data[user_id]['money']; embed.set_footer(text=f"Seu novo saldo é de R$ {final_balance:,}")
-    await msg.edit(content="", embed=embed)
+    await message_edits.finish(msg, content="", embed=embed)
 
 class RocketView(discord.ui.View):
     def __init__(self, author):
@@ -1347,27 +1491,27 @@ class RocketView(discord.ui.View):
 @bot.command(name='rocket')
 async def rocket_game(ctx, bet: int):
     user_id = str(ctx.author.id)
-    async with data_lock:
+    async with locks.hold(user_id):
         user_data = await get_user_data(user_id); user_money = user_data[user_id]['money']
         if bet <= 0: return await ctx.send("A aposta deve ser um valor positivo.")
         if user_money < bet: return await ctx.send(f"💸 Você não tem dinheiro suficiente! Seu saldo é de R$ {user_money:,}.")
-        user_data[user_id]['money'] -= bet; save_data(USER_DATA_FILE, user_data)
+        user_store.add_money(user_id, -bet)
     view = RocketView(ctx.author); embed = discord.Embed(title="🚀 Jogo do Foguete 🚀", color=discord.Color.purple())
     embed.description = f"Apostou: **R$ {bet:,}**\nMultiplicador atual: **1.00x**"; embed.set_footer(text="Clique em 'Retirar!' antes que exploda!")
     message = await ctx.send(embed=embed, view=view)
     multiplier = 1.0; crash_point = random.uniform(1.1, 15.0)
     while multiplier < crash_point:
         await asyncio.sleep(1.5); increment = 0.10 + (multiplier * 0.05); multiplier += increment
-        embed.description = f"Apostou: **R$ {bet:,}**\nMultiplicador atual: **{multiplier:.2f}x**"; await message.edit(embed=embed)
+        embed.description = f"Apostou: **R$ {bet:,}**\nMultiplicador atual: **{multiplier:.2f}x**"; message_edits.submit(message, embed=embed)
         if view.decision == "cashed_out":
             winnings = int(bet * multiplier)
-            async with data_lock:
+            async with locks.hold(user_id):
                 user_data = await get_user_data(user_id)
-                user_data[user_id]['money'] += winnings; save_data(USER_DATA_FILE, user_data)
+                user_store.add_money(user_id, winnings)
             embed.title = "🎉 Você Ganhou! 🎉"; embed.description = f"Você retirou em **{multiplier:.2f}x** e ganhou **R$ {winnings:,}**!"
-            embed.color = discord.Color.green(); await message.edit(embed=embed, view=None); return
+            embed.color = discord.Color.green(); await message_edits.finish(message, embed=embed, view=None); return
     embed.title = "💥 EXPLODIU! 💥"; embed.description = f"O foguete explodiu em **{multiplier:.2f}x**. Você perdeu sua aposta de **R$ {bet:,}**."
-    embed.color = discord.Color.red(); await message.edit(embed=embed, view=None)
+    embed.color = discord.Color.red(); await message_edits.finish(message, embed=embed, view=None)
 
 # --- COMANDO CONFRONTAR CORRIGIDO E MELHORADO ---
 def format_match_log(log_list):
@@ -1384,7 +1528,7 @@ async def confront(ctx, opponent: discord.Member):
     if author == opponent: return await ctx.send("😑 Você não pode se desafiar.")
     if opponent.bot: return await ctx.send("🤖 Você não pode desafiar um bot.")
     
-    async with data_lock:
+    async with locks.hold(author.id, opponent.id):
         all_data = await get_user_data(author.id)
         all_data = await get_user_data(opponent.id)
         author_id, opp_id = str(author.id), str(opponent.id)
@@ -1395,150 +1539,316 @@ async def confront(ctx, opponent: discord.Member):
 
         if None in author_team_raw or None in opp_team_raw: return await ctx.send("⚠️ **Times Incompletos!** Ambos precisam ter 11 jogadores escalados.")
         
-        # Garante que todos os jogadores tenham os campos padrão
-        author_team = [add_player_defaults(p) for p in author_team_raw]
-        opp_team = [add_player_defaults(p) for p in opp_team_raw]
+        lineups = (list(author_team_raw), list(opp_team_raw))
+
+    # A partida inteira é simulada agora; o resto só mostra os lances no chat e grava o resultado.
+    users = (author, opponent)
+    sheets = [TeamSheet.from_team(team, get_player_effective_overall) for team in lineups]
+    result = simulate_match(*sheets)
+    checkpoint = {"user_ids": [author_id, opp_id], "labels": [author.display_name, opponent.display_name], "seed": result.seed,
+                  "sheets": [sheet.to_record() for sheet in sheets],
+                  "lineups": [[{"name": p['name'], "nickname": p.get('nickname')} for p in team] for team in lineups]}
+    try:
+        live = match_manager.register(ctx.guild.id if ctx.guild else None, ctx.channel.id, (author_id, opp_id), checkpoint["labels"], checkpoint)
+    except MatchLimitReached as e:
+        busy = author if e.user_id == author_id else opponent
+        return await ctx.send(f"⏳ {busy.mention} já está no limite de {MAX_MATCHES_PER_USER} partida(s) ao mesmo tempo. Espere terminar para começar outra.")
+    match_manager.run(live, play_live_match(ctx, live, result, users, lineups))
+
+async def play_live_match(ctx, live, result, users, lineups):
+    match_message = await replay_match(ctx, result, users, lineups, narrator_for(ctx.guild), live)
+    await asyncio.sleep(3)
+    announcements, unlocked = await save_match_result(result, users, lineups)
+    # Gravado: a partida não é mais retomada, mesmo que algum envio abaixo falhe.
+    match_manager.complete(live)
+    await send_match_announcements(ctx, announcements, unlocked)
+    await message_edits.finish(match_message, embed=match_final_embed(result, users, lineups))
+
+# Usuário de uma partida retomada do checkpoint (mesmos atributos usados de discord.Member)
+CheckpointUser = namedtuple('CheckpointUser', 'id display_name mention')
+
+async def resolve_interrupted_match(checkpoint):
+    """Simula de novo (mesma semente, mesmas fichas) uma partida que não terminou e grava o resultado."""
+    sheets = [TeamSheet.from_record(record) for record in checkpoint["sheets"]]
+    result = simulate_match(*sheets, seed=checkpoint["seed"])
+    users = tuple(CheckpointUser(int(uid), label, f"<@{uid}>") for uid, label in zip(checkpoint["user_ids"], checkpoint["labels"]))
+    announcements, unlocked = await save_match_result(result, users, checkpoint["lineups"])
+    match_manager.discard(checkpoint["id"])
+    channel = bot.get_channel(checkpoint["channel_id"]) if checkpoint.get("channel_id") else None
+    if channel:
+        await channel.send("♻️ Esta partida foi interrompida e o resultado foi definido na volta do bot:",
+                           embed=match_final_embed(result, users, checkpoint["lineups"]))
+        await send_match_announcements(channel, announcements, unlocked)
+
+async def recover_interrupted_matches():
+    await bot.wait_until_ready()
+    resolved = await match_manager.recover()
+    if resolved: print(f"♻️ {resolved} partida(s) interrompida(s) resolvida(s).")
+
+@bot.command(name='partidas')
+async def live_matches(ctx):
+    matches = sorted(match_manager.live(ctx.guild.id if ctx.guild else None), key=lambda m: m.started_at)
+    if not matches: return await ctx.send(f"📺 Nenhuma partida no ar agora. Desafie alguém com `{BOT_PREFIX}confrontar @usuario`!")
+    embed = discord.Embed(title="📺 Partidas ao Vivo", color=discord.Color.red())
+    embed.description = "\n".join(f"🔵 **{m.labels[0]}** {m.score[0]} x {m.score[1]} **{m.labels[1]}** 🔴 — {m.minute}' em <#{m.channel_id}>" for m in matches)
+    await ctx.send(embed=embed)
 
-    def get_team_sector(team, positions): return [p for p in team if p and any(pos in p['position'].split('/') for pos in positions)]
-    
-    teams = {
-        author.id: {"user": author, "players": author_team, "attack": get_team_sector(author_team, ['PE', 'PD', 'CA', 'MEI']), "mid": get_team_sector(author_team, ['MC', 'VOL']), "def": get_team_sector(author_team, ['ZAG', 'LE', 'LD']), "keeper": get_team_sector(author_team, ['GOL'])[0]},
-        opponent.id: {"user": opponent, "players": opp_team, "attack": get_team_sector(opp_team, ['PE', 'PD', 'CA', 'MEI']), "mid": get_team_sector(opp_team, ['MC', 'VOL']), "def": get_team_sector(opp_team, ['ZAG', 'LE', 'LD']), "keeper": get_team_sector(opp_team, ['GOL'])[0]}
-    }
-    score = {author.id: 0, opponent.id: 0}; goalscorers = {author.id: [], opponent.id: []}; match_log = ["🎙️ **Narrador:** Começa o jogo! Uma grande partida nos espera!"]
-    embed = discord.Embed(title=f"🔵 {author.display_name} vs {opponent.display_name} 🔴", color=discord.Color.greyple())
+@bot.command(name='prever')
+async def predict(ctx, opponent: discord.Member):
+    author = ctx.author
+    if author == opponent: return await ctx.send("😑 Escolha outro usuário para comparar.")
+    if opponent.bot: return await ctx.send("🤖 Bots não têm time.")
+    async with locks.hold(author.id, opponent.id):
+        all_data = await get_user_data(author.id)
+        all_data = await get_user_data(opponent.id)
+        lineups = (list(all_data[str(author.id)].get("team", [])), list(all_data[str(opponent.id)].get("team", [])))
+    if any(None in team or len(team) < 11 for team in lineups): return await ctx.send("⚠️ **Times Incompletos!** Ambos precisam ter 11 jogadores escalados.")
+
+    home, away = (TeamSheet.from_team(team, get_player_effective_overall) for team in lineups)
+    prediction = await asyncio.to_thread(predict_match, home, away, PREDICTION_SIMULATIONS)
+    embed = discord.Embed(title=f"🔮 Previsão: {author.display_name} vs {opponent.display_name}", color=discord.Color.purple())
+    embed.add_field(name=f"Vitória de {author.display_name}", value=f"**{prediction.win:.1%}**", inline=True)
+    embed.add_field(name="Empate", value=f"**{prediction.draw:.1%}**", inline=True)
+    embed.add_field(name=f"Vitória de {opponent.display_name}", value=f"**{prediction.loss:.1%}**", inline=True)
+    embed.add_field(name="Gols esperados", value=f"{prediction.expected_goals[0]:.1f} x {prediction.expected_goals[1]:.1f}", inline=False)
+    embed.add_field(name="Placares mais prováveis", value="\n".join(f"`{h} x {a}` — {chance:.1%}" for (h, a), chance in prediction.scorelines), inline=False)
+    embed.set_footer(text=f"Baseado em {prediction.simulations:,} partidas simuladas com os times atuais.")
+    await ctx.send(embed=embed)
+
+def player_display_name(player):
+    return player.get('nickname') or player['name']
+
+async def replay_match(ctx, result, users, lineups, narrator, live=None):
+    """Mostra a linha do tempo de uma partida já simulada, no ritmo do jogo. Devolve a mensagem do placar.
+
+    live (do match_manager) acompanha o placar e o minuto para o --partidas.
+    """
+    names = [[player_display_name(p) for p in team] for team in lineups]
+    labels = [user.display_name for user in users]
+    # Narrações dos lances que vão acontecer começam a ser geradas já.
+    for event in result.events:
+        if event.kind == 'goal': narrator.prefetch("goal", player=names[event.side][event.attacker], team=labels[event.side])
+        elif event.kind == 'save': narrator.prefetch("save", player=names[1 - event.side][event.keeper])
+
+    score = [0, 0]; match_log = ["🎙️ **Narrador:** Começa o jogo! Uma grande partida nos espera!"]
+    if live is not None: live.score = score
+    embed = discord.Embed(title=f"🔵 {labels[0]} vs {labels[1]} 🔴", color=discord.Color.greyple())
     embed.add_field(name="Placar", value="0 - 0", inline=False)
     embed.add_field(name="Ao Vivo 🔴", value=format_match_log(match_log), inline=False)
     match_message = await ctx.send(embed=embed)
-    
-    for minute in range(1, 92):
-        await asyncio.sleep(1.5)
-        
-        mid_battle = sum(get_player_effective_overall(p) for p in teams[author.id]["mid"]) - sum(get_player_effective_overall(p) for p in teams[opponent.id]["mid"])
-        if random.random() < (0.5 + mid_battle / 250): possession_team_id = author.id
-        else: possession_team_id = opponent.id
-        attacker_id = possession_team_id; defender_id = opponent.id if possession_team_id == author.id else author.id
-        
-        playmaker = random.choice(teams[attacker_id]["mid"] or teams[attacker_id]["attack"]); attacker = random.choice(teams[attacker_id]["attack"]); defender = random.choice(teams[defender_id]["def"]); keeper = teams[defender_id]["keeper"]
-        
-        playmaker_name = playmaker.get('nickname') or playmaker['name']
-        attacker_name = attacker.get('nickname') or attacker['name']
-        defender_name = defender.get('nickname') or defender['name']
-        keeper_name = keeper.get('nickname') or keeper['name']
-
-        match_log.append(f"⚡ {minute}' - **{playmaker_name}** inicia o ataque para **{teams[attacker_id]['user'].display_name}**...")
-        embed.set_field_at(1, name="Ao Vivo 🔴", value=format_match_log(match_log)); await match_message.edit(embed=embed)
-        await asyncio.sleep(2)
-
-        log_entry = ""; is_goal = False
-        if (get_player_effective_overall(attacker) - get_player_effective_overall(defender)) > random.randint(-25, 25):
-            shot_power = get_player_effective_overall(attacker) + random.randint(-10, 10); save_power = get_player_effective_overall(keeper) + random.randint(-15, 15)
-            if shot_power > save_power:
-                is_goal = True
-                prompt = f"Você é um narrador de futebol brasileiro. Narre um gol de forma empolgante. Marcador do Gol: {attacker_name}. Time: {teams[attacker_id]['user'].display_name}. Seja criativo e use gírias."
-                log_entry = await generate_ai_narration(prompt, f"⚽ GOOOOL! {attacker_name} marca!")
-            else:
-                prompt = f"Você é um narrador de futebol brasileiro. Narre uma defesa espetacular. Goleiro: {keeper_name}. Atacante: {attacker_name}. Seja criativo."
-                log_entry = await generate_ai_narration(prompt, f"🧤 DEFESAÇA! {keeper_name} faz um milagre!")
-        else:
-            log_entry = f"🧱 **{defender_name}** faz um desarme limpo em {attacker_name}."
-
-        if is_goal:
-            score[attacker_id] += 1
-            goalscorers[attacker_id].append(f"{attacker_name} {minute}'")
-            async with data_lock:
-                global_stats = get_global_stats()
-                scorer_entry = next((item for item in global_stats['top_scorers'] if item['name'] == attacker['name']), None)
-                if scorer_entry: 
-                    scorer_entry['goals'] += 1
-                else: 
-                    global_stats['top_scorers'].append({'name': attacker['name'], 'nickname': attacker.get('nickname'), 'owner_name': teams[attacker_id]['user'].display_name, 'goals': 1})
-                save_global_stats(global_stats)
-            
-            # Checar desafio diário de marcar gol
-            challenge_data = await get_user_data(attacker_id)
-            challenge = challenge_data[str(attacker_id)]['daily_challenge']
-            if not challenge['completed'] and challenge['task_id'] == 'marcar_gol':
-                challenge_info = next((c for c in DAILY_CHALLENGES if c['id'] == 'marcar_gol'), None)
-                challenge_data[str(attacker_id)]['money'] += challenge_info['reward']
-                challenge['completed'] = True
-                save_data(USER_DATA_FILE, challenge_data)
-                await ctx.send(f"🎯 {teams[attacker_id]['user'].mention} completou o desafio diário 'Marcar um Gol' e ganhou `R$ {challenge_info['reward']:,}`!")
 
+    for event in result.events:
+        await asyncio.sleep(MATCH_TICK_SECONDS)
+        if live is not None: live.minute = event.minute
+        attacking, defending = event.side, 1 - event.side
+        match_log.append(f"⚡ {event.minute}' - **{names[attacking][event.playmaker]}** inicia o ataque para **{labels[attacking]}**...")
+        embed.set_field_at(1, name="Ao Vivo 🔴", value=format_match_log(match_log)); message_edits.submit(match_message, embed=embed)
+
+        # A narração da IA corre durante a pausa do lance.
+        pending_narration = None
+        if event.kind == 'goal':
+            pending_narration = asyncio.create_task(narrator.narrate("goal", player=names[attacking][event.attacker], team=labels[attacking]))
+        elif event.kind == 'save':
+            pending_narration = asyncio.create_task(narrator.narrate("save", player=names[defending][event.keeper]))
+        else:
+            log_entry = commentary.line("tackle", player=names[defending][event.defender], attacker=names[attacking][event.attacker])
+        await asyncio.sleep(MATCH_PLAY_SECONDS)
+        if pending_narration: log_entry = await pending_narration
+        if event.kind == 'goal': score[attacking] += 1
 
         match_log.append(log_entry)
-        embed.set_field_at(0, name="Placar", value=f"🔵 {score[author.id]} - {score[opponent.id]} 🔴")
+        if event.minute == HALF_TIME_MINUTE: match_log.append(commentary.line("halftime", home=labels[0], away=labels[1], home_score=score[0], away_score=score[1]))
+        embed.set_field_at(0, name="Placar", value=f"🔵 {score[0]} - {score[1]} 🔴")
         embed.set_field_at(1, name="Ao Vivo 🔴", value=format_match_log(match_log))
-        if minute == 45: match_log.append("\n⏸️ **FIM DO PRIMEIRO TEMPO!**\n")
-        await match_message.edit(embed=embed)
+        message_edits.submit(match_message, embed=embed)
+    return match_message
+
+MATCH_CHALLENGE_TITLES = {'marcar_gol': "Marcar um Gol", 'jogar_partida': "Jogar uma Partida", 'vencer_partida': "Vencer uma Partida"}
+MATCH_WIN_ACHIEVEMENTS = {1: "primeira_vitoria", 10: "bom_de_bola", 50: "invencivel"}
+
+async def save_match_result(result, users, lineups):
+    """Grava o resultado de uma vez (artilheiros, histórico, vitórias, desafios, conquistas), sem nada de Discord.
+
+    Tudo é gravado com os locks dos dois usuários e das estatísticas já pegos, sem pausas
+    no meio: ou a partida foi gravada inteira, ou nada dela. Devolve (avisos dos desafios,
+    conquistas desbloqueadas pelo vencedor) para send_match_announcements.
+    """
+    (home, away), score = users, result.score
+    winner = None if result.winner is None else users[result.winner]
+    goals = result.goals()
+
+    announcements = []; unlocked = []
+    async with locks.hold(home.id, away.id, stats=True):
+        if goals:
+            global_stats = get_global_stats()
+            add_top_scorers(global_stats, [(lineups[event.side][event.attacker], users[event.side].display_name, 1) for event in goals])
+            save_global_stats(global_stats)
+        all_data = await get_user_data(home.id)
+        all_data = await get_user_data(away.id)
+        for side, user_obj in enumerate(users):
+            other = users[1 - side]; own_score, other_score = score[side], score[1 - side]
+            outcome = "Vitória" if winner == user_obj else ("Empate" if winner is None else "Derrota")
+            user_info = all_data[str(user_obj.id)]
+            user_info['match_history'].append(f"**{outcome}** vs {other.display_name} ({own_score}x{other_score})")
+            if winner == user_obj:
+                user_info["wins"] += 1
+                achievement = MATCH_WIN_ACHIEVEMENTS.get(user_info["wins"])
+                if achievement and achievement not in user_info["achievements"]:
+                    user_info["achievements"].append(achievement); unlocked.append(achievement)
+
+            # Desafios diários: marcar um gol, jogar e vencer uma partida
+            challenge = user_info['daily_challenge']
+            if not challenge['completed'] and challenge['task_id'] in MATCH_CHALLENGE_TITLES and (
+                (challenge['task_id'] == 'marcar_gol' and own_score > 0) or challenge['task_id'] == 'jogar_partida'
+                or (challenge['task_id'] == 'vencer_partida' and winner == user_obj)):
+                challenge_info = next(c for c in DAILY_CHALLENGES if c['id'] == challenge['task_id'])
+                user_info['money'] += challenge_info['reward']
+                challenge['completed'] = True
+                announcements.append(f"🎯 {user_obj.mention} completou o desafio diário '{MATCH_CHALLENGE_TITLES[challenge['task_id']]}' e ganhou `R$ {challenge_info['reward']:,}`!")
+        save_user_data(str(home.id), str(away.id))
+    return announcements, unlocked
 
-    await asyncio.sleep(3)
-    
-    winner = None; loser = None
-    if score[author.id] > score[opponent.id]: 
-        winner = author; loser = opponent
-    elif score[opponent.id] > score[author.id]: 
-        winner = opponent; loser = author
+async def send_match_announcements(ctx, announcements, unlocked):
+    for announcement in announcements: await ctx.send(announcement)
+    for achievement_id in unlocked: await ctx.send(embed=achievement_embed(achievement_id))
 
+def match_final_embed(result, users, lineups):
+    (home, away), score = users, result.score
+    winner = None if result.winner is None else users[result.winner]
     final_embed = discord.Embed(title="🏁 FIM DE JOGO 🏁", color=discord.Color.gold())
-    final_embed.add_field(name="Resultado Final", value=f"**{author.display_name} {score[author.id]} x {score[opponent.id]} {opponent.display_name}**", inline=False)
-    
-    # Atualiza histórico e stats
-    async with data_lock:
-        all_data = load_data(USER_DATA_FILE, {})
-        author_history_entry = f"**Vitória** vs {opponent.display_name} ({score[author.id]}x{score[opponent.id]})" if winner == author else (f"**Derrota** vs {opponent.display_name} ({score[author.id]}x{score[opponent.id]})" if loser == author else f"**Empate** vs {opponent.display_name} ({score[author.id]}x{score[opponent.id]})")
-        opp_history_entry = f"**Vitória** vs {author.display_name} ({score[opponent.id]}x{score[author.id]})" if winner == opponent else (f"**Derrota** vs {author.display_name} ({score[opponent.id]}x{score[author.id]})" if loser == opponent else f"**Empate** vs {author.display_name} ({score[opponent.id]}x{score[author.id]})")
-        
-        all_data[author_id]['match_history'].append(author_history_entry)
-        all_data[opp_id]['match_history'].append(opp_history_entry)
-        
-        # Checar desafios de jogar/vencer
-        for user_obj in [author, opponent]:
-            user_id_str = str(user_obj.id)
-            challenge = all_data[user_id_str]['daily_challenge']
-            if not challenge['completed']:
-                if challenge['task_id'] == 'jogar_partida':
-                    challenge_info = next(c for c in DAILY_CHALLENGES if c['id'] == 'jogar_partida')
-                    all_data[user_id_str]['money'] += challenge_info['reward']
-                    challenge['completed'] = True
-                    await ctx.send(f"🎯 {user_obj.mention} completou o desafio diário 'Jogar uma Partida' e ganhou `R$ {challenge_info['reward']:,}`!")
-                elif winner == user_obj and challenge['task_id'] == 'vencer_partida':
-                    challenge_info = next(c for c in DAILY_CHALLENGES if c['id'] == 'vencer_partida')
-                    all_data[user_id_str]['money'] += challenge_info['reward']
-                    challenge['completed'] = True
-                    await ctx.send(f"🎯 {user_obj.mention} completou o desafio diário 'Vencer uma Partida' e ganhou `R$ {challenge_info['reward']:,}`!")
-
-        if winner:
-            final_embed.description = f"🏆 O grande vencedor é **{winner.mention}**! 🏆"
-            winner_data = all_data[str(winner.id)]
-            winner_data["wins"] += 1
-            # Checar conquistas
-            if winner_data["wins"] == 1: await check_and_grant_achievement(winner.id, "primeira_vitoria", ctx)
-            if winner_data["wins"] == 10: await check_and_grant_achievement(winner.id, "bom_de_bola", ctx)
-            if winner_data["wins"] == 50: await check_and_grant_achievement(winner.id, "invencivel", ctx)
+    verdict = f"🏆 O grande vencedor é **{winner.mention}**! 🏆" if winner else "🤝 A partida terminou em empate! 🤝"
+    final_embed.description = commentary.line("fulltime", home=home.display_name, away=away.display_name, home_score=score[0], away_score=score[1]) + "\n" + verdict
+    final_embed.add_field(name="Resultado Final", value=f"**{home.display_name} {score[0]} x {score[1]} {away.display_name}**", inline=False)
+    for side, user_obj in enumerate(users):
+        scorers = ", ".join(f"{player_display_name(lineups[side][e.attacker])} {e.minute}'" for e in result.goals(side)) or "Ninguém"
+        final_embed.add_field(name=f"Gols de {user_obj.display_name}", value=scorers, inline=True)
+    return final_embed
+
+
+# --- TORNEIOS ---
+CUP_PHASE_NAMES = ["Final", "Semifinal", "Quartas de final", "Oitavas de final"]
+tournament_lock = asyncio.Lock()
+
+def tournament_entrants(guild):
+    """{id do usuário: (membro, escalação)} de todos os membros do servidor com time completo."""
+    entrants = {}
+    for uid, data in user_store.all().items():
+        team = data.get('team') or []
+        if len(team) < 11 or None in team: continue
+        member = guild.get_member(int(uid))
+        if member is None or member.bot: continue
+        entrants[uid] = (member, list(team))
+    return entrants
+
+def run_tournament(kind, sheets):
+    """Roda a liga ou a copa num pool de processos próprio. Bloqueante: chamar via asyncio.to_thread."""
+    with ProcessPoolExecutor(max_workers=TOURNAMENT_WORKERS) as pool:
+        if kind == 'league': return run_league(sheets, pool)
+        return run_cup(sheets, pool, strength=lambda uid: sum(ovr for _, ovr in sheets[uid].attack + sheets[uid].midfield + sheets[uid].defense))
+
+def cup_phase_name(round_index, total_rounds):
+    remaining = total_rounds - 1 - round_index
+    return CUP_PHASE_NAMES[remaining] if remaining < len(CUP_PHASE_NAMES) else f"{round_index + 1}ª fase"
+
+async def commit_tournament_result(result, entrants):
+    """Grava o torneio inteiro de uma vez: artilharia global, vitórias e uma linha no histórico de cada um."""
+    async with locks.hold(*entrants, stats=True):
+        global_stats = get_global_stats()
+        add_top_scorers(global_stats, [(entrants[uid][1][slot], entrants[uid][0].display_name, goals) for (uid, slot), goals in result.scorers.items()])
+        save_global_stats(global_stats)
+
+        if result.kind == 'league':
+            summaries = {row.entrant: f"🏟️ **Liga** — {position}º lugar ({row.wins}V {row.draws}E {row.losses}D, {row.goals_for} gols)" for position, row in enumerate(result.table(), 1)}
         else:
-            final_embed.description = "🤝 A partida terminou em empate! 🤝"
-        
-        save_data(USER_DATA_FILE, all_data)
-        
-    author_scorers = ", ".join(goalscorers[author.id]) or "Ninguém"; opp_scorers = ", ".join(goalscorers[opponent.id]) or "Ninguém"
-    final_embed.add_field(name=f"Gols de {author.display_name}", value=author_scorers, inline=True)
-    final_embed.add_field(name=f"Gols de {opponent.display_name}", value=opp_scorers, inline=True)
-    await match_message.edit(embed=final_embed)
+            last_round = {uid: i for i, pairs in enumerate(result.rounds) for pair in pairs for uid in pair if uid is not None}
+            summaries = {uid: "🏆 **Copa** — Campeão!" if uid == result.champion else f"🏆 **Copa** — eliminado na {cup_phase_name(i, len(result.rounds))}" for uid, i in last_round.items()}
+        # Na copa, quem passa nos pênaltis empatou no placar: a vitória vem da disputa.
+        shootout_wins = Counter(home if shootout[0] == 0 else away for home, away, _, shootout in result.matches if shootout)
+        for uid, summary in summaries.items():
+            all_data = await get_user_data(uid)
+            standing = result.standings.get(uid)
+            if standing: all_data[uid]['wins'] += standing.wins
+            all_data[uid]['wins'] += shootout_wins[uid]
+            all_data[uid]['match_history'].append(summary)
+        save_user_data(*summaries)
+
+def tournament_embed(result, entrants):
+    name = lambda uid: entrants[uid][0].display_name
+    if result.kind == 'league':
+        embed = discord.Embed(title="🏟️ Liga do Servidor — Classificação Final", color=discord.Color.gold())
+        medals = ["🥇", "🥈", "🥉"]
+        embed.description = "\n".join(
+            f"{medals[i] if i < 3 else '🔹'} **{name(row.entrant)}** — {row.points} pts ({row.wins}V {row.draws}E {row.losses}D, SG {row.goal_difference:+})"
+            for i, row in enumerate(result.table()[:10]))
+    else:
+        embed = discord.Embed(title="🏆 Copa do Servidor", color=discord.Color.gold())
+        home, away, score, shootout = result.matches[-1]
+        final = f"**{name(home)} {score[0]} x {score[1]} {name(away)}**"
+        if shootout: final += f" (pênaltis: {shootout[1][0]} x {shootout[1][1]})"
+        embed.description = f"👑 Campeão: **{name(result.champion)}**\nFinal: {final}"
+    scorers = [f"⚽ **{player_display_name(entrants[uid][1][slot])}** ({name(uid)}) — {goals} gols" for (uid, slot), goals in result.top_scorers(5)]
+    embed.add_field(name="Artilharia", value="\n".join(scorers) or "Ninguém marcou.", inline=False)
+    embed.set_footer(text=f"{len(entrants)} times, {len(result.matches):,} partidas.")
+    return embed
+
+async def start_tournament(ctx, kind):
+    if ctx.guild is None: return await ctx.send("Torneios só funcionam em servidores.")
+    if tournament_lock.locked(): return await ctx.send("⏳ Já tem um torneio sendo disputado. Aguarde o fim dele.")
+    async with tournament_lock:
+        entrants = tournament_entrants(ctx.guild)
+        if len(entrants) < 2: return await ctx.send("⚠️ São necessários pelo menos 2 membros com o time completo (11 jogadores).")
+        msg = await ctx.send(f"⚙️ Simulando {'a liga' if kind == 'league' else 'a copa'} com **{len(entrants)}** times...")
+        sheets = {uid: TeamSheet.from_team(team, get_player_effective_overall) for uid, (_, team) in entrants.items()}
+        result = await asyncio.to_thread(run_tournament, kind, sheets)
+        await commit_tournament_result(result, entrants)
+        await msg.edit(content=None, embed=tournament_embed(result, entrants))
+
+@bot.command(name='liga')
+@commands.has_permissions(administrator=True)
+async def league(ctx):
+    await start_tournament(ctx, 'league')
+
+@bot.command(name='copa')
+@commands.has_permissions(administrator=True)
+async def cup(ctx):
+    await start_tournament(ctx, 'cup')
+
+@league.error
+@cup.error
+async def tournament_error(ctx, error):
+    if isinstance(error, commands.MissingPermissions): await ctx.send("🚫 Você não tem permissão para usar este comando.")
 
 
 # --- COMANDOS DE ADMINISTRADOR ---
+@bot.command(name='narrador')
+@commands.has_permissions(administrator=True)
+async def set_narrator(ctx, mode: str = None):
+    if ctx.guild is None: return await ctx.send("Este comando só funciona em servidores.")
+    current = 'local' if narrator_for(ctx.guild) is commentary else 'ia'
+    if mode is None:
+        status = "" if narration.available or current == 'local' else " (IA indisponível agora: usando o narrador local)"
+        return await ctx.send(f"🎙️ Narrador deste servidor: **{current}**{status}. Use `{BOT_PREFIX}narrador ia` ou `{BOT_PREFIX}narrador local`.")
+    mode = mode.lower()
+    if mode not in ('ia', 'local'): return await ctx.send(f"Modo inválido. Use `{BOT_PREFIX}narrador ia` ou `{BOT_PREFIX}narrador local`.")
+    settings = get_guild_settings()
+    settings.setdefault(str(ctx.guild.id), {})['narrator'] = mode
+    save_guild_settings(settings)
+    await ctx.send(f"🎙️ Pronto! As partidas deste servidor agora são narradas pelo narrador **{mode}**.")
+
+@set_narrator.error
+async def set_narrator_error(ctx, error):
+    if isinstance(error, commands.MissingPermissions): await ctx.send("🚫 Você não tem permissão para usar este comando.")
+
 @bot.command(name='money')
 @commands.has_permissions(administrator=True)
 async def give_money(ctx, user: discord.Member, amount: int):
     if user.bot: return await ctx.send("Você não pode dar dinheiro para um bot.")
     if amount == 0: return await ctx.send("A quantia não pode ser zero.")
-    async with data_lock:
+    async with locks.hold(user.id):
         all_data = await get_user_data(user.id)
-        user_id = str(user.id); all_data[user_id]['money'] += amount
-        if all_data[user_id]['money'] >= 1500000000:
-            await check_and_grant_achievement(user.id, "primeiro_milhao", ctx)
-        save_data(USER_DATA_FILE, all_data)
+        user_id = str(user.id); user_store.add_money(user_id, amount)
+    if all_data[user_id]['money'] >= 1500000000:
+        await check_and_grant_achievement(user.id, "primeiro_milhao", ctx)
     verb = "adicionados" if amount > 0 else "removidos"; new_balance = all_data[str(user.id)]['money']
     await ctx.send(f"✅ Sucesso! **R$ {abs(amount):,}** foram {verb} para a conta de {user.mention}.\nSaldo atual: R$ {new_balance:,}.")
 
@@ -1557,14 +1867,15 @@ async def full_reset(ctx):
     try: await bot.wait_for('message', timeout=60.0, check=check)
     except asyncio.TimeoutError: return await ctx.send("Tempo esgotado. O reset total foi cancelado.")
     msg = await ctx.send("💥 **Confirmado.** Iniciando reset total...")
-    async with data_lock:
-        files_to_delete = [USER_DATA_FILE, CONTRACTED_PLAYERS_FILE, GLOBAL_STATS_FILE, GAME_STATE_FILE]
+    async with locks.hold(contracts=True, stats=True):
+        files_to_delete = [USER_DATA_FILE, USER_JOURNAL_FILE, CONTRACTED_PLAYERS_FILE, GLOBAL_STATS_FILE]
         files_deleted = []
         try:
             for file_path in files_to_delete:
                 if os.path.exists(file_path): 
                     os.remove(file_path)
                     files_deleted.append(os.path.basename(file_path))
+            user_store.clear(); contracts.clear()
         except Exception as e: return await msg.edit(content=f"❌ Erro ao apagar arquivos: {e}")
     await msg.edit(content=f"🗑️ Arquivos `{', '.join(files_deleted)}` foram apagados.\n\n✅ **RESET TOTAL CONCLUÍDO.**\nÉ altamente recomendável que você **reinicie o bot agora**.")
 
@@ -1577,9 +1888,8 @@ async def full_reset_error(ctx, error):
 async def best_team(ctx, user: discord.Member):
     if user.bot: return await ctx.send("Bots não podem ter times.")
     await ctx.send(f"🤖 Montando o time dos sonhos para {user.mention}... Isso pode levar um momento.")
-    async with data_lock:
-        all_user_data = load_data(USER_DATA_FILE, {})
-        contracted_players = load_data(CONTRACTED_PLAYERS_FILE, [])
+    async with locks.hold(user.id, contracts=True):
+        all_user_data = user_store.all()
         target_user_id = str(user.id)
         
         # Garante que o usuário existe
@@ -1588,7 +1898,7 @@ async def best_team(ctx, user: discord.Member):
         
         # Libera jogadores atuais do usuário
         current_squad_names = {p['name'] for p in all_user_data[target_user_id].get("squad", [])}
-        contracted_players = [p_name for p_name in contracted_players if p_name not in current_squad_names]
+        contracts.release(*current_squad_names)
         
         all_user_data[target_user_id]['squad'] = []
         all_user_data[target_user_id]['team'] = [None] * 11
@@ -1597,19 +1907,15 @@ async def best_team(ctx, user: discord.Member):
         formation_slots = {0: "GOL", 1: "ZAG", 2: "ZAG", 3: "LE", 4: "LD", 5: "VOL", 6: "MC", 7: "MEI", 8: "PE", 9: "PD", 10: "CA"}
         
         for slot_index, position in formation_slots.items():
-            candidates = [p for p in ALL_PLAYERS if p['position'] == position and p['name'] not in contracted_players]
-            candidates.sort(key=lambda p: p['overall'], reverse=True)
-            if candidates:
-                best_player = candidates[0]
-                best_player_with_defaults = add_player_defaults(best_player.copy())
-                new_team[slot_index] = best_player_with_defaults
-                contracted_players.append(best_player['name'])
+            best_player = next((p for p in catalog.at_position(position) if contracts.is_free(p['name'])), None)
+            if best_player:
+                new_team[slot_index] = new_owned_player(best_player)
+                contracts.claim(best_player['name'], target_user_id)
 
         all_user_data[target_user_id]['team'] = new_team
         all_user_data[target_user_id]['squad'] = [p for p in new_team if p]
         
-        save_data(USER_DATA_FILE, all_user_data)
-        save_data(CONTRACTED_PLAYERS_FILE, contracted_players)
+        save_user_data(target_user_id)
         
     await ctx.send(f"✅ Time dos sonhos montado para {user.mention}! Use `{BOT_PREFIX}meutime` para ver o resultado.")
 
@@ -1624,6 +1930,9 @@ if __name__ == "__main__":
     TOKEN = os.environ.get('DISCORD_TOKEN')
     keep_alive() 
     if TOKEN:
-        bot.run(TOKEN)
+        try:
+            bot.run(TOKEN)
+        finally:
+            user_store.flush_sync()
     else:
         print("ERRO: Token do Discord não encontrado nas variáveis de ambiente.")
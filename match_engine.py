@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# RafutBot - Motor de Partidas
+# ----------------------------------------------------------------------
+# A simulação do --confrontar sem nada de Discord: recebe os times já
+# resumidos por setor (overall efetivo de cada jogador e força do meio-
+# campo calculados uma vez) e um gerador aleatório com semente, e devolve
+# o placar e a linha do tempo de todos os lances. Uma partida inteira
+# leva microssegundos; quem mostra os lances no chat (com pausas, edições
+# e narração) só reproduz essa linha do tempo.
+# ----------------------------------------------------------------------
+
+import random
+from collections import namedtuple
+
+ATTACK_POSITIONS = ('PE', 'PD', 'CA', 'MEI')
+MIDFIELD_POSITIONS = ('MC', 'VOL')
+DEFENSE_POSITIONS = ('ZAG', 'LE', 'LD')
+KEEPER_POSITIONS = ('GOL',)
+MATCH_MINUTES = 91
+HALF_TIME_MINUTE = 45
+
+# Um lance: side é quem ataca (0 = mandante, 1 = visitante); os jogadores são
+# posições (0-10) na escalação do time de cada um. kind é "goal", "save" ou "tackle".
+MatchEvent = namedtuple('MatchEvent', 'minute kind side playmaker attacker defender keeper')
+
+
+def _sector(team, positions, overall):
+    return tuple((i, overall(p)) for i, p in enumerate(team) if p and any(pos in p['position'].split('/') for pos in positions))
+
+
+class TeamSheet:
+    """Um time resumido para o motor: (posição na escalação, overall efetivo) de cada setor."""
+    __slots__ = ('attack', 'midfield', 'defense', 'keeper', 'midfield_strength')
+
+    def __init__(self, attack, midfield, defense, keeper):
+        self.attack = tuple(attack)
+        self.midfield = tuple(midfield)
+        self.defense = tuple(defense)
+        self.keeper = keeper
+        self.midfield_strength = sum(ovr for _, ovr in self.midfield)
+
+    @classmethod
+    def from_team(cls, team, overall):
+        """Monta a ficha a partir da escalação (11 jogadores) e da função de overall efetivo.
+
+        Times sem algum setor não quebram a partida: sem atacantes ataca o
+        meio-campo, sem defensores defende o meio-campo e sem goleiro vai o
+        jogador da posição 0 (a vaga de goleiro).
+        """
+        outfield = tuple((i, overall(p)) for i, p in enumerate(team) if p)
+        attack = _sector(team, ATTACK_POSITIONS, overall)
+        midfield = _sector(team, MIDFIELD_POSITIONS, overall)
+        defense = _sector(team, DEFENSE_POSITIONS, overall)
+        keepers = _sector(team, KEEPER_POSITIONS, overall)
+        keeper = keepers[0] if keepers else (outfield[0] if outfield else (0, 0))
+        return cls(attack or midfield or outfield, midfield, defense or midfield or outfield, keeper)
+
+    def to_record(self):
+        return {'attack': self.attack, 'midfield': self.midfield, 'defense': self.defense, 'keeper': self.keeper}
+
+    @classmethod
+    def from_record(cls, record):
+        return cls([tuple(p) for p in record['attack']], [tuple(p) for p in record['midfield']],
+                   [tuple(p) for p in record['defense']], tuple(record['keeper']))
+
+
+class MatchResult:
+    """Placar final e linha do tempo de uma partida simulada."""
+    __slots__ = ('seed', 'score', 'events')
+
+    def __init__(self, seed, score, events):
+        self.seed = seed
+        self.score = score
+        self.events = events
+
+    @property
+    def winner(self):
+        """0 (mandante), 1 (visitante) ou None no empate."""
+        if self.score[0] == self.score[1]:
+            return None
+        return 0 if self.score[0] > self.score[1] else 1
+
+    def goals(self, side=None):
+        """Os lances de gol, de um lado ou dos dois."""
+        return [e for e in self.events if e.kind == 'goal' and (side is None or e.side == side)]
+
+
+def simulate_match(home, away, seed=None, minutes=MATCH_MINUTES):
+    """Simula a partida inteira entre duas TeamSheet e devolve um MatchResult.
+
+    Mesmas regras do --confrontar: o meio-campo decide a posse, o atacante
+    tem que passar pelo defensor e o chute tem que passar pelo goleiro.
+    A mesma semente sempre gera a mesma partida.
+    """
+    if seed is None:
+        seed = random.getrandbits(32)
+    # Sorteios com rng.random() direto: randint/choice custam várias vezes mais
+    # e aqui são até seis por minuto. int(rand() * n) - k é uniforme em [-k, n - k - 1].
+    rand = random.Random(seed).random
+    sides = (home, away)
+    playmakers = (home.midfield or home.attack, away.midfield or away.attack)
+    home_possession = 0.5 + (home.midfield_strength - away.midfield_strength) / 250
+    score = [0, 0]
+    events = []
+    for minute in range(1, minutes + 1):
+        side = 0 if rand() < home_possession else 1
+        attacking, defending = sides[side], sides[1 - side]
+        playmaker = playmakers[side][int(rand() * len(playmakers[side]))]
+        attacker = attacking.attack[int(rand() * len(attacking.attack))]
+        defender = defending.defense[int(rand() * len(defending.defense))]
+        keeper = defending.keeper
+        if attacker[1] - defender[1] > int(rand() * 51) - 25:
+            if attacker[1] + int(rand() * 21) - 10 > keeper[1] + int(rand() * 31) - 15:
+                kind = 'goal'
+                score[side] += 1
+            else:
+                kind = 'save'
+        else:
+            kind = 'tackle'
+        events.append(MatchEvent(minute, kind, side, playmaker[0], attacker[0], defender[0], keeper[0]))
+    return MatchResult(seed, tuple(score), events)
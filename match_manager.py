@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# RafutBot - Partidas em Andamento
+# ----------------------------------------------------------------------
+# Registro das partidas do --confrontar que estão sendo mostradas no chat:
+# cada uma roda na sua própria tarefa, cada usuário tem um limite de
+# partidas simultâneas e o --partidas lista as que estão no ar com o
+# placar. Como a partida é simulada antes de começar, basta guardar a
+# semente e as fichas dos times num checkpoint em disco: se o bot cair no
+# meio, ao voltar a mesma partida é simulada de novo e o resultado é
+# gravado na hora.
+# ----------------------------------------------------------------------
+
+import asyncio
+import itertools
+import json
+import os
+import time
+
+from storage import atomic_write
+
+
+class MatchLimitReached(Exception):
+    """Um dos usuários já está no limite de partidas simultâneas."""
+
+    def __init__(self, user_id):
+        super().__init__(user_id)
+        self.user_id = user_id
+
+
+class LiveMatch:
+    """Uma partida no ar. score e minute são atualizados pelo replay."""
+    __slots__ = ('id', 'guild_id', 'channel_id', 'user_ids', 'labels', 'checkpoint', 'score', 'minute', 'started_at', 'task')
+
+    def __init__(self, match_id, guild_id, channel_id, user_ids, labels, checkpoint):
+        self.id = match_id
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.user_ids = tuple(str(uid) for uid in user_ids)
+        self.labels = tuple(labels)
+        self.checkpoint = checkpoint
+        self.score = [0, 0]
+        self.minute = 0
+        self.started_at = time.time()
+        self.task = None
+
+
+class MatchManager:
+    """Partidas em andamento, limite por usuário e checkpoint para retomar depois de uma queda.
+
+    O checkpoint de cada partida (um dicionário serializável em JSON, montado
+    por quem chama) fica no arquivo até complete() ser chamado, depois que o
+    resultado foi gravado. Partidas que terminam com erro são entregues na hora
+    a resolver(checkpoint); as que ficaram no arquivo por uma queda do bot, em
+    recover().
+    """
+
+    def __init__(self, checkpoint_file, max_per_user=1, resolver=None):
+        self.checkpoint_file = checkpoint_file
+        self.max_per_user = max_per_user
+        self.resolver = resolver
+        self._live = {}
+        self._checkpoints = {}
+        self._ids = itertools.count(int(time.time() * 1000))
+
+    # --- Registro ---
+    def active_for(self, user_id):
+        return sum(1 for match in self._live.values() if str(user_id) in match.user_ids)
+
+    def live(self, guild_id=None):
+        return [m for m in self._live.values() if guild_id is None or m.guild_id == guild_id]
+
+    def register(self, guild_id, channel_id, user_ids, labels, checkpoint):
+        """Registra a partida e grava o checkpoint; MatchLimitReached se alguém já está no limite."""
+        for user_id in user_ids:
+            if self.active_for(user_id) >= self.max_per_user:
+                raise MatchLimitReached(str(user_id))
+        match = LiveMatch(str(next(self._ids)), guild_id, channel_id, user_ids, labels, checkpoint)
+        self._live[match.id] = match
+        self._checkpoints[match.id] = dict(checkpoint, id=match.id, guild_id=guild_id, channel_id=channel_id)
+        self._save()
+        return match
+
+    def run(self, match, coro):
+        """Roda a partida numa tarefa própria; erros nela não derrubam nada além dela."""
+        match.task = asyncio.create_task(coro)
+        match.task.add_done_callback(lambda task: self._finished(match, task))
+        return match.task
+
+    def complete(self, match):
+        """O resultado foi gravado: a partida não precisa mais ser retomada.
+
+        Chamar logo depois de gravar, antes de qualquer envio ao Discord: se um envio
+        falhar, a partida não pode ser resolvida (e contada) de novo.
+        """
+        self.discard(match.id)
+
+    def discard(self, match_id):
+        """Apaga o checkpoint (o resolver chama com checkpoint["id"] assim que grava o resultado)."""
+        if self._checkpoints.pop(match_id, None) is not None:
+            self._save()
+
+    def _finished(self, match, task):
+        self._live.pop(match.id, None)
+        if task.cancelled():
+            return  # desligamento: o checkpoint fica para o recover()
+        error = task.exception()
+        if error is not None:
+            print(f"❌ Erro na partida {match.id}: {error!r}")
+            checkpoint = self._checkpoints.get(match.id)
+            if checkpoint is not None and self.resolver is not None:
+                asyncio.create_task(self._resolve(match.id, checkpoint))
+
+    async def _resolve(self, match_id, checkpoint):
+        try:
+            await self.resolver(checkpoint)
+        except Exception as e:
+            print(f"❌ Não foi possível resolver a partida {match_id}: {e!r}")
+            return
+        self.discard(match_id)
+
+    async def recover(self):
+        """Resolve as partidas que estavam no ar quando o bot caiu. Devolve quantas foram resolvidas."""
+        self._checkpoints.update(self._load())
+        pending = [(match_id, cp) for match_id, cp in self._checkpoints.items() if match_id not in self._live]
+        for match_id, checkpoint in pending:
+            await self._resolve(match_id, checkpoint)
+        return len(pending)
+
+    async def stop(self):
+        """Cancela as partidas no ar (os checkpoints continuam no arquivo)."""
+        tasks = [m.task for m in self._live.values() if m.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # --- Arquivo ---
+    def _load(self):
+        if not os.path.exists(self.checkpoint_file):
+            return {}
+        try:
+            with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ Checkpoint de partidas ilegível ({e}); partidas interrompidas não serão retomadas.")
+            return {}
+
+    def _save(self):
+        atomic_write(self.checkpoint_file, json.dumps(self._checkpoints, ensure_ascii=False))
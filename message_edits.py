@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# RafutBot - Edição de Mensagens
+# ----------------------------------------------------------------------
+# Partidas ao vivo, o foguete e o tigrinho editam a mesma mensagem a cada
+# um ou dois segundos. O Discord limita as edições por canal, e com várias
+# animações no mesmo canal o discord.py fica parado esperando o limite.
+# Aqui cada mensagem guarda só o estado mais recente ainda não enviado:
+# quadros intermediários que chegam enquanto o canal está no limite são
+# juntados num só, e o estado final sempre é entregue.
+# ----------------------------------------------------------------------
+
+import asyncio
+import time
+from collections import deque
+
+
+class _ChannelBucket:
+    """Janela deslizante de edições de um canal: no máximo `rate` a cada `per` segundos, por ordem de chegada."""
+
+    def __init__(self, rate, per):
+        self.rate = rate
+        self.per = per
+        self._sent = deque()
+        self._lock = asyncio.Lock()
+
+    @property
+    def idle(self):
+        return not self._lock.locked() and (not self._sent or time.monotonic() - self._sent[-1] >= self.per)
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            while self._sent and now - self._sent[0] >= self.per:
+                self._sent.popleft()
+            if len(self._sent) >= self.rate:
+                await asyncio.sleep(self._sent[0] + self.per - now)
+                self._sent.popleft()
+            self._sent.append(time.monotonic())
+
+
+class _MessageState:
+    __slots__ = ('message', 'fields', 'version', 'sent_version', 'last_sent', 'waiters', 'task')
+
+    def __init__(self, message):
+        self.message = message
+        self.fields = {}
+        self.version = 0
+        self.sent_version = 0
+        self.last_sent = 0.0
+        self.waiters = []
+        self.task = None
+
+
+class EditCoalescer:
+    """Fila de edições por mensagem, respeitando o limite de edições de cada canal.
+
+    submit() registra um quadro intermediário e volta na hora; se a mensagem
+    ainda tem uma edição esperando, os campos são juntados (o mais recente
+    vence) e só o último estado vai para o Discord. finish() registra o estado
+    final e espera ele ser enviado. Cada mensagem é editada no máximo a cada
+    min_interval segundos, e todas as mensagens de um canal dividem a mesma cota
+    (rate edições a cada per segundos). Com muitas animações no mesmo canal,
+    cada uma mostra menos quadros, mas nenhuma perde o último.
+    """
+
+    def __init__(self, rate=5, per=5.0, min_interval=1.0):
+        self.rate = rate
+        self.per = per
+        self.min_interval = min_interval
+        self._messages = {}
+        self._buckets = {}
+
+    def _bucket(self, channel_id):
+        bucket = self._buckets.get(channel_id)
+        if bucket is None:
+            if len(self._buckets) > 1024:
+                self._buckets = {cid: b for cid, b in self._buckets.items() if not b.idle}
+            bucket = self._buckets[channel_id] = _ChannelBucket(self.rate, self.per)
+        return bucket
+
+    def submit(self, message, **fields):
+        """Agenda uma edição da mensagem (mesmos argumentos de message.edit) sem esperar."""
+        state = self._messages.get(message.id)
+        if state is None:
+            state = self._messages[message.id] = _MessageState(message)
+        state.fields.update(fields)
+        state.version += 1
+        if state.task is None:
+            state.task = asyncio.create_task(self._deliver(state))
+        return state
+
+    async def finish(self, message, **fields):
+        """Agenda o estado final da mensagem e espera até ele ser enviado."""
+        state = self.submit(message, **fields)
+        waiter = asyncio.get_running_loop().create_future()
+        state.waiters.append((state.version, waiter))
+        await waiter
+
+    async def _deliver(self, state):
+        try:
+            while True:
+                # Depois da última edição a tarefa ainda espera min_interval: um quadro
+                # que chegue nesse meio-tempo respeita o intervalo da mensagem.
+                wait = state.last_sent + self.min_interval - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                if not state.fields:
+                    break
+                await self._bucket(state.message.channel.id).acquire()
+                fields, state.fields = state.fields, {}
+                version = state.version
+                try:
+                    await state.message.edit(**fields)
+                except Exception as e:
+                    print(f"Erro ao editar a mensagem {state.message.id}: {e}")
+                state.last_sent = time.monotonic()
+                state.sent_version = version
+                self._wake(state)
+        finally:
+            state.task = None
+            # Se foi cancelado no meio, ninguém fica esperando para sempre.
+            for _, waiter in state.waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+            state.waiters.clear()
+            if self._messages.get(state.message.id) is state:
+                del self._messages[state.message.id]
+
+    @staticmethod
+    def _wake(state):
+        remaining = []
+        for version, waiter in state.waiters:
+            if version <= state.sent_version:
+                if not waiter.done():
+                    waiter.set_result(None)
+            else:
+                remaining.append((version, waiter))
+        state.waiters = remaining
+
+    async def close(self):
+        """Entrega o que ainda está pendente (usado no desligamento do bot)."""
+        tasks = [state.task for state in self._messages.values() if state.task is not None]
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# RafutBot - Narração
+# ----------------------------------------------------------------------
+# Narrações da IA para as partidas sem prender o relógio do jogo: um
+# limite de chamadas simultâneas à API, um cache das últimas narrações
+# por (evento, jogador), narrações geradas de antemão para os atacantes
+# e goleiros quando a partida começa e um orçamento de tempo por lance.
+# Se a IA não responder dentro do orçamento, o lance sai pelo narrador
+# local e a resposta, quando chegar, fica guardada para a próxima vez;
+# depois de um erro da API, o narrador local assume por um tempo.
+# ----------------------------------------------------------------------
+
+import asyncio
+import random
+import time
+from collections import OrderedDict, deque
+
+# Prompts com só o que entra na chave do cache, para a narração servir em qualquer partida.
+PROMPT_TEMPLATES = {
+    "goal": "Você é um narrador de futebol brasileiro. Narre um gol de forma empolgante. Marcador do Gol: {player}. Time: {team}. Seja criativo e use gírias.",
+    "save": "Você é um narrador de futebol brasileiro. Narre uma defesa espetacular. Goleiro: {player}. Seja criativo.",
+}
+
+
+class _Entry:
+    """Narrações de uma chave: as ainda não usadas e as últimas que já saíram."""
+    __slots__ = ("fresh", "used")
+
+    def __init__(self, per_key):
+        self.fresh = deque(maxlen=per_key)
+        self.used = deque(maxlen=per_key)
+
+
+class NarrationService:
+    """Narrações da IA com limite de concorrência, cache por (evento, jogador) e orçamento de tempo.
+
+    generate é uma corrotina prompt -> texto (levanta exceção em erro); com
+    generate=None todo lance sai pelo fallback (um LocalCommentary). Depois de
+    um erro da API, os lances vão direto para o fallback durante error_cooldown
+    segundos, sem gastar o orçamento esperando. Chamadas em segundo plano
+    (pré-geração e reposição do cache) passam pelo mesmo limite que as do
+    lance, e no máximo uma por chave fica em andamento.
+    """
+
+    def __init__(self, generate, fallback, max_concurrency=4, budget=2.5, per_key=3, max_keys=512, max_background=32,
+                 error_cooldown=60.0):
+        self.generate = generate
+        self.fallback = fallback
+        self.error_cooldown = error_cooldown
+        self._down_until = 0.0
+        self.budget = budget
+        self.per_key = per_key
+        self.max_keys = max_keys
+        self.max_background = max_background
+        self._limiter = asyncio.Semaphore(max_concurrency)
+        self._cache = OrderedDict()
+        self._inflight = {}
+
+    @property
+    def available(self):
+        """False sem IA configurada ou logo depois de um erro da API."""
+        return self.generate is not None and time.monotonic() >= self._down_until
+
+    def _failed(self, error):
+        print(f"Erro na API Gemini: {error}")
+        self._down_until = time.monotonic() + self.error_cooldown
+
+    async def complete(self, prompt, fallback_text, timeout=None):
+        """Uma chamada avulsa (sem cache) respeitando o limite de concorrência; fallback_text em erro ou timeout."""
+        if self.generate is None:
+            return fallback_text
+        try:
+            async with self._limiter:
+                return await asyncio.wait_for(self.generate(prompt), timeout)
+        except asyncio.TimeoutError:
+            return fallback_text
+        except Exception as e:
+            self._failed(e)
+            return fallback_text
+
+    # --- Cache ---
+    def _entry(self, key):
+        entry = self._cache.get(key)
+        if entry is None:
+            entry = self._cache[key] = _Entry(self.per_key)
+            if len(self._cache) > self.max_keys:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(key)
+        return entry
+
+    def _take(self, key):
+        """Uma narração pronta da chave: de preferência inédita, senão uma das últimas usadas."""
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        self._cache.move_to_end(key)
+        if entry.fresh:
+            text = entry.fresh.popleft()
+            entry.used.append(text)
+            return text
+        return random.choice(entry.used) if entry.used else None
+
+    # --- Geração ---
+    def _request(self, event, fields):
+        """Tarefa que gera uma narração nova para a chave e a guarda no cache (uma por chave)."""
+        key = (event, *sorted(fields.items()))
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._generate(key, PROMPT_TEMPLATES[event].format(**fields)))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return task
+
+    async def _generate(self, key, prompt):
+        try:
+            async with self._limiter:
+                text = (await self.generate(prompt)).strip()
+        except Exception as e:
+            self._failed(e)
+            return None
+        if text:
+            self._entry(key).fresh.append(text)
+        return text
+
+    def prefetch(self, event, **fields):
+        """Gera em segundo plano uma narração para a chave, se ainda não houver uma inédita."""
+        if not self.available or len(self._inflight) >= self.max_background:
+            return
+        entry = self._cache.get((event, *sorted(fields.items())))
+        if entry is None or not entry.fresh:
+            self._request(event, fields)
+
+    async def narrate(self, event, budget=None, **fields):
+        """Narração do lance em no máximo `budget` segundos (contados desde a chamada).
+
+        Usa uma narração do cache se houver; senão espera a IA até o fim do
+        orçamento e, estourado, devolve uma narração antiga da chave ou a do
+        fallback. A geração continua em segundo plano e abastece o cache.
+        Eventos sem prompt (desarme, intervalo, apito final) saem sempre do fallback.
+        """
+        if event not in PROMPT_TEMPLATES:
+            return self.fallback.line(event, **fields)
+        key = (event, *sorted(fields.items()))
+        deadline = time.monotonic() + (self.budget if budget is None else budget)
+        text = self._take(key)
+        if text is not None:
+            self.prefetch(event, **fields)  # repõe para o próximo lance
+            return text
+        if not self.available:
+            return self.fallback.line(event, **fields)
+        task = self._request(event, fields)
+        try:
+            await asyncio.wait_for(asyncio.shield(task), max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            pass
+        text = self._take(key)
+        return text if text is not None else self.fallback.line(event, **fields)
+
+    async def close(self):
+        for task in list(self._inflight.values()):
+            task.cancel()
+        await asyncio.gather(*self._inflight.values(), return_exceptions=True)
+        self._inflight.clear()
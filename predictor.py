@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# RafutBot - Previsão de Partidas
+# ----------------------------------------------------------------------
+# Milhares de partidas do --confrontar de uma vez para estimar as chances
+# de vitória, empate e derrota e os placares mais prováveis. As regras do
+# motor de partidas viram operações em matrizes do NumPy (simulações x 91
+# minutos): sorteio da posse, atacante contra defensor, chute contra
+# goleiro. Sem NumPy instalado, cai para o motor em Python com menos
+# simulações.
+# ----------------------------------------------------------------------
+
+import random
+from collections import Counter
+
+from match_engine import MATCH_MINUTES, simulate_match
+
+try:
+    import numpy as np
+except ImportError:  # dependência opcional
+    np = None
+
+# Sem NumPy cada simulação custa uma partida inteira em Python.
+PURE_PYTHON_SIMULATIONS = 1000
+# Simulações por bloco de matrizes (limita a memória: ~8 matrizes de bloco x 91).
+CHUNK_SIZE = 4096
+
+
+class Prediction:
+    """Resultado da previsão, do ponto de vista do mandante (home)."""
+    __slots__ = ('simulations', 'win', 'draw', 'loss', 'expected_goals', 'scorelines')
+
+    def __init__(self, simulations, win, draw, loss, expected_goals, scorelines):
+        self.simulations = simulations
+        self.win = win
+        self.draw = draw
+        self.loss = loss
+        self.expected_goals = expected_goals  # (gols do mandante, gols do visitante) em média
+        self.scorelines = scorelines          # [((gols do mandante, gols do visitante), probabilidade)], do mais provável
+
+    @classmethod
+    def from_scores(cls, home_goals, away_goals, top=5):
+        """Monta a previsão a partir dos placares de cada simulação (listas ou arrays)."""
+        total = len(home_goals)
+        counts = Counter(zip(map(int, home_goals), map(int, away_goals)))
+        win = sum(n for (h, a), n in counts.items() if h > a) / total
+        draw = sum(n for (h, a), n in counts.items() if h == a) / total
+        expected = (sum(h * n for (h, _), n in counts.items()) / total, sum(a * n for (_, a), n in counts.items()) / total)
+        scorelines = [(score, n / total) for score, n in counts.most_common(top)]
+        return cls(total, win, draw, 1.0 - win - draw, expected, scorelines)
+
+
+def _ratings(sector):
+    return np.array([ovr for _, ovr in sector], dtype=np.int32)
+
+def _simulate_chunk(rng, n, home, away, minutes):
+    """Placares de n partidas: as mesmas regras de simulate_match, em matrizes (n, minutos)."""
+    shape = (n, minutes)
+    home_possession = 0.5 + (home.midfield_strength - away.midfield_strength) / 250
+    home_attacks = rng.random(shape) < home_possession
+
+    home_att, away_att = _ratings(home.attack), _ratings(away.attack)
+    home_def, away_def = _ratings(home.defense), _ratings(away.defense)
+    pick = rng.random(shape)
+    attacker = np.where(home_attacks, home_att[(pick * len(home_att)).astype(np.intp)],
+                        away_att[(pick * len(away_att)).astype(np.intp)])
+    pick = rng.random(shape)
+    defender = np.where(home_attacks, away_def[(pick * len(away_def)).astype(np.intp)],
+                        home_def[(pick * len(home_def)).astype(np.intp)])
+    keeper = np.where(home_attacks, away.keeper[1], home.keeper[1])
+
+    beats_defender = attacker - defender > rng.integers(-25, 26, shape)
+    beats_keeper = attacker + rng.integers(-10, 11, shape) > keeper + rng.integers(-15, 16, shape)
+    goals = beats_defender & beats_keeper
+    return (goals & home_attacks).sum(axis=1), (goals & ~home_attacks).sum(axis=1)
+
+
+def predict_match(home, away, simulations=10000, seed=None, minutes=MATCH_MINUTES):
+    """Prevê a partida entre duas TeamSheet simulando-a `simulations` vezes.
+
+    Com NumPy tudo roda em blocos de matrizes (10 mil partidas em bem menos
+    de um segundo); sem ele, usa simulate_match com no máximo
+    PURE_PYTHON_SIMULATIONS partidas. Bloqueante: rodar fora do loop.
+    """
+    if np is None:
+        rng = random.Random(seed)
+        results = [simulate_match(home, away, seed=rng.getrandbits(32), minutes=minutes)
+                   for _ in range(min(simulations, PURE_PYTHON_SIMULATIONS))]
+        return Prediction.from_scores([r.score[0] for r in results], [r.score[1] for r in results])
+
+    rng = np.random.default_rng(seed)
+    home_goals, away_goals = [], []
+    for start in range(0, simulations, CHUNK_SIZE):
+        h, a = _simulate_chunk(rng, min(CHUNK_SIZE, simulations - start), home, away, minutes)
+        home_goals.append(h); away_goals.append(a)
+    return Prediction.from_scores(np.concatenate(home_goals), np.concatenate(away_goals))
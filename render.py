@@ -0,0 +1,410 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# RafutBot - Renderização de Times
+# ----------------------------------------------------------------------
+# O desenho da imagem do time (Pillow: colagens com alfa, textos com
+# contorno e codificação do PNG) roda num pool de processos, longe do
+# loop do discord.py. O processo recebe uma descrição simples do time
+# (textos prontos e pixels crus das imagens) e devolve os bytes da imagem.
+# Cada processo carrega as fontes uma vez e guarda a camada estática (fundo,
+# nome e logo do clube, vagas vazias) já composta. Imagens prontas ficam
+# num cache indexado pelo hash do que vai nelas.
+# ----------------------------------------------------------------------
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import math
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from PIL import Image, ImageDraw, ImageFont
+
+FIELD_SIZE = (700, 900)
+PLAYER_IMAGE_SIZE = (120, 156)
+LOGO_SIZE = (80, 80)
+POSITIONS_COORDS = {0: (350, 780), 1: (180, 650), 2: (520, 650), 3: (60, 550), 4: (640, 550), 5: (350, 500), 6: (220, 370), 7: (480, 370), 8: (90, 200), 9: (610, 200), 10: (350, 160)}
+
+
+def image_payload(image):
+    """(modo, tamanho, pixels) de uma imagem PIL: barato de mandar para o processo de render."""
+    if image is None:
+        return None
+    return image.mode, image.size, image.tobytes()
+
+def _from_payload(payload):
+    mode, size, data = payload
+    return Image.frombytes(mode, size, data)
+
+def _load_fonts():
+    try:
+        return {
+            "title": ImageFont.truetype("arialbd.ttf", 42),
+            "player_name": ImageFont.truetype("arialbd.ttf", 18),
+            "player_pos": ImageFont.truetype("arial.ttf", 16),
+            "player_stats": ImageFont.truetype("arialbd.ttf", 15),
+            "team_stats": ImageFont.truetype("arialbd.ttf", 24),
+        }
+    except IOError:
+        default = ImageFont.load_default()
+        return dict.fromkeys(("title", "player_name", "player_pos", "player_stats", "team_stats"), default)
+
+
+# --- Estado de cada processo de render ---
+# Fontes carregadas uma vez quando o processo sobe e camadas estáticas
+# (fundo + nome do clube + logo + vagas vazias) já compostas, por chave.
+_fonts = None
+_static_layers = OrderedDict()
+STATIC_LAYER_CACHE_SIZE = 8
+
+def init_worker():
+    global _fonts
+    _fonts = _load_fonts()
+
+def _get_fonts():
+    if _fonts is None:
+        init_worker()
+    return _fonts
+
+
+class StaticLayerMissing(Exception):
+    """O processo não tem a camada estática e o pedido veio sem os pixels do fundo e do logo."""
+
+
+def _compose_static_layer(static, fonts):
+    if static.get("background"):
+        layer = _from_payload(static["background"])
+    else:
+        layer = Image.new("RGB", FIELD_SIZE, color=(8, 43, 27))
+    draw = ImageDraw.Draw(layer)
+    width = layer.size[0]
+    club_name = static["club_name"]
+    draw.text((width/2, 38), club_name, font=fonts["title"], fill=(0,0,0,120), anchor="mt", stroke_width=2)
+    draw.text((width/2, 35), club_name, font=fonts["title"], fill="#FFFFFF", anchor="mt")
+    if static.get("logo"):
+        logo_img = _from_payload(static["logo"])
+        layer.paste(logo_img, (25, 25), logo_img)
+    for i in static["empty_slots"]:
+        x, y = POSITIONS_COORDS[i]
+        draw.rectangle((x - 40, y - 40, x + 40, y + 40), outline=(255,255,255,100), width=2)
+        draw.text((x, y), "?", fill=(255,255,255,100), font=fonts["title"], anchor="mm")
+    return layer
+
+def _static_layer(static, fonts):
+    layer = _static_layers.get(static["key"])
+    if layer is not None:
+        _static_layers.move_to_end(static["key"])
+        return layer
+    if "background" not in static:
+        raise StaticLayerMissing(static["key"])
+    layer = _compose_static_layer(static, fonts)
+    _static_layers[static["key"]] = layer
+    if len(_static_layers) > STATIC_LAYER_CACHE_SIZE:
+        _static_layers.popitem(last=False)
+    return layer
+
+
+# Formatos de saída: nome -> (formato do Pillow, opções do save, extensão do arquivo)
+OUTPUT_FORMATS = {
+    "png": ("PNG", {}, "png"),
+    "png-optimized": ("PNG", {"optimize": True}, "png"),
+    "webp": ("WEBP", {"quality": 90, "method": 4}, "webp"),
+}
+
+
+def encode_image(image, image_format="png"):
+    """Bytes da imagem no formato de saída escolhido (ver OUTPUT_FORMATS)."""
+    pil_format, save_options, _ = OUTPUT_FORMATS[image_format]
+    buffer = BytesIO()
+    image.save(buffer, format=pil_format, **save_options)
+    return buffer.getvalue()
+
+
+def render_team(description):
+    """Desenha o time e devolve a imagem em bytes. Roda dentro do processo de render.
+
+    description = {
+        "static": {"key", "club_name", "empty_slots": [int], "background": payload | None, "logo": payload | None},
+        "players": [None | {"name", "position", "overall", "value", "trained", "image": payload | None}] * 11,
+        "format": chave de OUTPUT_FORMATS,
+    }
+    "background"/"logo" podem faltar em "static" quando a camada já deve estar
+    no cache do processo; se não estiver, levanta StaticLayerMissing.
+    """
+    fonts = _get_fonts()
+    field_img = draw_players(_static_layer(description["static"], fonts).copy(), description["players"], fonts)
+    return encode_image(field_img, description.get("format", "png"))
+
+
+def draw_players(field_img, players, fonts):
+    """Cola as fotos e escreve textos e totais dos jogadores sobre a camada estática (altera field_img)."""
+    draw = ImageDraw.Draw(field_img)
+    height = field_img.size[1]
+
+    total_overall = 0; total_value = 0
+    for i, player in enumerate(players):
+        if not player:
+            continue
+        x, y = POSITIONS_COORDS[i]
+        total_overall += player["overall"]
+        total_value += player["value"]
+
+        if player.get("image"):
+            player_img = _from_payload(player["image"])
+        else:
+            player_img = Image.new('RGBA', PLAYER_IMAGE_SIZE, color='grey')
+        paste_x = x - player_img.width // 2
+        paste_y = y - player_img.height // 2
+        field_img.paste(player_img, (paste_x, paste_y), player_img)
+
+        base_text_y = y + (PLAYER_IMAGE_SIZE[1] // 2) + 5
+        draw.text((x, base_text_y + 2), player["name"], font=fonts["player_name"], fill="black", anchor="mt", stroke_width=2)
+        draw.text((x, base_text_y), player["name"], font=fonts["player_name"], fill="white", anchor="mt")
+
+        draw.text((x, base_text_y + 22), player["position"], font=fonts["player_pos"], fill="black", anchor="mt", stroke_width=1)
+        draw.text((x, base_text_y + 21), player["position"], font=fonts["player_pos"], fill="#CCCCCC", anchor="mt")
+
+        player_stats_text = f"OVR {player['overall']}"
+        text_color = "lime" if player["trained"] else "yellow"
+        draw.text((x, base_text_y + 42), player_stats_text, font=fonts["player_stats"], fill="black", anchor="mt", stroke_width=2)
+        draw.text((x, base_text_y + 41), player_stats_text, font=fonts["player_stats"], fill=text_color, anchor="mt")
+
+    stats_overall_text = f"⭐ Overall Total: {total_overall}"
+    stats_value_text = f"💰 Valor de Mercado: R$ {total_value:,}"
+    draw.text((35, height - 48), stats_overall_text, font=fonts["team_stats"], fill="black", anchor="ls", stroke_width=2)
+    draw.text((35, height - 50), stats_overall_text, font=fonts["team_stats"], fill="white", anchor="ls")
+    draw.text((35, height - 18), stats_value_text, font=fonts["team_stats"], fill="black", anchor="ls", stroke_width=2)
+    draw.text((35, height - 20), stats_value_text, font=fonts["team_stats"], fill="#39FF14", anchor="ls")
+    return field_img
+
+
+def render_contact_sheet(tiles, columns=3, tile_width=350, image_format="png"):
+    """Junta imagens de times já prontas numa grade, com legenda. Roda dentro do processo de render.
+
+    tiles = [(legenda, bytes da imagem)], na ordem em que devem aparecer.
+    """
+    fonts = _get_fonts()
+    tile_height = tile_width * FIELD_SIZE[1] // FIELD_SIZE[0]
+    caption_height, padding = 34, 12
+    columns = max(1, min(columns, len(tiles)))
+    rows = math.ceil(len(tiles) / columns)
+    sheet = Image.new("RGB", (padding + columns * (tile_width + padding), padding + rows * (tile_height + caption_height + padding)), color=(8, 43, 27))
+    draw = ImageDraw.Draw(sheet)
+    for i, (caption, data) in enumerate(tiles):
+        tile = Image.open(BytesIO(data)).convert("RGBA")
+        tile.thumbnail((tile_width, tile_height), Image.Resampling.LANCZOS)
+        x = padding + (i % columns) * (tile_width + padding)
+        y = padding + (i // columns) * (tile_height + caption_height + padding)
+        draw.text((x + tile_width / 2, y + 4), caption, font=fonts["player_name"], fill="white", anchor="mt", stroke_width=2, stroke_fill="black")
+        sheet.paste(tile, (x + (tile_width - tile.width) // 2, y + caption_height), tile)
+    return encode_image(sheet, image_format)
+
+
+class RendererBusy(Exception):
+    """A fila de renderização está cheia e o pedido foi recusado."""
+
+
+class TeamRenderer:
+    """Pool de processos para render_team e render_contact_sheet, com fila limitada.
+
+    No máximo `workers` imagens são desenhadas ao mesmo tempo e até
+    `max_queue` pedidos esperam a vez; além disso, render() levanta
+    RendererBusy na hora em vez de acumular trabalho (backpressure).
+    Lotes devem manter no máximo `workers` pedidos próprios em andamento,
+    para sobrar fila para os comandos interativos.
+    """
+
+    def __init__(self, workers=2, max_queue=8, image_format="png"):
+        if image_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Formato de imagem desconhecido: {image_format}")
+        self.workers = workers
+        self.max_queue = max_queue
+        self.image_format = image_format
+        self._executor = None
+        self._running = asyncio.Semaphore(workers)
+        self._pending = 0
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker)
+
+    def shutdown(self, wait=False):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+    @property
+    def pending(self):
+        return self._pending
+
+    @property
+    def extension(self):
+        return OUTPUT_FORMATS[self.image_format][2]
+
+    @contextlib.asynccontextmanager
+    async def _slot(self):
+        if self._pending >= self.workers + self.max_queue:
+            raise RendererBusy()
+        self._pending += 1
+        try:
+            async with self._running:
+                self.start()
+                yield asyncio.get_running_loop()
+        finally:
+            self._pending -= 1
+
+    async def render(self, description, static_payloads):
+        """Bytes da imagem do time descrito; RendererBusy se já houver pedidos demais na fila.
+
+        A primeira tentativa vai sem os pixels do fundo e do logo; static_payloads()
+        só é chamada (e os pixels só atravessam para o processo) se ele ainda não
+        tiver a camada estática dessa chave.
+        """
+        async with self._slot() as loop:
+            description = dict(description, format=self.image_format)
+            try:
+                return await loop.run_in_executor(self._executor, render_team, description)
+            except StaticLayerMissing:
+                description["static"] = dict(description["static"], **static_payloads())
+                return await loop.run_in_executor(self._executor, render_team, description)
+
+    async def contact_sheet(self, tiles, columns=3):
+        """Grade com as imagens de vários times (ver render_contact_sheet)."""
+        async with self._slot() as loop:
+            return await loop.run_in_executor(self._executor, render_contact_sheet, tiles, columns, 350, self.image_format)
+
+
+def static_layer_key(club_name, club_logo, has_background, empty_slots):
+    """Chave da camada estática: o que é desenhado antes dos jogadores."""
+    payload = json.dumps([club_name, club_logo, has_background, sorted(empty_slots)], ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def team_render_key(club_name, club_logo, team_players):
+    """Hash de tudo que aparece na imagem do time: muda a escalação, muda a chave."""
+    slots = [None if not p else (p['name'], p.get('nickname'), p.get('training_level', 0),
+                                 p['overall'], p['position'], p['value'], p['image'])
+             for p in team_players]
+    payload = json.dumps([club_name, club_logo, slots], ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class RenderCache:
+    """Imagens de times já renderizadas, por chave de conteúdo (LRU).
+
+    Guarda também a última chave de cada usuário, para que os comandos que
+    mudam o time possam descartar a imagem antiga na hora (invalidate).
+    """
+
+    def __init__(self, max_items=128):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._by_user = {}
+
+    def get(self, key):
+        png = self._items.get(key)
+        if png is not None:
+            self._items.move_to_end(key)
+        return png
+
+    def put(self, user_id, key, png):
+        previous = self._by_user.get(str(user_id))
+        if previous is not None and previous != key:
+            self._items.pop(previous, None)
+        self._by_user[str(user_id)] = key
+        self._items[key] = png
+        self._items.move_to_end(key)
+        if len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def invalidate(self, user_id):
+        key = self._by_user.pop(str(user_id), None)
+        if key is not None:
+            self._items.pop(key, None)
+
+
+class TeamImages:
+    """O caminho completo da imagem de um time: cache de imagens prontas, descrição e pool de render.
+
+    É o mesmo para o bot e para o bench_render.py. overall(jogador) é o overall
+    mostrado na carta (com o bônus de treino).
+    """
+
+    def __init__(self, image_cache, renderer, render_cache, field_url, fallback_url, overall):
+        self.image_cache = image_cache
+        self.renderer = renderer
+        self.render_cache = render_cache
+        self.field_url = field_url
+        self.fallback_url = fallback_url
+        self.overall = overall
+
+    async def _fetch(self, url, size=None, timeout=None):
+        if not url:
+            return None
+        return await self.image_cache.get(url, size, timeout)
+
+    async def describe(self, team_players, club_name, club_logo_url, images=None):
+        """Descrição serializável do time para o processo de render: textos prontos e imagens já reduzidas.
+
+        Devolve (descrição, static_payloads, complete). Os pixels do fundo e do logo só
+        são gerados por static_payloads() se o processo de render ainda não tiver a
+        camada estática; complete é False quando alguma imagem foi trocada por um substituto.
+        images (url -> imagem ou exceção) traz fotos já baixadas por um lote.
+        """
+        async def player_image(player):
+            if not player: return None
+            if images is not None and player['image'] in images:
+                found = images[player['image']]
+                if isinstance(found, Exception): raise found
+                return found
+            return await self._fetch(player['image'], size=PLAYER_IMAGE_SIZE, timeout=5)
+
+        # Fundo, logo e as 11 fotos saem ao mesmo tempo; cada falha vira uma exceção na sua posição.
+        field_img, logo_img, *player_imgs = await asyncio.gather(
+            self._fetch(self.field_url),
+            self._fetch(club_logo_url, size=LOGO_SIZE, timeout=5),
+            *(player_image(p) for p in team_players),
+            return_exceptions=True,
+        )
+        complete = not any(isinstance(img, Exception) for img in [field_img, logo_img, *player_imgs])
+        if isinstance(field_img, Exception):
+            print(f"Erro ao carregar imagem de fundo: {field_img}. Usando fallback.")
+            field_img = None
+        if isinstance(logo_img, Exception):
+            print(f"Erro ao carregar logo do clube: {logo_img}")
+            logo_img = None
+
+        fallback_img = None
+        if any(p and isinstance(img, Exception) for p, img in zip(team_players, player_imgs)):
+            try: fallback_img = await self._fetch(self.fallback_url, size=PLAYER_IMAGE_SIZE, timeout=5)
+            except Exception: pass
+
+        players = []
+        for player, player_img in zip(team_players, player_imgs):
+            if not player:
+                players.append(None); continue
+            if isinstance(player_img, Exception): player_img = fallback_img
+            players.append({
+                "name": player.get('nickname') or player['name'].split(' ')[-1], "position": player['position'],
+                "overall": self.overall(player), "value": player['value'],
+                "trained": player.get('training_level', 0) > 0, "image": image_payload(player_img),
+            })
+        empty_slots = [i for i, p in enumerate(team_players) if not p]
+        static = {"key": static_layer_key(club_name, club_logo_url if logo_img else None, field_img is not None, empty_slots),
+                  "club_name": club_name, "empty_slots": empty_slots}
+        def static_payloads():
+            return {"background": image_payload(field_img), "logo": image_payload(logo_img)}
+        return {"static": static, "players": players}, static_payloads, complete
+
+    async def build(self, owner_id, team_players, club_name, club_logo_url, images=None):
+        """Bytes da imagem do time: do cache se nada mudou, senão do pool de render. Pode levantar RendererBusy."""
+        key = team_render_key(club_name, club_logo_url, team_players)
+        image_bytes = self.render_cache.get(key)
+        if image_bytes is None:
+            description, static_payloads, complete = await self.describe(team_players, club_name, club_logo_url, images)
+            image_bytes = await self.renderer.render(description, static_payloads)
+            # Imagem com foto substituta não fica no cache: na próxima vez tenta a foto de novo.
+            if complete:
+                self.render_cache.put(owner_id, key, image_bytes)
+        return image_bytes
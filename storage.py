@@ -0,0 +1,781 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# RafutBot - Persistência
+# ----------------------------------------------------------------------
+# Funções de leitura/escrita dos arquivos JSON e o armazenamento
+# residente dos dados de usuários (carregado uma vez, gravado em lotes).
+# No modo journal, cada alteração vira uma linha num arquivo append-only
+# que é compactado periodicamente num snapshot gravado de forma atômica.
+# No modo sqlite, usuários e documentos vão para tabelas normalizadas e
+# cada flush grava apenas as linhas dos usuários alterados.
+# ----------------------------------------------------------------------
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Arquivos JSON cujo conteúdo foi redirecionado para outro backend (ex.: SQLite).
+# filename -> (loader(default_data), saver(data), patcher(upserts, deletes) ou None)
+_DOCUMENT_HANDLERS = {}
+
+def register_document(filename, loader, saver, patcher=None):
+    _DOCUMENT_HANDLERS[filename] = (loader, saver, patcher)
+
+
+def load_data(filename, default_data=None):
+    if default_data is None:
+        default_data = {}
+    if filename in _DOCUMENT_HANDLERS:
+        return _DOCUMENT_HANDLERS[filename][0](default_data)
+    if not os.path.exists(os.path.dirname(filename)):
+        os.makedirs(os.path.dirname(filename))
+    if not os.path.exists(filename):
+        return default_data
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, FileNotFoundError):
+        return default_data
+
+def atomic_write(filename, payload):
+    """Grava num arquivo temporário e renomeia: o destino nunca fica truncado."""
+    directory = os.path.dirname(filename)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    tmp_filename = f"{filename}.tmp"
+    with open(tmp_filename, 'w', encoding='utf-8') as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_filename, filename)
+
+def _write_in_thread(func, on_error=None):
+    """Roda a gravação func() em outra thread e devolve o future.
+
+    Cancelar quem espera não interrompe a thread: quem grava de novo (o stop)
+    precisa esperar esse future antes. on_error() roda se a gravação falhar.
+    """
+    future = asyncio.ensure_future(asyncio.to_thread(func))
+    def done(f):
+        if on_error and (f.cancelled() or f.exception() is not None):
+            on_error()
+    future.add_done_callback(done)
+    return future
+
+def save_data(filename, data):
+    if filename in _DOCUMENT_HANDLERS:
+        return _DOCUMENT_HANDLERS[filename][1](data)
+    atomic_write(filename, json.dumps(data, indent=4, ensure_ascii=False))
+
+
+def player_record(player):
+    """Forma gravável de um jogador de elenco (objetos com to_record() ou dicionários)."""
+    return player.to_record() if hasattr(player, 'to_record') else player
+
+def _json_default(obj):
+    if hasattr(obj, 'to_record'):
+        return obj.to_record()
+    raise TypeError(f"{type(obj).__name__} não é serializável")
+
+def pack_user(user):
+    """Usuário pronto para gravar: o time vira a lista de nomes (os jogadores moram no elenco)."""
+    if not user.get('team'):
+        return user
+    return dict(user, team=[(p if isinstance(p, str) else p['name']) if p else None for p in user['team']])
+
+def link_players(user, player_factory=None):
+    """Monta os jogadores do elenco e aponta cada vaga do time para o mesmo objeto do elenco.
+
+    Aceita o formato antigo, em que o time guardava cópias completas dos jogadores.
+    """
+    squad = user.get('squad')
+    if squad is None:
+        return user
+    if player_factory:
+        squad[:] = [p if hasattr(p, 'to_record') else player_factory(p) for p in squad]
+    by_name = {p['name']: p for p in squad}
+    if 'team' in user:
+        user['team'] = [by_name.get(p if isinstance(p, str) else p['name']) if p else None for p in user['team']]
+    return user
+
+def apply_journal_entry(users, entry):
+    """Reaplica uma alteração do journal sobre o dicionário de usuários."""
+    op = entry['op']; user_id = entry['uid']
+    if op == 'user':
+        users[user_id] = entry['data']
+        return
+    if op == 'delete':
+        users.pop(user_id, None)
+        return
+    user = users.get(user_id)
+    if user is None:
+        return
+    if op == 'money':
+        user['money'] = user.get('money', 0) + entry['delta']
+    elif op == 'squad_add':
+        user.setdefault('squad', []).append(entry['player'])
+    elif op == 'squad_remove':
+        names = set(entry['names'])
+        user['squad'] = [p for p in user.get('squad', []) if p['name'] not in names]
+    elif op == 'team_set':
+        user.setdefault('team', [None] * 11)[entry['slot']] = entry['player']
+    elif op in ('training', 'nickname'):
+        field = 'training_level' if op == 'training' else 'nickname'
+        # O time aponta para os mesmos jogadores do elenco: basta alterar o elenco.
+        for p in user.get('squad', []):
+            if p['name'] == entry['name']:
+                p[field] = entry['value' if op == 'nickname' else 'level']
+
+
+class UserStore:
+    """Dados de todos os usuários em memória, com gravação write-behind.
+
+    As leituras são servidas direto do dicionário residente. Cada alteração
+    marca o usuário como sujo; o arquivo só é regravado quando o intervalo
+    de flush vence ou quando o número de usuários sujos atinge o limite.
+
+    Com ``journal_file`` definido, cada alteração também é anexada ao journal
+    (uma linha JSON com número de sequência). O snapshot guarda a última
+    sequência incluída em ``_seq``; no boot, o journal é reaplicado a partir
+    dela, e a compactação regrava o snapshot e zera o journal.
+
+    Em disco, o time guarda só os nomes dos titulares. ``player_factory``
+    converte cada jogador gravado do elenco no objeto usado em memória.
+    """
+
+    SEQ_KEY = "_seq"
+
+    def __init__(self, filename, flush_interval=30.0, flush_threshold=50,
+                 journal_file=None, compact_interval=600.0, compact_threshold=5000, player_factory=None):
+        self.filename = filename
+        self.player_factory = player_factory
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.journal_file = journal_file
+        self.compact_interval = compact_interval
+        self.compact_threshold = compact_threshold
+        self.users = {}
+        self._dirty = set()
+        self._loaded = False
+        self._flush_event = None
+        self._flush_task = None
+        self._writing = None
+        self._seq = 0
+        self._journal = None
+        self._journal_entries = 0
+        self._last_compact = time.monotonic()
+
+    def _load_snapshot(self):
+        if not os.path.exists(self.filename):
+            return {}
+        try:
+            with open(self.filename, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except json.JSONDecodeError as e:
+            # Nunca começar do zero por cima de um arquivo ilegível: isso apagaria todo mundo.
+            raise RuntimeError(f"Arquivo de usuários corrompido ({self.filename}): {e}") from e
+
+    def _replay_journal(self):
+        if not os.path.exists(self.journal_file):
+            return 0
+        replayed = 0
+        with open(self.journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Última linha cortada por um crash no meio do append.
+                    break
+                if entry['seq'] <= self._seq:
+                    continue
+                apply_journal_entry(self.users, entry)
+                self._seq = entry['seq']
+                replayed += 1
+        return replayed
+
+    def load(self):
+        """Carrega o snapshot (e reaplica o journal) para a memória, apenas uma vez."""
+        if not self._loaded:
+            directory = os.path.dirname(self.filename)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            self.users = self._load_snapshot()
+            self._seq = self.users.pop(self.SEQ_KEY, 0)
+            if self.journal_file:
+                replayed = self._replay_journal()
+                self._journal_entries = replayed
+                self._journal = open(self.journal_file, 'a', encoding='utf-8')
+                if replayed:
+                    print(f"📒 {replayed} alterações reaplicadas a partir do journal.")
+            for user in self.users.values():
+                link_players(user, self.player_factory)
+            self._loaded = True
+        return self.users
+
+    def all(self):
+        return self.load()
+
+    def get(self, user_id):
+        return self.load().get(str(user_id))
+
+    def create(self, user_id, record):
+        # Vai para o journal como estado completo: sem isso, as alterações
+        # seguintes do usuário novo seriam ignoradas no replay.
+        user_id_str = str(user_id)
+        self.load()[user_id_str] = record
+        self._record({'op': 'user', 'uid': user_id_str, 'data': pack_user(record)})
+        return record
+
+    def delete(self, user_id):
+        user_id_str = str(user_id)
+        if self.load().pop(user_id_str, None) is not None:
+            self._record({'op': 'delete', 'uid': user_id_str})
+
+    def clear(self):
+        """Esvazia a memória e o journal sem gravar snapshot (usado pelo reset total)."""
+        self.users = {}
+        self._dirty.clear()
+        self._loaded = True
+        if self._journal:
+            self._journal.close()
+            self._journal = open(self.journal_file, 'w', encoding='utf-8')
+            self._journal_entries = 0
+
+    # --- Alterações ---
+    def _record(self, entry):
+        self._dirty.add(entry['uid'])
+        if self._journal:
+            self._seq += 1
+            entry['seq'] = self._seq
+            self._journal.write(json.dumps(entry, ensure_ascii=False, default=_json_default) + '\n')
+            self._journal.flush()
+            self._journal_entries += 1
+            threshold_hit = self._journal_entries >= self.compact_threshold
+        else:
+            threshold_hit = len(self._dirty) >= self.flush_threshold
+        if threshold_hit and self._flush_event:
+            self._flush_event.set()
+
+    def mark_dirty(self, *user_ids):
+        """Registra o estado completo dos usuários (para campos sem operação própria)."""
+        for uid in user_ids:
+            uid = str(uid)
+            if uid in self.users:
+                self._record({'op': 'user', 'uid': uid, 'data': pack_user(self.users[uid])})
+
+    def add_money(self, user_id, delta):
+        uid = str(user_id)
+        self.users[uid]['money'] += delta
+        self._record({'op': 'money', 'uid': uid, 'delta': delta})
+        return self.users[uid]['money']
+
+    def squad_add(self, user_id, player):
+        uid = str(user_id)
+        self.users[uid]['squad'].append(player)
+        self._record({'op': 'squad_add', 'uid': uid, 'player': player})
+
+    def squad_remove(self, user_id, names):
+        uid = str(user_id); names = set(names)
+        self.users[uid]['squad'] = [p for p in self.users[uid]['squad'] if p['name'] not in names]
+        self._record({'op': 'squad_remove', 'uid': uid, 'names': sorted(names)})
+
+    def team_set(self, user_id, slot, player):
+        uid = str(user_id)
+        self.users[uid]['team'][slot] = player
+        self._record({'op': 'team_set', 'uid': uid, 'slot': slot, 'player': player['name'] if player else None})
+
+    def set_training(self, user_id, name, level):
+        uid = str(user_id)
+        entry = {'op': 'training', 'uid': uid, 'name': name, 'level': level}
+        apply_journal_entry(self.users, entry)
+        self._record(entry)
+
+    def set_nickname(self, user_id, name, nickname):
+        uid = str(user_id)
+        entry = {'op': 'nickname', 'uid': uid, 'name': name, 'value': nickname}
+        apply_journal_entry(self.users, entry)
+        self._record(entry)
+
+    @property
+    def dirty_count(self):
+        return len(self._dirty)
+
+    # --- Gravação ---
+    def _serialize(self):
+        snapshot = {user_id: pack_user(user) for user_id, user in self.users.items()}
+        snapshot[self.SEQ_KEY] = self._seq
+        return json.dumps(snapshot, ensure_ascii=False, default=_json_default)
+
+    def _write(self, payload):
+        atomic_write(self.filename, payload)
+
+    def _truncate_journal(self, seq):
+        # Só descarta o journal se nada novo entrou enquanto o snapshot era gravado.
+        if self._journal and self._seq == seq:
+            self._journal.close()
+            self._journal = open(self.journal_file, 'w', encoding='utf-8')
+            self._journal_entries = 0
+        self._last_compact = time.monotonic()
+
+    def _should_compact(self):
+        return (self._journal_entries >= self.compact_threshold
+                or time.monotonic() - self._last_compact >= self.compact_interval)
+
+    def compact_sync(self):
+        """Grava um snapshot atômico com tudo que está em memória e zera o journal."""
+        if not self._loaded:
+            return False
+        seq = self._seq
+        batch = set(self._dirty)
+        self._dirty.clear()
+        try:
+            self._write(self._serialize())
+        except Exception:
+            self._dirty.update(batch)
+            raise
+        self._truncate_journal(seq)
+        return True
+
+    def flush_sync(self):
+        """Grava imediatamente se houver alterações pendentes."""
+        if not self._loaded or not self._dirty:
+            return False
+        return self.compact_sync()
+
+    async def flush(self):
+        """Serializa no loop (estado consistente) e escreve em outra thread."""
+        if not self._loaded or not self._dirty:
+            return False
+        if self._journal:
+            fileno = self._journal.fileno()
+            self._writing = _write_in_thread(lambda: os.fsync(fileno))
+            await asyncio.shield(self._writing)
+            if not self._should_compact():
+                return False
+        seq = self._seq
+        batch = set(self._dirty)
+        self._dirty.clear()
+        payload = self._serialize()
+        self._writing = _write_in_thread(lambda: self._write(payload), on_error=lambda: self._dirty.update(batch))
+        await asyncio.shield(self._writing)
+        self._truncate_journal(seq)
+        return True
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"❌ Erro ao gravar dados de usuários: {e}")
+
+    def start(self):
+        """Inicia o flush periódico em segundo plano (precisa de um loop ativo)."""
+        self.load()
+        if self._flush_task is None:
+            self._flush_event = asyncio.Event()
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Cancela o flush periódico e força a gravação final."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        # Uma gravação já começada continua na thread: espera ela antes da final.
+        if self._writing is not None:
+            await asyncio.gather(self._writing, return_exceptions=True)
+        self.flush_sync()
+        if self._journal:
+            self._journal.close()
+            self._journal = None
+
+
+class ContractRegistry:
+    """Índice em memória de jogadores contratados: nome -> id do dono.
+
+    Responde "está livre?" e "de quem é?" em O(1). É persistido como um
+    objeto JSON {nome: dono}; o formato antigo (lista de nomes) é aceito
+    na carga, com o dono preenchido depois a partir dos elencos.
+
+    Depois de start(), contratações e liberações só marcam o nome como
+    alterado, e a gravação sai em lote, fora do loop, a cada flush_interval
+    segundos. No SQLite (documento com patcher) cada nome alterado vira uma
+    linha inserida ou apagada; no JSON, o arquivo é regravado uma vez por
+    lote. O que se perder numa queda é refeito por reconcile() no boot, a
+    partir dos elencos.
+    """
+
+    def __init__(self, filename, flush_interval=30.0):
+        self.filename = filename
+        self.flush_interval = flush_interval
+        self.owners = {}
+        self._loaded = False
+        self._changed = set()
+        self._flush_task = None
+        self._writing = None
+
+    def load(self):
+        if not self._loaded:
+            data = load_data(self.filename, {})
+            if isinstance(data, list):
+                data = {name: None for name in data}
+            self.owners = data
+            self._loaded = True
+        return self.owners
+
+    def save(self):
+        save_data(self.filename, self.owners)
+
+    def reconcile(self, users):
+        """Acerta o índice pelos elencos, que são a fonte da verdade.
+
+        Preenche o dono dos contratos antigos (sem dono), registra jogadores
+        de elenco que faltam no índice e libera contratos que não estão em
+        nenhum elenco (uma liberação perdida numa queda, ou um --obter que
+        ficou sem resposta).
+        """
+        owners = self.load()
+        in_squads = {p['name']: user_id for user_id, user in users.items() for p in user.get('squad', [])}
+        for name in [name for name in owners if name not in in_squads]:
+            del owners[name]
+            self._changed.add(name)
+        for name, user_id in in_squads.items():
+            if owners.get(name) != user_id:
+                owners[name] = user_id
+                self._changed.add(name)
+        self.flush_sync()
+
+    def __len__(self):
+        return len(self.load())
+
+    def __contains__(self, name):
+        return name in self.load()
+
+    def is_free(self, name):
+        return name not in self.load()
+
+    def owner_of(self, name):
+        return self.load().get(name)
+
+    def claim(self, name, owner_id):
+        self.load()[name] = str(owner_id) if owner_id is not None else None
+        self._mark(name)
+
+    def release(self, *names):
+        owners = self.load()
+        for name in names:
+            owners.pop(name, None)
+        self._mark(*names)
+
+    def clear(self):
+        self.owners = {}
+        self._changed.clear()
+        self._loaded = True
+
+    # --- Gravação ---
+    def _mark(self, *names):
+        self._changed.update(names)
+        if self._flush_task is None:
+            self.flush_sync()
+
+    def _take_changes(self):
+        """Monta no loop a gravação das alterações pendentes; devolve a função que grava."""
+        changed, self._changed = self._changed, set()
+        patcher = _DOCUMENT_HANDLERS.get(self.filename, (None, None, None))[2]
+        if patcher:
+            upserts = [(name, self.owners[name]) for name in changed if name in self.owners]
+            deletes = [name for name in changed if name not in self.owners]
+            return lambda: patcher(upserts, deletes)
+        owners = dict(self.owners)
+        return lambda: save_data(self.filename, owners)
+
+    def flush_sync(self):
+        if self._changed:
+            changed = set(self._changed)
+            try:
+                self._take_changes()()
+            except Exception:
+                self._changed.update(changed)
+                raise
+
+    async def flush(self):
+        if self._changed:
+            changed = set(self._changed)
+            self._writing = _write_in_thread(self._take_changes(), on_error=lambda: self._changed.update(changed))
+            await asyncio.shield(self._writing)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"❌ Erro ao gravar jogadores contratados: {e}")
+
+    def start(self):
+        """Passa a gravar em lotes, em segundo plano (precisa de um loop ativo)."""
+        self.load()
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Cancela o flush periódico e grava o que estiver pendente."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        if self._writing is not None:
+            await asyncio.gather(self._writing, return_exceptions=True)
+        self.flush_sync()
+
+
+class SqliteUserStore(UserStore):
+    """Mesma interface do UserStore, persistida em tabelas SQLite normalizadas.
+
+    O banco roda em WAL, então leituras nunca esperam a escrita do flush.
+    Os documentos de jogadores contratados e estatísticas globais são
+    servidos por load_data/save_data através de register_document.
+    Na primeira carga, os arquivos JSON existentes são migrados uma vez só
+    (marcado na tabela meta; um reset que esvazia as tabelas não os traz de volta).
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            id TEXT PRIMARY KEY, money INTEGER NOT NULL, wins INTEGER NOT NULL DEFAULT 0,
+            last_daily TEXT, club_name TEXT, club_logo TEXT, stadium_level INTEGER NOT NULL DEFAULT 1,
+            achievements TEXT NOT NULL DEFAULT '[]', daily_challenge TEXT, player_stats TEXT NOT NULL DEFAULT '{}',
+            extra TEXT NOT NULL DEFAULT '{}'
+        );
+        CREATE TABLE IF NOT EXISTS owned_players (
+            user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE, ord INTEGER NOT NULL,
+            name TEXT NOT NULL, image TEXT, overall INTEGER, position TEXT, value INTEGER,
+            nickname TEXT, training_level INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, ord)
+        );
+        CREATE INDEX IF NOT EXISTS idx_owned_players_name ON owned_players(name);
+        CREATE TABLE IF NOT EXISTS team_slots (
+            user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE, slot INTEGER NOT NULL,
+            player_name TEXT NOT NULL, PRIMARY KEY (user_id, slot)
+        );
+        CREATE TABLE IF NOT EXISTS match_history (
+            user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE, ord INTEGER NOT NULL,
+            entry TEXT NOT NULL, PRIMARY KEY (user_id, ord)
+        );
+        CREATE TABLE IF NOT EXISTS top_scorers (
+            name TEXT PRIMARY KEY, nickname TEXT, owner_name TEXT, goals INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS contracts (name TEXT PRIMARY KEY, owner_id TEXT);
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+    """
+    USER_COLUMNS = ('money', 'wins', 'last_daily', 'club_name', 'club_logo', 'stadium_level')
+    JSON_COLUMNS = ('achievements', 'daily_challenge', 'player_stats')
+    PLAYER_FIELDS = ('name', 'image', 'overall', 'position', 'value', 'nickname', 'training_level')
+
+    def __init__(self, db_file, flush_interval=30.0, flush_threshold=50,
+                 documents=None, legacy_user_file=None, legacy_journal_file=None, player_factory=None):
+        super().__init__(db_file, flush_interval, flush_threshold, player_factory=player_factory)
+        self.documents = documents or {}
+        self.legacy_user_file = legacy_user_file
+        self.legacy_journal_file = legacy_journal_file
+        self._conn = None
+        self._db_lock = threading.Lock()
+        loaders = {
+            'contracts': (self._load_contracts, self._save_contracts, self._patch_contracts),
+            'global_stats': (self._load_global_stats, self._save_global_stats),
+        }
+        for filename, kind in self.documents.items():
+            register_document(filename, *loaders[kind])
+
+    # --- Conexão ---
+    def connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.filename)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            self._conn = sqlite3.connect(self.filename, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(self.SCHEMA)
+        return self._conn
+
+    def _query(self, sql, params=()):
+        with self._db_lock:
+            return self.connect().execute(sql, params).fetchall()
+
+    def _transaction(self, statements):
+        """Executa [(sql, params_list)] numa única transação."""
+        with self._db_lock:
+            conn = self.connect()
+            with conn:
+                for sql, rows in statements:
+                    conn.executemany(sql, rows)
+
+    # --- Usuários ---
+    def _load_snapshot(self):
+        users = {}
+        for row in self._query(f"SELECT id, {', '.join(self.USER_COLUMNS + self.JSON_COLUMNS)}, extra FROM users"):
+            user_id, values = row[0], row[1:]
+            user = json.loads(values[-1])
+            user.update(zip(self.USER_COLUMNS, values[:len(self.USER_COLUMNS)]))
+            for column, raw in zip(self.JSON_COLUMNS, values[len(self.USER_COLUMNS):-1]):
+                user[column] = json.loads(raw) if raw is not None else None
+            user.update(squad=[], team=[None] * 11, match_history=[])
+            users[user_id] = user
+        for row in self._query(f"SELECT user_id, {', '.join(self.PLAYER_FIELDS)} FROM owned_players ORDER BY user_id, ord"):
+            if row[0] in users:
+                users[row[0]]['squad'].append({f: v for f, v in zip(self.PLAYER_FIELDS, row[1:]) if v is not None})
+        for user_id, slot, player_name in self._query("SELECT user_id, slot, player_name FROM team_slots"):
+            if user_id in users:
+                users[user_id]['team'][slot] = player_name
+        for user_id, entry in self._query("SELECT user_id, entry FROM match_history ORDER BY user_id, ord"):
+            if user_id in users:
+                users[user_id]['match_history'].append(entry)
+        return users
+
+    MIGRATED_KEY = "migrated_from_json"
+
+    def load(self):
+        if not self._loaded:
+            self.connect()
+            if not self._query("SELECT 1 FROM meta WHERE key = ?", (self.MIGRATED_KEY,)):
+                # Bancos de antes da marca já com dados foram migrados: só marca.
+                if self._is_empty():
+                    self.migrate_from_json()
+                self._transaction([("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                    [(self.MIGRATED_KEY, time.strftime('%Y-%m-%dT%H:%M:%S'))])])
+        return super().load()
+
+    def _is_empty(self):
+        return not any(self._query(f"SELECT 1 FROM {table} LIMIT 1") for table in ('users', 'contracts', 'top_scorers'))
+
+    def _user_rows(self, user_id):
+        """Monta as linhas de um usuário a partir da memória (executado no loop)."""
+        user = self.users.get(user_id)
+        if user is None:
+            return None
+        known = set(self.USER_COLUMNS + self.JSON_COLUMNS) | {'squad', 'team', 'match_history'}
+        user_row = ((user_id,) + tuple(user.get(c) for c in self.USER_COLUMNS)
+                    + tuple(json.dumps(user.get(c), ensure_ascii=False) for c in self.JSON_COLUMNS)
+                    + (json.dumps({k: v for k, v in user.items() if k not in known}, ensure_ascii=False),))
+        records = [player_record(p) for p in user.get('squad', [])]
+        players = [(user_id, i) + tuple(r.get(f) for f in self.PLAYER_FIELDS) for i, r in enumerate(records)]
+        slots = [(user_id, i, p['name']) for i, p in enumerate(user.get('team', [])) if p]
+        history = [(user_id, i, entry) for i, entry in enumerate(user.get('match_history', []))]
+        return user_row, players, slots, history
+
+    def _write_users(self, batch):
+        user_sql = (f"INSERT OR REPLACE INTO users (id, {', '.join(self.USER_COLUMNS + self.JSON_COLUMNS)}, extra) "
+                    f"VALUES ({', '.join('?' * (len(self.USER_COLUMNS) + len(self.JSON_COLUMNS) + 2))})")
+        player_sql = (f"INSERT INTO owned_players (user_id, ord, {', '.join(self.PLAYER_FIELDS)}) "
+                      f"VALUES ({', '.join('?' * (len(self.PLAYER_FIELDS) + 2))})")
+        statements = []
+        for table in ('owned_players', 'team_slots', 'match_history', 'users'):
+            statements.append((f"DELETE FROM {table} WHERE {'id' if table == 'users' else 'user_id'} = ?",
+                               [(user_id,) for user_id in batch]))
+        rows = [r for r in batch.values() if r is not None]
+        statements.append((user_sql, [r[0] for r in rows]))
+        statements.append((player_sql, [p for r in rows for p in r[1]]))
+        statements.append(("INSERT INTO team_slots (user_id, slot, player_name) VALUES (?, ?, ?)", [s for r in rows for s in r[2]]))
+        statements.append(("INSERT INTO match_history (user_id, ord, entry) VALUES (?, ?, ?)", [h for r in rows for h in r[3]]))
+        self._transaction(statements)
+
+    def _take_dirty(self):
+        batch = {user_id: self._user_rows(user_id) for user_id in self._dirty}
+        self._dirty.clear()
+        return batch
+
+    def _record(self, entry):
+        self._dirty.add(entry['uid'])
+        if len(self._dirty) >= self.flush_threshold and self._flush_event:
+            self._flush_event.set()
+
+    def flush_sync(self):
+        if not self._loaded or not self._dirty:
+            return False
+        batch = self._take_dirty()
+        try:
+            self._write_users(batch)
+        except Exception:
+            self._dirty.update(batch)  # volta para o próximo flush
+            raise
+        return True
+
+    compact_sync = flush_sync
+
+    async def flush(self):
+        if not self._loaded or not self._dirty:
+            return False
+        batch = self._take_dirty()
+        self._writing = _write_in_thread(lambda: self._write_users(batch), on_error=lambda: self._dirty.update(batch))
+        await asyncio.shield(self._writing)
+        return True
+
+    def clear(self):
+        super().clear()
+        self._transaction([(f"DELETE FROM {table}", [()]) for table in
+                           ('owned_players', 'team_slots', 'match_history', 'users', 'top_scorers', 'contracts')])
+
+    # --- Documentos ---
+    def _load_contracts(self, default_data):
+        return {name: owner_id for name, owner_id in self._query("SELECT name, owner_id FROM contracts")}
+
+    def _save_contracts(self, owners):
+        if isinstance(owners, list):
+            owners = {name: None for name in owners}
+        self._transaction([("DELETE FROM contracts", [()]),
+                           ("INSERT OR REPLACE INTO contracts (name, owner_id) VALUES (?, ?)", list(owners.items()))])
+
+    def _patch_contracts(self, upserts, deletes):
+        self._transaction([("INSERT OR REPLACE INTO contracts (name, owner_id) VALUES (?, ?)", upserts),
+                           ("DELETE FROM contracts WHERE name = ?", [(name,) for name in deletes])])
+
+    def _load_global_stats(self, default_data):
+        rows = self._query("SELECT name, nickname, owner_name, goals FROM top_scorers")
+        return {"top_scorers": [dict(zip(('name', 'nickname', 'owner_name', 'goals'), r)) for r in rows]}
+
+    def _save_global_stats(self, data):
+        rows = [(s['name'], s.get('nickname'), s.get('owner_name'), s['goals']) for s in data.get('top_scorers', [])]
+        self._transaction([("DELETE FROM top_scorers", [()]),
+                           ("INSERT OR REPLACE INTO top_scorers (name, nickname, owner_name, goals) VALUES (?, ?, ?, ?)", rows)])
+
+    # --- Migração ---
+    def migrate_from_json(self):
+        """Importa (uma vez) os arquivos JSON e o journal existentes para o banco."""
+        imported = False
+        if self.legacy_user_file and os.path.exists(self.legacy_user_file):
+            legacy = UserStore(self.legacy_user_file, journal_file=self.legacy_journal_file, player_factory=self.player_factory)
+            legacy.load()
+            if legacy._journal:
+                legacy._journal.close()
+            self.users = legacy.users
+            self._write_users({user_id: self._user_rows(user_id) for user_id in self.users})
+            self.users = {}
+            imported = True
+        for filename, kind in self.documents.items():
+            if not os.path.exists(filename):
+                continue
+            with open(filename, 'r', encoding='utf-8') as f:
+                try:
+                    data = json.load(f)
+                except json.JSONDecodeError:
+                    print(f"⚠️ {filename} ilegível, não foi migrado.")
+                    continue
+            _DOCUMENT_HANDLERS[filename][1](data)
+            imported = True
+        if imported:
+            print(f"✅ Dados JSON migrados para {self.filename}.")
+        return imported
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Ordem dos resultados do motor de busca do catálogo (catalog.SearchIndex).
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import SearchIndex
+
+
+def make_index(*players):
+    items = [{'name': name, 'overall': overall} for name, overall in players]
+    return SearchIndex(items, rank_key=lambda p: -p['overall'], cache_size=0)
+
+
+def names(results):
+    return [p['name'] for p in results]
+
+
+def test_exact_word_ranks_above_name_prefix():
+    index = make_index(("Messijlh Galvir", 95), ("Lionel Messi", 80))
+    assert names(index.search("messi")) == ["Lionel Messi", "Messijlh Galvir"]
+
+
+def test_exact_name_ranks_first():
+    index = make_index(("Lionel Messi", 80), ("Messi", 60))
+    assert names(index.search("messi"))[0] == "Messi"
+
+
+def test_typo_falls_back_to_fuzzy():
+    index = make_index(("Lionel Messi", 80), ("Cristiano Ronaldo", 90), ("Neymar Jr", 85))
+    results = index.search("neimar")
+    assert results.fuzzy
+    assert names(results)[0] == "Neymar Jr"
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# RafutBot - Torneios
+# ----------------------------------------------------------------------
+# Ligas (pontos corridos) e copas (mata-mata) entre todos os times
+# completos, sem mostrar nada no chat: as partidas rodam no motor de
+# partidas, espalhadas por um pool de processos, e voltam só com o placar
+# e os autores dos gols. Daqui saem a classificação, os placares e os
+# artilheiros; gravar tudo nos dados dos usuários fica para quem chamou,
+# de uma vez só.
+# ----------------------------------------------------------------------
+
+import random
+from collections import Counter
+
+from match_engine import simulate_match
+
+# Bônus do batedor na disputa de pênaltis (sem ele, só metade das cobranças entraria).
+PENALTY_BONUS = 15
+# Partidas por tarefa enviada ao pool de processos.
+MATCHES_PER_TASK = 256
+
+
+# --- Chaveamento ---
+def round_robin(entrants, legs=1):
+    """Rodadas de pontos corridos pelo método do círculo: [[(mandante, visitante)]].
+
+    Com número ímpar de participantes, um folga a cada rodada. Com legs=2 o
+    returno repete as rodadas com os mandos invertidos.
+    """
+    ids = list(entrants)
+    if len(ids) % 2:
+        ids.append(None)
+    n = len(ids)
+    rounds = []
+    for r in range(n - 1):
+        pairs = []
+        for i in range(n // 2):
+            home, away = ids[i], ids[n - 1 - i]
+            if home is None or away is None:
+                continue
+            pairs.append((home, away) if (r + i) % 2 == 0 else (away, home))
+        rounds.append(pairs)
+        ids = [ids[0], ids[-1]] + ids[1:-1]
+    if legs > 1:
+        rounds += [[(away, home) for home, away in pairs] for pairs in rounds]
+    return rounds
+
+def bracket_order(size):
+    """Ordem dos cabeças de chave numa chave de `size` (potência de 2): 1 e 2 só se cruzam na final."""
+    order = [0]
+    while len(order) < size:
+        mirror = len(order) * 2 - 1
+        order = [seed for position in order for seed in (position, mirror - position)]
+    return order
+
+def first_round(entrants_by_seed):
+    """Primeira fase do mata-mata, com os participantes já ordenados do melhor para o pior.
+
+    Os melhores cabeças de chave enfrentam None (folga) quando o número não é potência de 2.
+    """
+    size = 1
+    while size < len(entrants_by_seed):
+        size *= 2
+    seeded = list(entrants_by_seed) + [None] * (size - len(entrants_by_seed))
+    order = [seeded[i] for i in bracket_order(size)]
+    return [(order[i], order[i + 1]) for i in range(0, size, 2)]
+
+
+# --- Partidas (rodam nos processos do pool) ---
+def penalty_shootout(home, away, rng):
+    """Lado vencedor (0 ou 1) e o placar dos pênaltis: 5 cobranças cada, depois alternadas até desempatar."""
+    sides = (home, away)
+    goals = [0, 0]
+    kicks = 0
+    while True:
+        for side in (0, 1):
+            kicker = rng.choice(sides[side].attack)
+            keeper = sides[1 - side].keeper
+            if kicker[1] + PENALTY_BONUS + rng.randint(-10, 10) > keeper[1] + rng.randint(-15, 15):
+                goals[side] += 1
+        kicks += 1
+        if kicks >= 5 and goals[0] != goals[1]:
+            return (0 if goals[0] > goals[1] else 1), tuple(goals)
+
+def play_matches(sheets, fixtures):
+    """Joga uma lista de partidas; devolve, para cada uma, (placar, gols, pênaltis).
+
+    fixtures = [(mandante, visitante, semente, mata_mata)]; gols = [(lado, posição do autor)];
+    pênaltis = (lado vencedor, placar) só em empate no mata-mata, senão None.
+    """
+    results = []
+    for home, away, seed, knockout in fixtures:
+        result = simulate_match(sheets[home], sheets[away], seed=seed)
+        shootout = None
+        if knockout and result.winner is None:
+            shootout = penalty_shootout(sheets[home], sheets[away], random.Random(seed + 1))
+        results.append((result.score, [(e.side, e.attacker) for e in result.goals()], shootout))
+    return results
+
+def _play_task(args):
+    return play_matches(*args)
+
+def _run(sheets, fixtures, executor):
+    """Joga as partidas no executor (ou aqui mesmo, sem executor), na ordem em que vieram."""
+    if executor is None:
+        return play_matches(sheets, fixtures)
+    tasks = []
+    for start in range(0, len(fixtures), MATCHES_PER_TASK):
+        chunk = fixtures[start:start + MATCHES_PER_TASK]
+        # Cada tarefa leva só as fichas dos times que jogam nela.
+        involved = {team for home, away, _, _ in chunk for team in (home, away)}
+        tasks.append(({team: sheets[team] for team in involved}, chunk))
+    return [match for chunk_results in executor.map(_play_task, tasks) for match in chunk_results]
+
+
+# --- Resultados ---
+class Standing:
+    """Linha da classificação de um participante."""
+    __slots__ = ('entrant', 'played', 'wins', 'draws', 'losses', 'goals_for', 'goals_against')
+
+    def __init__(self, entrant):
+        self.entrant = entrant
+        self.played = self.wins = self.draws = self.losses = self.goals_for = self.goals_against = 0
+
+    @property
+    def points(self):
+        return self.wins * 3 + self.draws
+
+    @property
+    def goal_difference(self):
+        return self.goals_for - self.goals_against
+
+    def add(self, scored, conceded):
+        self.played += 1
+        self.goals_for += scored
+        self.goals_against += conceded
+        if scored > conceded: self.wins += 1
+        elif scored == conceded: self.draws += 1
+        else: self.losses += 1
+
+
+class TournamentResult:
+    """Tudo o que um torneio produziu: partidas, classificação, artilharia e campeão.
+
+    matches = [(mandante, visitante, placar, pênaltis)]; scorers conta gols
+    por (participante, posição do autor na escalação).
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.matches = []
+        self.rounds = []
+        self.standings = {}
+        self.scorers = Counter()
+        self.champion = None
+
+    def _record(self, home, away, outcome):
+        score, goals, shootout = outcome
+        self.matches.append((home, away, score, shootout))
+        for entrant in (home, away):
+            if entrant not in self.standings:
+                self.standings[entrant] = Standing(entrant)
+        self.standings[home].add(score[0], score[1])
+        self.standings[away].add(score[1], score[0])
+        sides = (home, away)
+        self.scorers.update((sides[side], slot) for side, slot in goals)
+
+    def table(self):
+        """Classificação: pontos, saldo de gols e gols marcados."""
+        return sorted(self.standings.values(), key=lambda s: (s.points, s.goal_difference, s.goals_for), reverse=True)
+
+    def top_scorers(self, count=10):
+        return self.scorers.most_common(count)
+
+
+def run_league(sheets, executor=None, legs=2, seed=None):
+    """Liga de pontos corridos entre todos os times de sheets ({participante: TeamSheet})."""
+    rng = random.Random(seed)
+    result = TournamentResult('league')
+    result.rounds = round_robin(sorted(sheets), legs=legs)
+    fixtures = [(home, away, rng.getrandbits(32), False) for pairs in result.rounds for home, away in pairs]
+    for (home, away, _, _), outcome in zip(fixtures, _run(sheets, fixtures, executor)):
+        result._record(home, away, outcome)
+    table = result.table()
+    result.champion = table[0].entrant if table else None
+    return result
+
+def run_cup(sheets, executor=None, seed=None, strength=None):
+    """Copa mata-mata em jogo único (empate vai para os pênaltis).
+
+    Os cabeças de chave saem de strength(participante) (maior primeiro); sem
+    ela, a ordem é sorteada. Cada fase é um lote no executor.
+    """
+    rng = random.Random(seed)
+    result = TournamentResult('cup')
+    entrants = sorted(sheets)
+    if strength is None:
+        rng.shuffle(entrants)
+    else:
+        entrants.sort(key=strength, reverse=True)
+    if len(entrants) < 2:
+        result.champion = entrants[0] if entrants else None
+        return result
+    pairs = first_round(entrants)
+    while pairs:
+        result.rounds.append(pairs)
+        fixtures = [(home, away, rng.getrandbits(32), True) for home, away in pairs if home is not None and away is not None]
+        outcomes = iter(_run(sheets, fixtures, executor))
+        winners = []
+        for home, away in pairs:
+            if home is None or away is None:
+                winners.append(away if home is None else home)  # folga
+                continue
+            outcome = next(outcomes)
+            result._record(home, away, outcome)
+            score, _, shootout = outcome
+            if score[0] != score[1]:
+                winners.append(home if score[0] > score[1] else away)
+            else:
+                winners.append(home if shootout[0] == 0 else away)
+        if len(winners) == 1:
+            result.champion = winners[0]
+            break
+        pairs = [(winners[i], winners[i + 1]) for i in range(0, len(winners), 2)]
+    return result